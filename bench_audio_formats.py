@@ -0,0 +1,76 @@
+import sys
+import os
+import time
+import tempfile
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import numpy as np
+import soundfile as sf
+from capture.audio_formats import AUDIO_FORMATS, open_sound_file, supported_samplerate, audio_extension
+
+SECONDS = 60 # Of audio per run; results are scaled to one hour
+CONFIGS = [(44100, 1), (48000, 1), (48000, 2)] # (sample rate, channels)
+# Batch sizes of AudioRecorderQueue: WRITE_INTERVAL (live sink) and BATCH_INTERVAL (file only)
+BATCHES = [0.05, 0.5]
+
+def speech_like(samplerate, channels, seconds, seed=0):
+    """Deterministic stand-in for a microphone: voiced 'syllables', pauses and a noise floor."""
+    rng = np.random.default_rng(seed)
+    n = int(samplerate * seconds)
+    t = np.arange(n) / samplerate
+    # Syllable envelope: ~4 Hz bursts, with a one second pause every few seconds
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    envelope *= (t % 5) < 4
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.cumsum(pitch) * np.pi / samplerate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    noise = rng.standard_normal(n)
+    signal = 0.2 * envelope * voice + 0.02 * envelope * noise + 0.002 * rng.standard_normal(n)
+    out = np.empty((n, channels), dtype=np.float32)
+    for c in range(channels):
+        # A slightly different mix per channel, like two capsules
+        out[:, c] = signal * (1.0 - 0.1 * c) + 0.001 * rng.standard_normal(n)
+    return out
+
+def encode(path, fmt, audio, samplerate, batch_seconds):
+    """Streams `audio` into a new file in batches like the recorder; returns CPU seconds spent."""
+    batch = max(1, int(samplerate * batch_seconds))
+    cpu = time.process_time()
+    with open_sound_file(path, fmt, samplerate, audio.shape[1]) as f:
+        for start in range(0, len(audio), batch):
+            f.write(audio[start:start + batch])
+    return time.process_time() - cpu
+
+def main():
+    hour = 3600 / SECONDS
+    print(f"Streaming {SECONDS} s of speech-like audio per run, scaled to one hour "
+          f"(libsndfile {sf.__libsndfile_version__})\n")
+    print(f"{'format':>6} {'rate':>6} {'ch':>2} | {'batch':>6} | {'MB / hour':>9} | {'kbit/s':>7} | "
+          f"{'vs WAV':>6} | {'CPU s / hour':>12} | {'% of a core':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rate, channels in CONFIGS:
+            audio = {}
+            wav_size = None
+            for fmt in AUDIO_FORMATS:
+                file_rate = supported_samplerate(fmt, rate)
+                if file_rate not in audio:
+                    audio[file_rate] = speech_like(file_rate, channels, SECONDS)
+                for batch_seconds in BATCHES:
+                    path = os.path.join(tmp, f"{fmt}_{rate}_{channels}_{batch_seconds}{audio_extension(fmt)}")
+                    cpu = encode(path, fmt, audio[file_rate], file_rate, batch_seconds)
+                    size = os.path.getsize(path)
+                    info = sf.info(path)
+                    assert abs(info.duration - SECONDS) < 0.1, f"{path}: {info.duration:.2f} s"
+                    if fmt == "wav":
+                        wav_size = wav_size or size
+                    print(f"{fmt:>6} {file_rate:>6} {channels:>2} | {batch_seconds * 1000:4.0f} ms | "
+                          f"{size * hour / 1e6:9.1f} | {size * 8 / SECONDS / 1000:7.1f} | "
+                          f"{size / wav_size:6.2f} | {cpu * hour:12.1f} | {cpu / SECONDS * 100:10.2f}%")
+            print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import sys
+import os
+import time
+import statistics
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import numpy as np
+from capture.engine import CaptureEngine
+
+SHOTS = 50
+REGION = (100, 100, 800, 600)
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<28} mean {statistics.mean(samples):7.2f} ms | "
+          f"p50 {statistics.median(samples):7.2f} ms | p95 {p95:7.2f} ms")
+
+def bench_fresh_session(capture):
+    """Old behaviour: every shot opens and tears down its own mss context."""
+    samples = []
+    for _ in range(SHOTS):
+        t0 = time.perf_counter()
+        engine = CaptureEngine()
+        capture(engine)
+        engine.close()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+def bench_persistent_session(capture):
+    """New behaviour: one session reused for the whole burst."""
+    samples = []
+    with CaptureEngine() as engine:
+        capture(engine)  # warm-up: monitor enumeration happens once here
+        for _ in range(SHOTS):
+            t0 = time.perf_counter()
+            capture(engine)
+            samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+if __name__ == "__main__":
+    print(f"Per-shot capture latency over {SHOTS} shots\n")
+
+    cases = [
+        ("region", lambda e: e.capture_region(*REGION)),
+        ("fullscreen (monitor 1)", lambda e: e.capture_fullscreen(0)),
+    ]
+    for name, capture in cases:
+        print(f"[{name}]")
+        before = bench_fresh_session(capture)
+        after = bench_persistent_session(capture)
+        report("  before (mss per shot)", before)
+        report("  after  (persistent)", after)
+        print(f"  speed-up: {statistics.mean(before) / statistics.mean(after):.2f}x\n")
+
+    # PIL conversion vs raw BGRA arrays on the same persistent session
+    print("[frame API, fullscreen (monitor 1)]")
+    with CaptureEngine() as engine:
+        shape = engine.capture_fullscreen_array(0).shape
+        out = np.empty(shape, dtype=np.uint8)
+    array_cases = [
+        ("  PIL image", lambda e: e.capture_fullscreen(0)),
+        ("  array view", lambda e: e.capture_fullscreen_array(0)),
+        ("  array into out=", lambda e: e.capture_fullscreen_array(0, out=out)),
+    ]
+    for label, capture in array_cases:
+        report(label, bench_persistent_session(capture))
+    print(f"  frame size: {shape[1]}x{shape[0]} ({out.nbytes / 1e6:.1f} MB per BGRA copy)")
@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import statistics
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import cv2
+import numpy as np
+from capture.compositor import OverlayCompositor, RECT, ROUND
+
+FRAMES = 300
+WIDTH, HEIGHT = 1920, 1080
+CAMERA = (480, 640) # h, w of the raw webcam frame
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<34} mean {statistics.mean(samples):8.1f} us | "
+          f"p50 {statistics.median(samples):8.1f} us | p95 {p95:8.1f} us")
+
+def run(composite):
+    frame = np.full((HEIGHT, WIDTH, 3), 64, dtype=np.uint8)
+    composite(frame, 0)  # warm-up
+    samples = []
+    for i in range(FRAMES):
+        t0 = time.perf_counter()
+        composite(frame, i)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return samples
+
+def legacy(web_frame):
+    """Old behaviour: layout, resize and border recomputed for every frame."""
+    def composite(frame, i):
+        cv2.circle(frame, (500 + i % 100, 500), 5, (0, 0, 255), 2)
+        target_w = WIDTH // 5
+        scale = target_w / web_frame.shape[1]
+        target_h = int(web_frame.shape[0] * scale)
+        small = cv2.resize(web_frame, (target_w, target_h))
+        padding = 20
+        y_offset = HEIGHT - target_h - padding
+        x_offset = WIDTH - target_w - padding
+        if y_offset >= 0 and x_offset >= 0:
+            h_w, w_w = small.shape[:2]
+            if (y_offset + h_w) <= frame.shape[0] and (x_offset + w_w) <= frame.shape[1]:
+                frame[y_offset:y_offset+h_w, x_offset:x_offset+w_w] = small
+                cv2.rectangle(frame, (x_offset, y_offset), (x_offset+w_w, y_offset+h_w), (255, 255, 255), 2)
+    return composite
+
+def compositor(shape):
+    """New behaviour: layout once; the webcam frame arrives overlay-sized from WebcamReader."""
+    comp = OverlayCompositor(WIDTH, HEIGHT, pip_shape=shape)
+    pip_h = comp.pip_width if comp.pip_square else int(CAMERA[0] * comp.pip_width / CAMERA[1])
+    small = np.full((pip_h, comp.pip_width, 3), 128, dtype=np.uint8)
+
+    def composite(frame, i):
+        comp.apply(frame, (500 + i % 100, 500), small)
+    return composite
+
+if __name__ == "__main__":
+    print(f"Per-frame overlay cost at {WIDTH}x{HEIGHT} over {FRAMES} frames (cursor + webcam PiP)\n")
+    web_frame = np.full((*CAMERA, 3), 128, dtype=np.uint8)
+    report("before (resize + draw per frame)", run(legacy(web_frame)))
+    report("after  rect PiP + cursor sprite", run(compositor(RECT)))
+    report("after  round PiP + cursor sprite", run(compositor(ROUND)))
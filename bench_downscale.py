@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+import statistics
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import cv2
+import numpy as np
+from capture.video import output_dimensions
+from capture.downscale import Downscaler
+
+FRAMES = 60
+SOURCE = (3840, 2160) # A 4K monitor
+SCALES = [1.0, 0.75, 2 / 3, 0.5, 1 / 3, 0.25]
+
+def timed(fn):
+    fn() # warm-up
+    samples = []
+    for _ in range(FRAMES):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(samples)
+
+if __name__ == "__main__":
+    width, height = SOURCE
+    print(f"Per-frame cost of the grab-side copy/downscale and the BGRA -> I420 conversion "
+          f"for a {width}x{height} capture (median of {FRAMES} frames)\n")
+    grab = np.random.default_rng(0).integers(0, 256, (height, width, 4), dtype=np.uint8)
+
+    baseline = None
+    print(f"{'scale':>6} {'output':>11} | {'grab->slot':>10} | {'convert':>8} | {'total':>8} | {'max fps':>7} | gain"
+          f" | {'plain INTER_AREA':>16}")
+    for scale in SCALES:
+        out_w, out_h = output_dimensions(width, height, output_scale=scale)
+        slot = np.empty((out_h, out_w, 4), dtype=np.uint8)
+        yuv = np.empty((out_h * 3 // 2, out_w), dtype=np.uint8)
+
+        plain = "-"
+        if (out_w, out_h) == (width, height):
+            to_slot = lambda: np.copyto(slot, grab)
+        else:
+            downscaler = Downscaler((width, height), (out_w, out_h))
+            to_slot = lambda: downscaler(grab, slot)
+            area = lambda: cv2.resize(grab, (out_w, out_h), dst=slot, interpolation=cv2.INTER_AREA)
+            plain = f"{timed(area):.2f} ms"
+        convert = lambda: cv2.cvtColor(slot, cv2.COLOR_BGRA2YUV_I420, dst=yuv)
+
+        grab_ms = timed(to_slot)
+        convert_ms = timed(convert)
+        total = grab_ms + convert_ms
+        baseline = baseline or total
+        print(f"{scale:6.2f} {f'{out_w}x{out_h}':>11} | {grab_ms:7.2f} ms | {convert_ms:5.2f} ms | "
+              f"{total:5.2f} ms | {1000 / total:7.1f} | {baseline / total:4.1f}x | {plain:>16}")
@@ -0,0 +1,80 @@
+import sys
+import os
+import time
+import tempfile
+import statistics
+import subprocess
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+from utils.ipc import send_command, is_running, SOCKET_ENV
+
+PINGS = 200
+CAPTURES = 20
+PROCESS_RUNS = 5
+MAIN = os.path.join(src_dir, "main.py")
+
+def report(label, samples):
+    samples = sorted(samples)
+    p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+    print(f"  {label:<44} p50 {statistics.median(samples):8.2f} ms | p95 {p95:8.2f} ms")
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+def run_process(args, env):
+    subprocess.run([sys.executable, MAIN] + args, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        # A private instance, so a resident app the user is running is left alone
+        name = os.path.join(tmp, "bench.sock") if sys.platform != "win32" else f"opencapture-bench-{os.getpid()}"
+        env = dict(os.environ)
+        env[SOCKET_ENV] = name
+        shot = os.path.join(tmp, "shot.png")
+
+        t0 = time.perf_counter()
+        resident = subprocess.Popen([sys.executable, MAIN, "--resident"], env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while not is_running(name):
+                if resident.poll() is not None or time.perf_counter() - t0 > 30:
+                    raise RuntimeError("Resident app did not come up")
+                time.sleep(0.05)
+            print(f"Resident app answering after {(time.perf_counter() - t0) * 1000:.0f} ms\n")
+
+            print("Round trip to the resident app (client in this process):")
+            report(f"ping x{PINGS}", timed(lambda: send_command("ping", name=name), PINGS))
+            report(f"capture monitor 1 to PNG x{CAPTURES}",
+                   timed(lambda: send_command(f"capture monitor 1 to {shot}", name=name), CAPTURES))
+
+            print("\nFrom a new client process, as a hotkey binding would run it:")
+            report(f"main.py send ping x{PROCESS_RUNS}",
+                   timed(lambda: run_process(["send", "ping"], env), PROCESS_RUNS))
+            report(f"main.py send capture monitor 1 to PNG x{PROCESS_RUNS}",
+                   timed(lambda: run_process(["send", "capture", "monitor", "1", "to", shot], env), PROCESS_RUNS))
+            # Most of a client process is the interpreter starting up
+            report(f"(python -c pass x{PROCESS_RUNS})",
+                   timed(lambda: subprocess.run([sys.executable, "-c", "pass"], check=True), PROCESS_RUNS))
+
+            print("\nWithout the resident app (new process loads everything per capture):")
+            report(f"main.py shot --monitor 0 x{PROCESS_RUNS}",
+                   timed(lambda: run_process(["shot", "--monitor", "0", "-o", shot], env), PROCESS_RUNS))
+        finally:
+            try:
+                send_command("quit", name=name)
+                resident.wait(10)
+            except Exception:
+                resident.kill()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import sys
+import os
+import time
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+RUNS = 5
+TOP = 20
+# Regression budget: the dashboard must paint within this time of the process starting...
+STARTUP_BUDGET_MS = 1500
+# ...and none of these may be imported before it does (they are loaded on first use / preloaded after)
+DEFERRED_MODULES = ["cv2", "numpy", "mss", "pyautogui", "sounddevice", "soundfile", "PIL",
+                    "PySide6.QtMultimedia", "PySide6.QtMultimediaWidgets",
+                    "capture.engine", "capture.video", "capture.audio", "editor.window"]
+
+def child():
+    """Starts the app like src/main.py and reports when the dashboard first paints."""
+    from PySide6.QtCore import QObject, QEvent
+    import main
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and obj is window and not result:
+                result.update(painted=time.time(),
+                              loaded=[m for m in DEFERRED_MODULES if m in sys.modules])
+                app.quit()
+            return False
+
+    result = {}
+    app, window = main.create_app([sys.argv[0]])
+    first_paint = FirstPaint()
+    window.installEventFilter(first_paint)
+    app.exec()
+    import json # Not before: the child's import profile is the app's
+    print(json.dumps(result))
+
+def parse_importtime(stderr):
+    """-X importtime lines -> [(self_us, cumulative_us, depth, module)] in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+def run_once():
+    import json
+    import subprocess
+    env = dict(os.environ)
+    env["PYTHONPATH"] = src_dir + os.pathsep + env.get("PYTHONPATH", "")
+    started = time.time()
+    proc = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+                          capture_output=True, text=True, env=env, cwd=current_dir)
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"Startup run failed ({proc.returncode}):\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1])
+    return (result["painted"] - started) * 1000, result["loaded"], parse_importtime(proc.stderr)
+
+def main():
+    import statistics
+    print(f"Dashboard startup over {RUNS} runs (budget {STARTUP_BUDGET_MS} ms to first paint)\n")
+    samples = []
+    loaded = set()
+    for _ in range(RUNS):
+        paint_ms, run_loaded, imports = run_once()
+        samples.append(paint_ms)
+        loaded.update(run_loaded)
+
+    # Import profile of the last run, in the style of -X importtime (times in ms)
+    print(f"{'self':>8} {'cumulative':>11}  module (top {TOP} by cumulative time)")
+    for self_us, cumulative_us, depth, name in sorted(imports, key=lambda r: -r[1])[:TOP]:
+        print(f"{self_us / 1000:8.1f} {cumulative_us / 1000:11.1f}  {'  ' * depth}{name}")
+    top_level = sum(r[1] for r in imports if r[2] == 0)
+    print(f"\n{len(imports)} modules, {top_level / 1000:.1f} ms importing\n")
+
+    median = statistics.median(samples)
+    print(f"Time to first paint: median {median:.0f} ms, min {min(samples):.0f} ms, max {max(samples):.0f} ms")
+
+    failures = []
+    if median > STARTUP_BUDGET_MS:
+        failures.append(f"first paint took {median:.0f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    if loaded:
+        failures.append(f"imported before first paint: {', '.join(sorted(loaded))}")
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    if not failures:
+        print("Within budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        sys.exit(main())
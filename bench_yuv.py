@@ -0,0 +1,54 @@
+import sys
+import os
+import time
+import statistics
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import cv2
+import numpy as np
+
+FRAMES = 60
+RESOLUTIONS = [("1080p", 1920, 1080), ("1440p", 2560, 1440), ("4K", 3840, 2160)]
+
+def report(label, samples, frame_bytes):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"  {label:<30} mean {statistics.mean(samples):7.2f} ms | "
+          f"p50 {statistics.median(samples):7.2f} ms | p95 {p95:7.2f} ms | "
+          f"{frame_bytes / 1e6:5.1f} MB/frame to the encoder")
+
+def run(convert, frame):
+    convert(frame) # warm-up
+    samples = []
+    for _ in range(FRAMES):
+        t0 = time.perf_counter()
+        convert(frame)
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return samples
+
+def two_pass(frame):
+    """Old path: BGRA -> BGR in the encode stage, BGR -> I420 again inside the encoder."""
+    bgr = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+
+def one_pass(width, height):
+    """New path: BGRA -> I420 once, into a buffer allocated per recording."""
+    yuv = np.empty((height * 3 // 2, width), dtype=np.uint8)
+    def convert(frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGRA2YUV_I420, dst=yuv)
+    return convert
+
+if __name__ == "__main__":
+    print(f"Per-frame colour conversion cost over {FRAMES} frames "
+          f"(the encoder's BGR -> YUV pass is modelled with cv2)\n")
+    rng = np.random.default_rng(0)
+    for name, width, height in RESOLUTIONS:
+        frame = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+        print(f"{name} ({width}x{height})")
+        report("before BGRA->BGR->I420", run(two_pass, frame), width * height * 3)
+        report("after  BGRA->I420 (prealloc)", run(one_pass(width, height), frame), width * height * 3 // 2)
+        print()
@@ -1,9 +1,16 @@
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
+import os
 import threading
 import logging
 import time
+import contextlib
+import collections
+from capture.audio_ring import AudioRing, DEFAULT_AUDIO_RING_SECONDS
+from capture.audio_levels import LevelMeter
+from capture.audio_formats import (DEFAULT_AUDIO_FORMAT, DEFAULT_SAMPLERATE, DEFAULT_CHANNELS,
+                                   supported_samplerate, open_sound_file)
 
 class AudioRecorder(threading.Thread):
     def __init__(self, output_path, device=None, channels=1, samplerate=44100):
@@ -19,8 +26,12 @@ class AudioRecorder(threading.Thread):
     def run(self):
         self.is_running = True
         try:
-            with sf.SoundFile(self.output_path, mode='x', samplerate=self.samplerate,
-                              channels=self.channels, subtype='PCM_16') as file:
+            if self.output_path:
+                sound_file = sf.SoundFile(self.output_path, mode='x', samplerate=self.samplerate,
+                                          channels=self.channels, subtype='PCM_16')
+            else:
+                sound_file = contextlib.nullcontext()
+            with sound_file as file:
                 with sd.InputStream(samplerate=self.samplerate, device=self.device,
                                     channels=self.channels, callback=self.callback):
                     while self.is_running:
@@ -49,56 +60,361 @@ class AudioRecorder(threading.Thread):
 
     # RE-IMPLEMENTATION using a Queue pattern for safety and simpler pausing
     
+# PortAudio reads some host settings from the environment when a stream opens (e.g. the
+# PulseAudio source), so streams with their own environment open one at a time
+_env_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _environment(env):
+    if not env:
+        yield
+        return
+    with _env_lock:
+        saved = {name: os.environ.get(name) for name in env}
+        os.environ.update(env)
+        try:
+            yield
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+class InputCapture:
+    """
+    One PortAudio input stream feeding a preallocated AudioRing (capture.audio_ring).
+
+    The callback copies each block straight into the ring (no locks, no allocation beyond
+    slicing); a writer thread drains it. Pause/resume take effect at the sample captured at
+    the moment they are called (or at the perf_counter() time `at` they are given), not at
+    a block boundary. The stream clock is mapped onto perf_counter(), which gives the time
+    of the first recorded sample (first_sample_time) and the rate the device really runs
+    at against that clock (measured_rate).
+    `env` is applied to the process environment while the stream opens.
+    The writer thread meters what arrives (measure) before consuming it (advance).
+    """
+    RATE_BASELINE = 2.0 # Seconds of stream time before measured_rate() is trusted
+
+    def __init__(self, device=None, channels=DEFAULT_CHANNELS, samplerate=DEFAULT_SAMPLERATE,
+                 ring_seconds=DEFAULT_AUDIO_RING_SECONDS, env=None):
+        self.device = device
+        self.channels = channels
+        self.samplerate = samplerate
+        self.env = env
+        self.ring = AudioRing(samplerate, channels, ring_seconds)
+        self.meter = LevelMeter(samplerate, channels)
+        self._metered = 0 # Unread samples at the head of the ring the meter has already seen
+
+        # Pause/resume requests for the callback: (stream time or None, paused). A deque is
+        # safe for one appending and one popping thread without a lock.
+        self._transitions = collections.deque()
+        self.paused = False # Pause state as the callback applies it
+
+        # Stream clock -> perf_counter(): the smallest (callback time - stream time) seen,
+        # i.e. the one least delayed by scheduling. Stream time of the first recorded sample.
+        self._clock_offset = None
+        self._block_time = 0.0
+        self._first_sample_time = None
+        # (stream time, frames delivered before it) of the first and the latest block
+        self._rate_start = None
+        self._rate_last = None
+        self.frames_delivered = 0
+
+        # Counters
+        self.samples_paused = 0 # Captured while paused, not recorded
+        self.input_overflows = 0 # PortAudio lost input before the callback ran
+        self.input_underflows = 0
+
+    def open(self):
+        """Opens the stream (not started yet: use it as a context manager)."""
+        with _environment(self.env):
+            return sd.InputStream(samplerate=self.samplerate, device=self.device,
+                                  channels=self.channels, dtype='float32', callback=self.callback)
+
+    def callback(self, indata, frames, time_info, status):
+        """PortAudio callback: no locks, no allocation beyond slicing."""
+        if status:
+            if status.input_overflow:
+                self.input_overflows += 1
+            if status.input_underflow:
+                self.input_underflows += 1
+
+        now = time.perf_counter()
+        if time_info.currentTime > 0:
+            lag = now - time_info.currentTime
+            if self._clock_offset is None or lag < self._clock_offset:
+                self._clock_offset = lag
+            # Sample clock of this block; some host APIs report 0 for the ADC time
+            t0 = time_info.inputBufferAdcTime or (time_info.currentTime - frames / self.samplerate)
+        else:
+            # No stream clock at all: the block ended about now
+            self._clock_offset = 0.0
+            t0 = now - frames / self.samplerate
+        self._block_time = t0
+        self._rate_last = (t0, self.frames_delivered)
+        if self._rate_start is None:
+            self._rate_start = self._rate_last
+        self.frames_delivered += frames
+
+        start = 0
+        paused = self.paused
+        while self._transitions:
+            t, state = self._transitions[0]
+            # Index of the first sample captured at or after the request
+            k = 0 if t is None or t0 <= 0 else int(np.ceil((t - t0) * self.samplerate))
+            if k >= frames:
+                break # Takes effect in a later block
+            self._transitions.popleft()
+            k = max(start, k)
+            self._take(indata, start, k, paused)
+            start, paused = k, state
+        self._take(indata, start, frames, paused)
+        self.paused = paused
+
+    def _take(self, indata, start, end, paused):
+        if end <= start:
+            return
+        if paused:
+            self.samples_paused += end - start
+        else:
+            if self._first_sample_time is None:
+                self._first_sample_time = self._block_time + start / self.samplerate
+            self.ring.write(indata[start:end])
+
+    # --- WRITER THREAD ---
+    def measure(self):
+        """Meters the samples that arrived since the last call; returns the unread ones (ring.peek())."""
+        chunks = self.ring.peek()
+        skip = self._metered
+        for chunk in chunks:
+            if skip < len(chunk):
+                self.meter.feed(chunk[skip:])
+            skip = max(0, skip - len(chunk))
+        self._metered = sum(len(chunk) for chunk in chunks)
+        return chunks
+
+    def advance(self, count):
+        """Consumes `count` samples returned by measure()."""
+        self.ring.advance(count)
+        self._metered = max(0, self._metered - count)
+
+    def first_sample_time(self):
+        """perf_counter() time the first recorded sample was captured, or None before it."""
+        if self._first_sample_time is None or self._clock_offset is None:
+            return None
+        return self._first_sample_time + self._clock_offset
+
+    def measured_rate(self):
+        """Samples per second the device delivers against the stream clock, or None until measured."""
+        first, last = self._rate_start, self._rate_last
+        if first is None or last[0] - first[0] < self.RATE_BASELINE:
+            return None
+        return (last[1] - first[1]) / (last[0] - first[0])
+
+    def _stream_time(self, at):
+        """perf_counter() time -> stream time, or None (now) before the stream clock is known."""
+        offset = self._clock_offset
+        if at is None or offset is None:
+            return None
+        return at - offset
+
+    def pause(self, at=None):
+        self._transitions.append((self._stream_time(at if at is not None else time.perf_counter()), True))
+
+    def resume(self, at=None):
+        self._transitions.append((self._stream_time(at if at is not None else time.perf_counter()), False))
+
+    def stats(self):
+        stats = {
+            "audio_samples_paused": self.samples_paused,
+            "audio_input_overflows": self.input_overflows,
+            "audio_input_underflows": self.input_underflows,
+        }
+        stats.update(self.ring.stats())
+        return stats
+
+class AlignedSink:
+    """
+    Passes recorded blocks on to `sink` (e.g. VideoRecorder.write_audio), lined up once with
+    the first video frame: align(offset) prepends silence for audio that began after it, or
+    holds back the samples captured before it.
+    """
+
+    def __init__(self, sink, samplerate, channels):
+        self.sink = sink
+        self.samplerate = samplerate
+        self.channels = channels
+        self._skip = 0 # Samples still to hold back
+
+    def align(self, offset):
+        """`offset`: seconds the audio starts after the first video frame (media_clock.offset("audio"))."""
+        if offset is None:
+            logging.warning("Audio started before the video clock; live audio is not aligned")
+            return
+        samples = int(round(abs(offset) * self.samplerate))
+        if offset > 0:
+            self.sink(np.zeros((samples, self.channels), dtype=np.float32))
+        else:
+            self._skip = samples
+        logging.info(f"Live audio aligned to the video: {offset * 1000:+.1f} ms")
+
+    def __call__(self, chunk):
+        if self._skip:
+            skip = min(self._skip, len(chunk))
+            self._skip -= skip
+            chunk = chunk[skip:]
+        if len(chunk):
+            self.sink(chunk)
+
 class AudioRecorderQueue(threading.Thread):
-    def __init__(self, output_path, device=None, channels=1, samplerate=44100):
+    """
+    Records the input device to `output_path` in `audio_format` (capture.audio_formats:
+    WAV, FLAC or Opus in OGG), at `samplerate` / `channels`; a rate the format can't store
+    is replaced by the closest one it can (see the samplerate attribute).
+    `sink`, if given, also receives every recorded block (e.g. VideoRecorder.write_audio for live muxing).
+    With `output_path` None nothing is written to disk and blocks only go to the sink (replay buffer).
+    Several inputs at once (microphone + system audio) are recorded by capture.audio_mixer.AudioMixer.
+
+    The PortAudio callback (InputCapture) copies each block straight into a preallocated
+    AudioRing; this thread drains it and encodes in batches: every WRITE_INTERVAL seconds
+    while a sink wants the audio live, every BATCH_INTERVAL seconds when only a file is
+    written, so a compressed encoder gets large blocks and the disk sees few writes.
+    Memory stays bounded: if the disk stalls for longer than the ring holds, the newest
+    audio is dropped and counted.
+    Levels and silent runs are metered on this thread every METER_INTERVAL, batch or not
+    (levels() for the recording controls, silence() for the session metadata).
+
+    With a `media_clock` (capture.media_clock), the first recorded sample is stamped on the
+    shared recording clock: PortAudio's ADC time of the block, mapped onto perf_counter().
+    The sink then receives audio aligned to the first video frame (silence is prepended, or
+    samples from before it are skipped), so live-muxed audio needs no correction afterwards.
+    With `align_sink` False it gets the samples as recorded instead, sample 0 being the one
+    stamped on the clock (the replay PcmRing places them by media time itself).
+    """
+    WRITE_INTERVAL = 0.05
+    BATCH_INTERVAL = 0.5
+    METER_INTERVAL = 0.05 # Levels are metered this often, also between batches
+
+    def __init__(self, output_path, device=None, channels=DEFAULT_CHANNELS, samplerate=DEFAULT_SAMPLERATE,
+                 sink=None, ring_seconds=DEFAULT_AUDIO_RING_SECONDS, media_clock=None,
+                 audio_format=DEFAULT_AUDIO_FORMAT, name="mic", align_sink=True):
         super().__init__()
         self.output_path = output_path
         self.device = device
+        self.name = name
+        self.audio_format = audio_format
         self.channels = channels
-        self.samplerate = samplerate
+        self.samplerate = supported_samplerate(audio_format, samplerate)
+        self.sink = sink
+        self.media_clock = media_clock
+        self.input = InputCapture(device, channels, self.samplerate, ring_seconds)
+        self.ring = self.input.ring
         self.is_running = False
         self.is_paused = False
         self._stop_event = threading.Event()
-        
-    def run(self):
-        import queue
-        q = queue.Queue()
+        self.align_sink = align_sink
+        self._sink = AlignedSink(sink, self.samplerate, channels) if sink and align_sink else sink
+        self._sink_aligned = False
 
-        def callback(indata, frames, time, status):
-            if status:
-                logging.warning(f"Audio status: {status}")
-            q.put(indata.copy())
+        # Counters
+        self.samples_written = 0
+        self.underruns = 0 # Writer wake-ups that found no new audio while recording
+        self.encode_seconds = 0.0 # Spent in file writes (encoding), on this thread
 
+    @property
+    def output_paths(self):
+        """Files written (empty when recording only to the sink)."""
+        return [self.output_path] if self.output_path else []
+
+    def run(self):
         self.is_running = True
         try:
-            with sf.SoundFile(self.output_path, mode='x', samplerate=self.samplerate,
-                              channels=self.channels, subtype='PCM_16') as file:
-                with sd.InputStream(samplerate=self.samplerate, device=self.device,
-                                    channels=self.channels, callback=callback):
-                    while self.is_running:
-                        if self._stop_event.is_set():
-                            break
-                        
-                        try:
-                            # varying timeout to match block size approx
-                            data = q.get(timeout=1) 
-                        except queue.Empty:
+            if self.output_path:
+                sound_file = open_sound_file(self.output_path, self.audio_format, self.samplerate, self.channels)
+            else:
+                sound_file = contextlib.nullcontext()
+            interval = self.WRITE_INTERVAL if self.sink else self.BATCH_INTERVAL
+            with sound_file as file:
+                with self.input.open():
+                    last_drain = time.perf_counter()
+                    while not self._stop_event.wait(self.METER_INTERVAL):
+                        # Between batches only the levels are updated
+                        if time.perf_counter() - last_drain < interval - self.METER_INTERVAL / 2:
+                            self.input.measure()
                             continue
-                            
-                        if not self.is_paused:
-                            file.write(data)
-                            
+                        last_drain = time.perf_counter()
+                        if not self._drain(file) and not self.input.paused:
+                            self.underruns += 1
+                # The stream is stopped: write what is left
+                self._drain(file)
+                # Final stamp with the best stream clock mapping seen
+                self._stamp()
         except Exception as e:
             logging.error(f"Audio Recording Error: {e}", exc_info=True)
             print(f"Audio Error: {e}")
+        finally:
+            self.is_running = False
+            logging.info(f"Audio stats: {self.stats()}")
+
+    def _drain(self, file):
+        """Writes everything in the ring in one batch; returns the number of samples written."""
+        written = 0
+        chunks = self.input.measure()
+        if chunks and self.media_clock is not None and not self._sink_aligned:
+            self._sink_aligned = True
+            self._stamp()
+            if self._sink and self.align_sink:
+                self._sink.align(self.media_clock.offset("audio"))
+        for chunk in chunks:
+            if file is not None:
+                start = time.perf_counter()
+                file.write(chunk)
+                self.encode_seconds += time.perf_counter() - start
+            if self._sink:
+                self._sink(chunk)
+            written += len(chunk)
+        self.input.advance(written)
+        self.samples_written += written
+        return written
+
+    def first_sample_time(self):
+        """perf_counter() time the first recorded sample was captured, or None before it."""
+        return self.input.first_sample_time()
+
+    def _stamp(self):
+        t = self.first_sample_time()
+        if self.media_clock is not None and t is not None:
+            self.media_clock.stamp("audio", t)
 
     def stop(self):
-        self.is_running = False
         self._stop_event.set()
-        self.join()
+        if self.is_alive():
+            self.join()
+        self.is_running = False
 
-    def pause(self):
+    def pause(self, at=None):
         self.is_paused = True
+        self.input.pause(at)
 
-    def resume(self):
+    def resume(self, at=None):
         self.is_paused = False
+        self.input.resume(at)
+
+    def levels(self):
+        """[(source name, rms dBFS, peak dBFS)] since the last call (safe to call from any thread)."""
+        return [(self.name, *self.input.meter.level())]
+
+    def silence(self):
+        """Silent runs of the recorded audio (capture.audio_levels.LevelMeter.silence)."""
+        return self.input.meter.silence()
+
+    def stats(self):
+        """Sample and overrun/underrun counters (safe to call from any thread)."""
+        stats = {
+            "audio_samples_written": self.samples_written,
+            "audio_underruns": self.underruns,
+            "audio_encode_s": round(self.encode_seconds, 3),
+        }
+        stats.update(self.input.stats())
+        return stats
@@ -0,0 +1,136 @@
+import logging
+import os
+import shutil
+import subprocess
+import sys
+
+# Input device discovery for the recorder (sounddevice is only loaded when asked).
+
+MIC = "mic"
+LOOPBACK = "loopback"
+
+# Inputs that carry what the computer plays: PulseAudio/PipeWire monitors, Windows "Stereo Mix",
+# macOS virtual devices (BlackHole, Soundflower), VB-Audio's virtual cable
+LOOPBACK_HINTS = ("monitor", "loopback", "stereo mix", "what u hear", "wave out",
+                  "blackhole", "soundflower", "cable output")
+
+class AudioSource:
+    """
+    One input to record: a PortAudio device (index, name, or None for the default input)
+    and its gain in the mix. `channels` / `samplerate` are the device's own, if known;
+    `env` is set while its stream opens (how a PulseAudio monitor source is selected).
+    """
+
+    def __init__(self, name, device=None, gain=1.0, channels=None, samplerate=None, env=None):
+        self.name = name
+        self.device = device
+        self.gain = gain
+        self.channels = channels
+        self.samplerate = samplerate
+        self.env = dict(env or {})
+
+    def __repr__(self):
+        return f"AudioSource({self.name!r}, device={self.device!r}, gain={self.gain:g})"
+
+def is_loopback_name(name):
+    name = name.lower()
+    return any(hint in name for hint in LOOPBACK_HINTS)
+
+def list_input_devices():
+    """Input devices as dicts: index, name, hostapi, channels, samplerate and kind (MIC or LOOPBACK)."""
+    import sounddevice as sd
+    hostapis = sd.query_hostapis()
+    devices = []
+    for info in sd.query_devices():
+        if info["max_input_channels"] <= 0:
+            continue
+        devices.append({
+            "index": info["index"],
+            "name": info["name"],
+            "hostapi": hostapis[info["hostapi"]]["name"],
+            "channels": info["max_input_channels"],
+            "samplerate": int(info["default_samplerate"]),
+            "kind": LOOPBACK if is_loopback_name(info["name"]) else MIC,
+        })
+    return devices
+
+def _find(devices, device):
+    for info in devices:
+        if device in (info["index"], info["name"]):
+            return info
+    raise ValueError(f"No input device {device!r}")
+
+def microphone_source(gain=1.0, device=None):
+    """The microphone (default input unless `device` is given) as an AudioSource."""
+    if device is None:
+        return AudioSource("mic", None, gain)
+    info = _find(list_input_devices(), device)
+    return AudioSource("mic", info["index"], gain, samplerate=info["samplerate"])
+
+def loopback_source(gain=1.0, device=None):
+    """
+    The system audio (what the computer plays) as an AudioSource, or None if it can't be recorded.
+    `device` picks the input explicitly; otherwise the first loopback-type input is used, and
+    on Linux the monitor of the default PulseAudio/PipeWire output through the "pulse" device.
+    """
+    devices = list_input_devices()
+    if device is not None:
+        info = _find(devices, device)
+    else:
+        info = next((d for d in devices if d["kind"] == LOOPBACK), None)
+    if info is not None:
+        return AudioSource("system", info["index"], gain, min(2, info["channels"]), info["samplerate"])
+
+    if sys.platform.startswith("linux"):
+        pulse = next((d for d in devices if d["name"] in ("pulse", "pipewire")), None)
+        monitor = pulse_monitor_source() if pulse is not None else None
+        if monitor:
+            return AudioSource("system", pulse["index"], gain, min(2, pulse["channels"]), pulse["samplerate"],
+                               env={"PULSE_SOURCE": monitor})
+    logging.warning("No loopback input found; system audio can't be recorded "
+                    "(enable 'Stereo Mix' on Windows, or install a loopback device such as BlackHole on macOS)")
+    return None
+
+def pulse_monitor_source():
+    """Monitor source of the default PulseAudio/PipeWire output, via pactl (None if unavailable)."""
+    if not shutil.which("pactl"):
+        return None
+    env = dict(os.environ, LC_ALL="C")
+    try:
+        result = subprocess.run(["pactl", "get-default-sink"], capture_output=True, text=True, timeout=2, env=env)
+        sink = result.stdout.strip() if result.returncode == 0 else None
+        if not sink:
+            # pactl before 15.0 has no get-default-sink
+            result = subprocess.run(["pactl", "info"], capture_output=True, text=True, timeout=2, env=env)
+            for line in result.stdout.splitlines():
+                if line.startswith("Default Sink:"):
+                    sink = line.split(":", 1)[1].strip()
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"pactl failed: {e}")
+        return None
+    return f"{sink}.monitor" if sink else None
+
+def recording_sources(mic=True, system_audio=False, mic_gain=1.0, system_gain=1.0,
+                      mic_device=None, system_device=None):
+    """AudioSources of a recording; system audio is left out (with a warning) if there is no loopback input."""
+    sources = []
+    if mic:
+        sources.append(microphone_source(mic_gain, mic_device))
+    if system_audio:
+        system = loopback_source(system_gain, system_device)
+        if system is not None:
+            sources.append(system)
+    return sources
+
+def create_recorder(output_path, sources, stems=False, **options):
+    """
+    The recorder thread for `sources`: the microphone alone goes through capture.audio.AudioRecorderQueue,
+    several sources, a gain or stems through capture.audio_mixer.AudioMixer. `options` are passed on
+    (channels, samplerate, sink, align_sink, media_clock, audio_format).
+    """
+    source = sources[0]
+    if len(sources) == 1 and source.gain == 1.0 and not source.env and not stems:
+        from capture.audio import AudioRecorderQueue
+        return AudioRecorderQueue(output_path, device=source.device, name=source.name, **options)
+    from capture.audio_mixer import AudioMixer
+    return AudioMixer(output_path, sources, stems=stems, **options)
@@ -0,0 +1,43 @@
+import logging
+
+# File formats the audio recorder streams to (via soundfile / libsndfile).
+# Kept free of soundfile itself so the dashboard can list them without loading it.
+
+WAV = "wav"
+FLAC = "flac"
+OPUS = "opus"
+
+AUDIO_FORMATS = {
+    # name: (extension, soundfile format, subtype, sample rates the codec accepts or None for any)
+    WAV: (".wav", "WAV", "PCM_16", None),
+    FLAC: (".flac", "FLAC", "PCM_16", None), # Lossless, typically about half the size of WAV
+    OPUS: (".ogg", "OGG", "OPUS", (8000, 12000, 16000, 24000, 48000)), # Lossy, a small fraction of WAV
+}
+
+DEFAULT_AUDIO_FORMAT = WAV
+DEFAULT_SAMPLERATE = 44100
+DEFAULT_CHANNELS = 1
+SAMPLERATES = (16000, 22050, 24000, 32000, 44100, 48000) # Offered in the UI
+
+def audio_extension(fmt):
+    return AUDIO_FORMATS[fmt][0]
+
+def supported_samplerate(fmt, samplerate):
+    """`samplerate` if the format can store it, else the closest rate it can (Opus: 48 kHz for 44.1 kHz)."""
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Unsupported audio format: {fmt} (expected one of {', '.join(AUDIO_FORMATS)})")
+    rates = AUDIO_FORMATS[fmt][3]
+    if rates is None or samplerate in rates:
+        return samplerate
+    # Prefer not to lose bandwidth: the next rate up, if there is one
+    higher = [rate for rate in rates if rate >= samplerate]
+    rate = min(higher) if higher else max(rates)
+    logging.info(f"{fmt} does not support {samplerate} Hz; recording at {rate} Hz")
+    return rate
+
+def open_sound_file(path, fmt, samplerate, channels):
+    """Opens a new file for streaming writes (fails if it exists)."""
+    import soundfile as sf
+    _, container, subtype, _ = AUDIO_FORMATS[fmt]
+    return sf.SoundFile(path, mode='x', samplerate=samplerate, channels=channels,
+                        format=container, subtype=subtype)
@@ -0,0 +1,100 @@
+import math
+import threading
+import numpy as np
+
+# Level metering and silence detection of recorded audio (numpy only, no PortAudio).
+
+WINDOW = 0.05 # Seconds per metering window
+SILENCE_DB = -50.0 # Windows with an RMS below this (dBFS) are silent
+MIN_SILENCE = 0.5 # Shorter silent runs (pauses between words) are not kept as segments
+FLOOR_DB = -90.0 # Reported instead of -inf for digital silence
+
+def to_db(value):
+    """Linear amplitude -> dBFS, not below FLOOR_DB."""
+    return max(FLOOR_DB, 20.0 * math.log10(value)) if value > 0 else FLOOR_DB
+
+class LevelMeter:
+    """
+    RMS / peak levels and silent runs of one audio stream.
+
+    Fed block by block on the recorder's writer thread (never in the PortAudio callback,
+    which only copies): each block is cut into WINDOW-long windows that are reduced with
+    numpy in one go, and the silent runs of at least `min_silence` seconds are kept as
+    segments on the stream's own timeline (seconds from its first sample).
+    level() and segments() may be called from any thread.
+    """
+
+    def __init__(self, samplerate, channels, silence_db=SILENCE_DB, min_silence=MIN_SILENCE):
+        self.samplerate = samplerate
+        self.silence_db = silence_db
+        self.min_silence = min_silence
+        self.window = max(1, int(samplerate * WINDOW))
+        self._threshold = 10.0 ** (silence_db / 20.0)
+        self._rest = np.zeros((0, channels), dtype=np.float32) # Samples short of a whole window
+        self._windows = 0 # Windows metered so far
+        self._silence_start = None # Window index where the current silent run began
+        self._segments = [] # (first window, end window) of every finished silent run
+        self._lock = threading.Lock()
+        self._rms = 0.0 # Latest window
+        self._peak = 0.0 # Since the last level() call
+        self._fresh = False
+
+    def feed(self, block):
+        """Meters a (frames x channels) block; may be a view into a ring (it is not kept)."""
+        x = np.concatenate([self._rest, block]) if len(self._rest) else block
+        n = len(x) // self.window
+        self._rest = x[n * self.window:].copy()
+        if not n:
+            return
+        frames = np.ascontiguousarray(x[:n * self.window]).reshape(n, -1)
+        rms = np.sqrt(np.einsum("ij,ij->i", frames, frames) / frames.shape[1])
+        peak = np.maximum(frames.max(axis=1), -frames.min(axis=1))
+
+        # Silent runs: only the windows where silence starts or ends are visited
+        silent = rms < self._threshold
+        previous = self._silence_start is not None
+        edges = np.flatnonzero(np.diff(np.concatenate([[previous], silent]).astype(np.int8)))
+        with self._lock:
+            for edge in edges.tolist():
+                if silent[edge]:
+                    self._silence_start = self._windows + edge
+                else:
+                    self._close(self._windows + edge)
+            self._windows += n
+            self._rms = float(rms[-1])
+            self._peak = max(self._peak, float(peak.max()))
+            self._fresh = True
+
+    def _close(self, end):
+        start, self._silence_start = self._silence_start, None
+        if (end - start) * self.window >= self.min_silence * self.samplerate:
+            self._segments.append((start, end))
+
+    def level(self):
+        """(rms dBFS, peak dBFS) of what arrived since the last call; FLOOR_DB for both if nothing did."""
+        with self._lock:
+            if not self._fresh:
+                return FLOOR_DB, FLOOR_DB
+            rms, peak = self._rms, self._peak
+            self._peak = 0.0
+            self._fresh = False
+        return to_db(rms), to_db(peak)
+
+    @property
+    def duration(self):
+        """Seconds metered (whole windows)."""
+        return self._windows * self.window / self.samplerate
+
+    def segments(self):
+        """[(start, length)] in seconds of the silent runs, including one still running at the end."""
+        with self._lock:
+            runs = list(self._segments)
+            start = self._silence_start
+            if start is not None and (self._windows - start) * self.window >= self.min_silence * self.samplerate:
+                runs.append((start, self._windows))
+        step = self.window / self.samplerate
+        return [(round(a * step, 3), round((b - a) * step, 3)) for a, b in runs]
+
+    def silence(self):
+        """The silence report saved in the session metadata (capture.media_clock.write_session)."""
+        return {"duration": round(self.duration, 3), "threshold_db": self.silence_db, "segments": self.segments()}
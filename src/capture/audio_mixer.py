@@ -0,0 +1,372 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+import numpy as np
+import sounddevice as sd
+from capture.audio import InputCapture, AlignedSink
+from capture.audio_ring import DEFAULT_AUDIO_RING_SECONDS
+from capture.audio_levels import LevelMeter
+from capture.audio_formats import (DEFAULT_AUDIO_FORMAT, DEFAULT_SAMPLERATE, DEFAULT_CHANNELS,
+                                   audio_extension, supported_samplerate, open_sound_file)
+
+MAX_SOURCE_LAG = 0.5 # Seconds a source may fall behind the others before its gap is mixed as silence
+START_TIMEOUT = 2.0 # Seconds the mix waits for every source to deliver before starting without it
+MAX_DRIFT = 0.005 # Measured device rates further than this from nominal are not trusted
+SERVO_SECONDS = 1.0 # A source found off its measured timeline is steered back over about this long
+
+def stem_path(output_path, source_name):
+    base, ext = os.path.splitext(output_path)
+    return f"{base}_{source_name}{ext}"
+
+def match_channels(block, channels):
+    """(frames x n) -> (frames x channels): mono is spread, more channels are averaged down to mono."""
+    have = block.shape[1]
+    if have == channels:
+        return block
+    if have == 1:
+        return np.repeat(block, channels, axis=1)
+    if channels == 1:
+        return block.mean(axis=1, keepdims=True)
+    return block[:, :channels] if have > channels else np.pad(block, ((0, 0), (0, channels - have)), mode="edge")
+
+class Resampler:
+    """
+    Streaming linear-interpolation resampler, vectorized over each batch. `ratio` is input
+    rate / output rate and may change between calls (clock drift correction); the read
+    position and the input it still needs are carried over, so batches join seamlessly.
+    """
+
+    def __init__(self, ratio, channels):
+        self.ratio = ratio
+        self._tail = np.zeros((0, channels), dtype=np.float32) # Input not consumed yet
+        self._pos = 0.0 # Position of the next output sample, in _tail's samples
+        self._fed = 0 # Input samples ever passed in
+
+    @property
+    def next_input(self):
+        """Input sample index (fractional) the next output sample is taken at."""
+        return self._fed - len(self._tail) + self._pos
+
+    def process(self, chunks):
+        self._fed += sum(len(chunk) for chunk in chunks)
+        x = np.concatenate([self._tail, *chunks]) if chunks else self._tail
+        if self.ratio == 1.0 and self._pos == 0.0:
+            self._tail = x[:0]
+            return x
+        # Output samples whose position has an input sample on both sides
+        span = len(x) - 1 - self._pos
+        count = int(np.ceil(span / self.ratio)) if span > 0 else 0
+        positions = self._pos + self.ratio * np.arange(count)
+        index = positions.astype(np.int64)
+        frac = (positions - index).astype(np.float32)[:, None]
+        out = x[index] + (x[index + 1] - x[index]) * frac
+        end = self._pos + self.ratio * count
+        keep = int(end)
+        self._tail = x[keep:]
+        self._pos = end - keep
+        return out
+
+class _Track:
+    """Mixer-side state of one source: its capture, resampler and output-rate samples not mixed yet."""
+
+    def __init__(self, source, capture, samplerate, channels):
+        self.source = source
+        self.capture = capture
+        self.nominal_ratio = capture.samplerate / samplerate
+        self.resampler = Resampler(self.nominal_ratio, capture.channels)
+        self.pending = np.zeros((0, channels), dtype=np.float32)
+        self.cursor = None # Mix sample index of pending[0], once placed on the timeline
+        self.start = None # Mix sample index of the source's first sample
+        self.stem = None
+        # Counters
+        self.silence = 0 # Mix samples this source had nothing for (not started, stalled)
+        self.late = 0 # Samples that arrived after their place in the mix was written
+
+    @property
+    def end(self):
+        return self.cursor + len(self.pending)
+
+class AudioMixer(threading.Thread):
+    """
+    Records several inputs at once (e.g. microphone + system audio loopback, see
+    capture.audio_devices) into one mixed track, or with `stems` into one file per source
+    (stem_path), each scaled by its gain; stems add up to the mix.
+    Same interface as capture.audio.AudioRecorderQueue (sink, align_sink, media_clock, pause/resume, stats).
+
+    Every source runs its own PortAudio stream into its own ring (capture.audio.InputCapture),
+    opened at the output rate if the device allows, else at its own rate. This thread then,
+    once per batch and without per-sample Python loops:
+    - resamples each source to the output rate (Resampler); the ratio follows the rate the
+      device actually delivers, measured against the stream clock PortAudio stamps its blocks
+      with (the ADC time), and a slow servo steers each source back onto that timeline, so
+      sources on different sound cards don't drift apart
+    - places each source on the mix timeline by the ADC time of its first sample (mix sample
+      0 is the earliest one), so devices that open at different times stay aligned
+    - sums gain * samples over the span every source has delivered and clips once.
+    A source more than MAX_SOURCE_LAG behind the others (a stalled device) is mixed as silence
+    for the gap instead of holding the mix back; its samples for that span are dropped.
+    levels() meters every source before the mix (a dead microphone shows even under system
+    audio); silence() is measured on the mix.
+    """
+    WRITE_INTERVAL = 0.05
+    BATCH_INTERVAL = 0.5
+    METER_INTERVAL = 0.05
+
+    def __init__(self, output_path, sources, channels=DEFAULT_CHANNELS, samplerate=DEFAULT_SAMPLERATE,
+                 sink=None, ring_seconds=DEFAULT_AUDIO_RING_SECONDS, media_clock=None,
+                 audio_format=DEFAULT_AUDIO_FORMAT, stems=False, align_sink=True):
+        super().__init__()
+        if not sources:
+            raise ValueError("AudioMixer needs at least one source")
+        self.output_path = output_path
+        self.sources = list(sources)
+        self.audio_format = audio_format
+        self.channels = channels
+        self.samplerate = supported_samplerate(audio_format, samplerate)
+        self.sink = sink
+        self.media_clock = media_clock
+        self.ring_seconds = ring_seconds
+        self.stems = stems
+        self.is_running = False
+        self.is_paused = False
+        self._paused_at = None # perf_counter() time of a pause that came before the streams opened
+        self._stop_event = threading.Event()
+        self.align_sink = align_sink
+        self._sink = AlignedSink(sink, self.samplerate, channels) if sink and align_sink else sink
+        self._tracks = []
+        self._origin = None # perf_counter() time of mix sample 0
+        self._started_at = None
+        self._mixed = 0 # Mix samples written so far
+        self.meter = LevelMeter(self.samplerate, channels) # Of the mix
+
+        # Counters
+        self.samples_written = 0
+        self.underruns = 0 # Writer wake-ups that found nothing to mix while recording
+        self.clipped = 0 # Mix samples clipped to [-1, 1]
+        self.encode_seconds = 0.0
+
+    @property
+    def output_paths(self):
+        """Files written: the mix, or one per source with stems (empty when recording only to the sink)."""
+        if not self.output_path:
+            return []
+        if self.stems:
+            return [stem_path(self.output_path, source.name) for source in self.sources]
+        return [self.output_path]
+
+    def run(self):
+        self.is_running = True
+        self._started_at = time.perf_counter()
+        try:
+            interval = self.WRITE_INTERVAL if self.sink else self.BATCH_INTERVAL
+            with contextlib.ExitStack() as files:
+                mix_file = None
+                if self.output_path and not self.stems:
+                    mix_file = files.enter_context(
+                        open_sound_file(self.output_path, self.audio_format, self.samplerate, self.channels))
+                with contextlib.ExitStack() as streams:
+                    for source in self.sources:
+                        track = self._open_track(source, streams)
+                        if track is None:
+                            continue
+                        if self.output_path and self.stems:
+                            track.stem = files.enter_context(open_sound_file(
+                                stem_path(self.output_path, source.name), self.audio_format,
+                                self.samplerate, self.channels))
+                        self._tracks.append(track)
+                        if self.is_paused:
+                            # Paused while starting up: the stream starts paused
+                            track.capture.pause(self._paused_at)
+                    if not self._tracks:
+                        raise RuntimeError("None of the audio sources could be opened")
+                    last_mix = time.perf_counter()
+                    while not self._stop_event.wait(self.METER_INTERVAL):
+                        # Between batches only the levels are updated
+                        if time.perf_counter() - last_mix < interval - self.METER_INTERVAL / 2:
+                            for track in self._tracks:
+                                track.capture.measure()
+                            continue
+                        last_mix = time.perf_counter()
+                        if not self._mix(mix_file) and not self.is_paused:
+                            self.underruns += 1
+                # The streams are stopped: mix what is left, to the end of the longest source
+                self._mix(mix_file, final=True)
+                self._stamp()
+        except Exception as e:
+            logging.error(f"Audio Mixer Error: {e}", exc_info=True)
+        finally:
+            self.is_running = False
+            logging.info(f"Audio mixer stats: {self.stats()}")
+
+    def _open_track(self, source, streams):
+        """Opens the source at the output rate, else at its own; None if it can't be opened at all."""
+        rates = [self.samplerate]
+        if source.samplerate and source.samplerate != self.samplerate:
+            rates.append(source.samplerate)
+        for rate in rates:
+            capture = InputCapture(source.device, source.channels or self.channels, rate,
+                                   self.ring_seconds, env=source.env)
+            try:
+                streams.enter_context(capture.open())
+            except sd.PortAudioError as e:
+                logging.warning(f"Audio source {source.name}: can't open at {rate} Hz: {e}")
+                continue
+            logging.info(f"Audio source {source.name}: device {source.device}, {rate} Hz, "
+                         f"{capture.channels} ch, gain {source.gain:g}")
+            return _Track(source, capture, self.samplerate, self.channels)
+        logging.error(f"Audio source {source.name} is left out of the recording")
+        return None
+
+    def _pull(self, track):
+        """Moves everything in the source's ring through the resampler into `pending`."""
+        capture = track.capture
+        rate = capture.measured_rate()
+        if rate is not None and abs(rate / capture.samplerate - 1.0) <= MAX_DRIFT:
+            ratio = rate / self.samplerate
+            if track.start is not None:
+                # Mix samples the source is behind (+) or ahead (-) of where its measured rate puts it,
+                # e.g. from running at the nominal rate before the measurement: steered back, not jumped
+                error = track.start + track.resampler.next_input / ratio - track.end
+                ratio /= 1.0 + np.clip(error / (self.samplerate * SERVO_SECONDS), -MAX_DRIFT, MAX_DRIFT)
+            track.resampler.ratio = ratio
+        chunks = capture.measure()
+        count = sum(len(chunk) for chunk in chunks)
+        if not count:
+            return
+        block = match_channels(track.resampler.process(chunks), self.channels)
+        capture.advance(count)
+        track.pending = np.concatenate([track.pending, block]) if len(track.pending) else block
+
+    def _place(self, final):
+        """Puts sources on the mix timeline once they have started; fixes mix sample 0 first."""
+        started = [t for t in self._tracks if t.capture.first_sample_time() is not None]
+        if self._origin is None:
+            waited = time.perf_counter() - self._started_at
+            if not started or (len(started) < len(self._tracks) and waited < START_TIMEOUT and not final):
+                return
+            self._origin = min(t.capture.first_sample_time() for t in started)
+            if self.media_clock is not None:
+                self._stamp()
+                if self._sink and self.align_sink:
+                    self._sink.align(self.media_clock.offset("audio"))
+        for track in started:
+            if track.cursor is None:
+                track.cursor = int(round((track.capture.first_sample_time() - self._origin) * self.samplerate))
+                track.start = track.cursor
+
+    def _mix(self, mix_file, final=False):
+        """Mixes the span every placed source has delivered; returns the number of mix samples written."""
+        for track in self._tracks:
+            self._pull(track)
+        self._place(final)
+        placed = [t for t in self._tracks if t.cursor is not None]
+        if not placed:
+            return 0
+
+        ends = [t.end for t in placed]
+        if final:
+            mix_to = max(ends)
+        else:
+            # Wait for the slowest source, unless it is stalled
+            lead = max(ends)
+            mix_to = min(end for end in ends if end >= lead - MAX_SOURCE_LAG * self.samplerate)
+        count = mix_to - self._mixed
+        if count <= 0:
+            return 0
+
+        mix = np.zeros((count, self.channels), dtype=np.float32)
+        for track in self._tracks:
+            if track.cursor is None:
+                track.silence += count
+                if track.stem is not None:
+                    self._write(track.stem, np.zeros_like(mix))
+                continue
+            if track.cursor < self._mixed:
+                # Arrived after its span was mixed without it
+                late = min(len(track.pending), self._mixed - track.cursor)
+                track.pending = track.pending[late:]
+                track.cursor += late
+                track.late += late
+            start = track.cursor - self._mixed
+            take = max(0, min(len(track.pending), count - start))
+            part = track.pending[:take] * np.float32(track.source.gain)
+            mix[start:start + take] += part
+            track.silence += count - take
+            if track.stem is not None:
+                stem = np.zeros_like(mix)
+                stem[start:start + take] = part
+                self._write(track.stem, np.clip(stem, -1.0, 1.0, out=stem))
+            track.pending = track.pending[take:]
+            track.cursor += take
+
+        self.clipped += int(np.count_nonzero(np.abs(mix) > 1.0))
+        np.clip(mix, -1.0, 1.0, out=mix)
+        self.meter.feed(mix)
+        if mix_file is not None:
+            self._write(mix_file, mix)
+        if self._sink:
+            self._sink(mix)
+        self._mixed = mix_to
+        self.samples_written += count
+        return count
+
+    def _write(self, file, block):
+        start = time.perf_counter()
+        file.write(block)
+        self.encode_seconds += time.perf_counter() - start
+
+    def first_sample_time(self):
+        """perf_counter() time of mix sample 0, or None before the mix has started."""
+        return self._origin
+
+    def _stamp(self):
+        if self.media_clock is not None and self._origin is not None:
+            self.media_clock.stamp("audio", self._origin)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.is_running = False
+
+    def pause(self, at=None):
+        at = at if at is not None else time.perf_counter()
+        self._paused_at = at
+        self.is_paused = True
+        for track in list(self._tracks):
+            track.capture.pause(at)
+
+    def resume(self, at=None):
+        self.is_paused = False
+        at = at if at is not None else time.perf_counter()
+        for track in list(self._tracks):
+            track.capture.resume(at)
+
+    def levels(self):
+        """[(source name, rms dBFS, peak dBFS)] of every source since the last call (safe to call from any thread)."""
+        return [(track.source.name, *track.capture.meter.level()) for track in list(self._tracks)]
+
+    def silence(self):
+        """Silent runs of the mix (capture.audio_levels.LevelMeter.silence)."""
+        return self.meter.silence()
+
+    def stats(self):
+        """Mix counters, plus per source (prefixed with its name) what it lost or lacked."""
+        stats = {
+            "audio_samples_written": self.samples_written,
+            "audio_underruns": self.underruns,
+            "audio_clipped": self.clipped,
+            "audio_encode_s": round(self.encode_seconds, 3),
+        }
+        for track in list(self._tracks):
+            name = track.source.name
+            capture = track.capture.stats()
+            stats[f"{name}_overflows"] = capture["audio_input_overflows"]
+            stats[f"{name}_dropped_samples"] = capture["audio_dropped_samples"]
+            stats[f"{name}_silence_s"] = round(track.silence / self.samplerate, 3)
+            stats[f"{name}_late_samples"] = track.late
+            rate = track.capture.measured_rate()
+            stats[f"{name}_rate"] = round(rate if rate is not None else track.capture.samplerate, 2)
+        return stats
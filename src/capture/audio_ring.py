@@ -0,0 +1,89 @@
+import numpy as np
+
+DEFAULT_AUDIO_RING_SECONDS = 10.0 # How long the writer may stall (slow disk) before audio is dropped
+
+class AudioRing:
+    """
+    Preallocated single-producer / single-consumer ring of audio samples
+    (frames x channels, float32) between the PortAudio callback and a writer thread.
+
+    Producer (callback): write(block) copies into free space; it never blocks or allocates.
+    If the consumer is a whole ring behind, the part that does not fit is dropped and counted.
+    Consumer: peek() -> up to two views of the unread samples -> advance(n).
+
+    Both positions only grow and each side moves only its own, published after the copy,
+    so no lock is needed (a Python int store is atomic).
+    """
+
+    def __init__(self, samplerate, channels, seconds=DEFAULT_AUDIO_RING_SECONDS):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.capacity = max(1, int(samplerate * seconds))
+        self._buffer = np.zeros((self.capacity, channels), dtype=np.float32)
+        self._write = 0 # Samples ever written (producer)
+        self._read = 0 # Samples ever consumed (consumer)
+
+        # Counters
+        self.overruns = 0 # Writes that did not fit (consumer too slow)
+        self.dropped = 0 # Samples lost to overruns
+        self.max_fill = 0
+
+    # --- PRODUCER SIDE ---
+    def write(self, block):
+        """Appends a (frames x channels) block; returns the number of samples kept."""
+        size = self.capacity
+        n = len(block)
+        free = size - (self._write - self._read)
+        if n > free:
+            self.overruns += 1
+            self.dropped += n - free
+            n = free
+            if n == 0:
+                return 0
+        start = self._write % size
+        first = min(n, size - start)
+        self._buffer[start:start + first] = block[:first]
+        self._buffer[:n - first] = block[first:n]
+        self._write += n # Publish only after the copy
+        fill = self._write - self._read
+        if fill > self.max_fill:
+            self.max_fill = fill
+        return n
+
+    # --- CONSUMER SIDE ---
+    @property
+    def available(self):
+        return self._write - self._read
+
+    def peek(self, max_frames=None):
+        """Views of the unread samples in order (at most two: up to the end of the ring, then from its start)."""
+        n = self._write - self._read
+        if max_frames is not None:
+            n = min(n, max_frames)
+        if n <= 0:
+            return []
+        start = self._read % self.capacity
+        first = min(n, self.capacity - start)
+        views = [self._buffer[start:start + first]]
+        if n > first:
+            views.append(self._buffer[:n - first])
+        return views
+
+    def advance(self, n):
+        """Marks `n` samples as consumed; their space goes back to the producer."""
+        self._read += min(n, self._write - self._read)
+
+    @property
+    def total_written(self):
+        return self._write
+
+    @property
+    def nbytes(self):
+        return self._buffer.nbytes
+
+    def stats(self):
+        return {
+            "audio_overruns": self.overruns,
+            "audio_dropped_samples": self.dropped,
+            "audio_ring_max_fill": round(self.max_fill / self.capacity, 3),
+        }
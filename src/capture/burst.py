@@ -0,0 +1,208 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import cv2
+import numpy as np
+from capture.engine import CaptureEngine
+
+BURST_FORMATS = ("png", "jpg", "webp")
+DEFAULT_BURST_QUALITY = 90 # JPEG / WebP quality (0-100)
+DEFAULT_BURST_BACKLOG_BYTES = 2 * 1024**3 # Captured frames allowed to wait for the encoders
+
+def encode_params(fmt, quality=DEFAULT_BURST_QUALITY):
+    """cv2.imencode extension and parameters for a burst format."""
+    if fmt == "png":
+        # Level 1 is several times faster than the default 3 and only slightly larger on screen content
+        return ".png", [cv2.IMWRITE_PNG_COMPRESSION, 1]
+    if fmt in ("jpg", "jpeg"):
+        return ".jpg", [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    if fmt == "webp":
+        return ".webp", [cv2.IMWRITE_WEBP_QUALITY, max(1, int(quality))]
+    raise ValueError(f"Unsupported burst format: {fmt} (expected one of {', '.join(BURST_FORMATS)})")
+
+class BurstCapture:
+    """
+    Takes a series of screenshots: `count` shots, or as many as fit into `duration` seconds,
+    every `interval` seconds (0 = back to back, as fast as the screen can be grabbed).
+
+    Grabs are handed over as they are (no copy) to a thread pool that compresses and writes
+    them, so a slow PNG never delays the next shot. Shots are scheduled against the start
+    time, not the previous shot, so a late shot does not push the rest of the series back.
+    If more than `max_backlog_bytes` of frames are waiting for the encoders, capture waits
+    for them rather than running out of memory; stats() reports when that happened.
+
+    run() blocks and must be called on the thread that should own the grab session;
+    stop() may be called from any thread.
+    """
+
+    def __init__(self, output_dir, monitor_index=None, region=None, interval=0.5, count=None,
+                 duration=None, fmt="png", quality=DEFAULT_BURST_QUALITY, workers=None,
+                 max_backlog_bytes=DEFAULT_BURST_BACKLOG_BYTES, prefix=None):
+        if count is None and duration is None:
+            raise ValueError("A burst needs a shot count or a duration")
+        if interval < 0:
+            raise ValueError(f"Invalid burst interval: {interval}")
+        self.output_dir = output_dir
+        self.monitor_index = monitor_index
+        self.region = region # (x, y, w, h) in desktop coordinates
+        self.interval = float(interval)
+        self.count = count
+        self.duration = duration
+        self.fmt = fmt.lower()
+        self.ext, self.params = encode_params(self.fmt, quality)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_backlog_bytes = max_backlog_bytes
+        self.prefix = prefix or f"burst_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+
+        self.files = [] # Written paths, in shot order
+        self.errors = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._backlog_changed = threading.Condition(self._lock)
+        self._pending = 0
+        self._pending_bytes = 0
+        self._max_pending = 0
+        self._backlog_waits = 0
+        self._shot_times = [] # perf_counter at each grab
+        self._lateness = [] # How far each shot started after its slot
+        self._encode_seconds = 0.0
+        self._encoded = 0
+        self._started = None
+        self._finished = None
+
+    def stop(self):
+        """Ends the burst after the current shot; queued shots are still written."""
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def run(self, on_shot=None):
+        """
+        Captures the series and waits for every shot to be written.
+        `on_shot(index, stats)` is called on this thread after each grab.
+        Returns the list of written files.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        logging.info(f"Burst started: count={self.count}, duration={self.duration}, "
+                     f"interval={self.interval * 1000:.0f} ms, format={self.fmt}, workers={self.workers}")
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="BurstEncode")
+        try:
+            with CaptureEngine() as engine:
+                monitor = self._monitor(engine)
+                self._capture_loop(engine, monitor, pool, on_shot)
+        finally:
+            # Drain: every shot taken gets written, even after stop() or an error
+            pool.shutdown(wait=True)
+            self._finished = time.perf_counter()
+
+        self.files.sort()
+        stats = self.stats()
+        logging.info(f"Burst finished: {stats}")
+        if self.errors:
+            logging.error(f"Burst: {len(self.errors)} shots could not be written, first error: {self.errors[0]}")
+        return list(self.files)
+
+    def _monitor(self, engine):
+        if self.region is not None:
+            x, y, w, h = self.region
+            if w <= 0 or h <= 0:
+                raise ValueError(f"Invalid capture dimensions: {w}x{h}")
+            return {"left": int(x), "top": int(y), "width": int(w), "height": int(h)}
+        return engine.monitor_for(self.monitor_index)
+
+    def _capture_loop(self, engine, monitor, pool, on_shot):
+        self._started = time.perf_counter()
+        end = self._started + self.duration if self.duration is not None else None
+        index = 0
+        while not self._stop.is_set():
+            if self.count is not None and index >= self.count:
+                break
+            slot = self._started + index * self.interval
+            now = time.perf_counter()
+            if end is not None and max(slot, now) >= end:
+                break
+            delay = slot - now
+            if delay > 0 and self._stop.wait(delay):
+                break
+
+            t = time.perf_counter()
+            frame = engine.grab_array(monitor) # A view over this grab's own buffer
+            self._shot_times.append(t)
+            self._lateness.append(max(0.0, t - slot) if self.interval else 0.0)
+            self._submit(pool, index, frame)
+            index += 1
+            if on_shot is not None:
+                on_shot(index, self.stats())
+
+    def _submit(self, pool, index, frame):
+        with self._backlog_changed:
+            # Bounded memory: only wait when the encoders are hopelessly behind
+            if self._pending and self._pending_bytes + frame.nbytes > self.max_backlog_bytes:
+                self._backlog_waits += 1
+                while self._pending and self._pending_bytes + frame.nbytes > self.max_backlog_bytes:
+                    self._backlog_changed.wait()
+            self._pending += 1
+            self._pending_bytes += frame.nbytes
+            self._max_pending = max(self._max_pending, self._pending)
+        path = os.path.join(self.output_dir, f"{self.prefix}_{index + 1:04d}{self.ext}")
+        pool.submit(self._encode, path, frame)
+
+    def _encode(self, path, frame):
+        start = time.perf_counter()
+        nbytes = frame.nbytes
+        try:
+            # The grab's fourth byte is padding, not alpha (it is 0 on some X11 servers)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            ok, data = cv2.imencode(self.ext, frame, self.params)
+            if not ok:
+                raise RuntimeError(f"Could not encode {self.fmt}")
+            # imencode + write instead of imwrite: imwrite can't open non-ASCII paths on Windows
+            with open(path, "wb") as f:
+                f.write(data)
+            written = True
+        except Exception as e:
+            logging.error(f"Burst shot {path} failed: {e}")
+            written = False
+            with self._lock:
+                self.errors.append(str(e))
+        with self._backlog_changed:
+            self._pending -= 1
+            self._pending_bytes -= nbytes
+            self._encode_seconds += time.perf_counter() - start
+            if written:
+                self._encoded += 1
+                self.files.append(path)
+            self._backlog_changed.notify_all()
+
+    def stats(self):
+        """Shot counts, interval accuracy and encoder backlog."""
+        with self._lock:
+            shots = len(self._shot_times)
+            stats = {
+                "shots": shots,
+                "written": self._encoded,
+                "failed": len(self.errors),
+                "backlog": self._pending,
+                "backlog_max": self._max_pending,
+                "backlog_mb": round(self._pending_bytes / 1e6, 1),
+                "backlog_waits": self._backlog_waits,
+                "encode_ms": round(self._encode_seconds / max(1, self._encoded + len(self.errors)) * 1000, 2),
+            }
+        intervals = np.diff(self._shot_times[:shots]) if shots > 1 else np.zeros(0)
+        if intervals.size:
+            stats["interval_ms"] = round(float(intervals.mean()) * 1000, 2)
+            # Jitter: spread of the achieved intervals, and the worst shot-to-schedule offset
+            stats["jitter_ms"] = round(float(intervals.std()) * 1000, 2)
+        else:
+            stats["interval_ms"] = 0.0
+            stats["jitter_ms"] = 0.0
+        stats["late_max_ms"] = round(max(self._lateness[:shots], default=0.0) * 1000, 2)
+        if self._started is not None and shots:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+            stats["elapsed_s"] = round(elapsed, 2)
+        return stats
@@ -0,0 +1,264 @@
+import logging
+import sys
+import cv2
+import numpy as np
+
+# Picture-in-picture corners
+TOP_LEFT = "top_left"
+TOP_RIGHT = "top_right"
+BOTTOM_LEFT = "bottom_left"
+BOTTOM_RIGHT = "bottom_right"
+PIP_CORNERS = (TOP_LEFT, TOP_RIGHT, BOTTOM_LEFT, BOTTOM_RIGHT)
+
+# Picture-in-picture shapes
+RECT = "rect"
+ROUND = "round"
+PIP_SHAPES = (RECT, ROUND)
+
+def make_cursor_sprite(height=20):
+    """Arrow cursor as a BGRA sprite (white fill, black outline, anti-aliased alpha). Hotspot is (0, 0)."""
+    scale = height / 20.0
+    arrow = np.array([(0, 0), (0, 16), (4, 12), (7, 19), (10, 18), (7, 11), (12, 11)], dtype=np.float64)
+    # Sub-pixel coordinates (4 fractional bits) keep small sprites smooth
+    points = np.round(arrow * scale * 16).astype(np.int32) + 8
+    sprite = np.zeros((int(np.ceil(20 * scale)) + 2, int(np.ceil(13 * scale)) + 2, 4), dtype=np.uint8)
+    cv2.fillPoly(sprite, [points], (255, 255, 255, 255), cv2.LINE_AA, 4)
+    cv2.polylines(sprite, [points], True, (0, 0, 0, 255), 1, cv2.LINE_AA, 4)
+    return sprite
+
+def _div255(acc):
+    """In-place rounded division by 255 of a uint16 accumulator (exact for products of two bytes)."""
+    acc += 128
+    acc += acc >> 8
+    acc >>= 8
+
+class _Layer:
+    """
+    A precomputed overlay: per-pixel source weight plus an optional constant-colour fill
+    (e.g. a border) with its own weight; the destination keeps the remaining weight.
+
+    Fully opaque pixels are copied with masked cv2.copyTo; only the partially covered
+    (anti-aliased) pixels go through the uint16 blend, gathered by precomputed indices:
+    out = (src * alpha + fill + dst * inv) / 255
+    """
+
+    def __init__(self, alpha, fill_alpha=None, fill_color=(255, 255, 255)):
+        h, w = alpha.shape[:2]
+        alpha = alpha.astype(np.uint16)
+        fill_alpha = np.zeros_like(alpha) if fill_alpha is None else fill_alpha.astype(np.uint16)
+        self.shape = (h, w)
+
+        self._src_mask = (alpha == 255).astype(np.uint8)
+        self._fill_mask = (fill_alpha == 255).astype(np.uint8)
+        self._has_fill = bool(self._fill_mask.any())
+        self._fill_image = np.empty((h, w, 3), dtype=np.uint8)
+        self._fill_image[:] = fill_color
+
+        covered = alpha + fill_alpha
+        self._edge = np.nonzero((covered > 0) & (alpha < 255) & (fill_alpha < 255))
+        self._edge_index = self._edge[0] * w + self._edge[1] # flat pixel index inside the layer
+        self._edge_alpha = alpha[self._edge].reshape(-1, 1)
+        self._edge_inv = 255 - covered[self._edge].reshape(-1, 1)
+        self._edge_fill = fill_alpha[self._edge].reshape(-1, 1) * np.array(fill_color, dtype=np.uint16)
+
+        # Dense weights, only used when the layer is clipped by the frame edge
+        self._alpha = alpha.reshape(h, w, 1)
+        self._inv = (255 - covered).reshape(h, w, 1)
+        self._fill = fill_alpha.reshape(h, w, 1) * np.array(fill_color, dtype=np.uint16)
+
+    def frame_index(self, frame_width, y, x):
+        """Flat pixel indices of the edge pixels in a frame `frame_width` wide, layer placed at (y, x)."""
+        return (self._edge[0] + y) * frame_width + (self._edge[1] + x)
+
+    def composite(self, dst, src, dst_pixels=None, dst_index=None):
+        """
+        Draws `src` (HxWx3, the layer's size) over the `dst` view in place.
+        `dst_pixels` (the frame as an N x 3 pixel view) with `dst_index` from frame_index()
+        lets the edge blend use flat take/put instead of 2-D fancy indexing.
+        """
+        if dst.strides[1] == 3:
+            cv2.copyTo(src, self._src_mask, dst)
+            if self._has_fill:
+                cv2.copyTo(self._fill_image, self._fill_mask, dst)
+        else:
+            # BGR view into a BGRA frame: OpenCV cannot write through it, numpy can
+            np.copyto(dst, src, where=self._src_mask[:, :, None].astype(bool))
+            if self._has_fill:
+                np.copyto(dst, self._fill_image, where=self._fill_mask[:, :, None].astype(bool))
+        if not len(self._edge_index):
+            return
+        acc = np.take(src.reshape(-1, 3), self._edge_index, axis=0) * self._edge_alpha
+        if dst_pixels is None:
+            acc += dst[self._edge] * self._edge_inv
+        else:
+            acc += np.take(dst_pixels, dst_index, axis=0) * self._edge_inv
+        acc += self._edge_fill
+        _div255(acc)
+        if dst_pixels is None:
+            dst[self._edge] = acc
+        else:
+            dst_pixels[dst_index] = acc
+
+    def composite_clipped(self, dst, src, rows, cols):
+        """Same as composite() for the rows/cols part of the layer that is inside the frame."""
+        acc = src * self._alpha[rows, cols]
+        acc += dst * self._inv[rows, cols]
+        acc += self._fill[rows, cols]
+        _div255(acc)
+        np.copyto(dst, acc, casting="unsafe")
+
+class OverlayCompositor:
+    """
+    Draws the cursor sprite and the webcam picture-in-picture onto captured frames.
+
+    The layout (PiP size and offsets, shape mask, border, sprite alpha) is worked out once
+    per recording; per frame only the two small regions are touched: opaque pixels by a
+    masked copy, anti-aliased edges by one vectorized blend. Works on BGR or BGRA frames.
+    """
+
+    def __init__(self, width, height, pip_corner=BOTTOM_RIGHT, pip_scale=0.2, pip_shape=RECT,
+                 padding=20, border=2, border_color=(255, 255, 255), cursor_sprite=None):
+        if pip_corner not in PIP_CORNERS:
+            raise ValueError(f"Unknown PiP corner: {pip_corner}")
+        if pip_shape not in PIP_SHAPES:
+            raise ValueError(f"Unknown PiP shape: {pip_shape}")
+        self.width = width
+        self.height = height
+        self.pip_corner = pip_corner
+        self.pip_shape = pip_shape
+        self.padding = padding
+        self.border = border
+        self.border_color = border_color
+
+        # Webcam frames are delivered at this width (and square for round PiPs) by WebcamReader
+        self.pip_width = max(2, int(width * pip_scale) // 2 * 2)
+        self.pip_square = pip_shape == ROUND
+
+        sprite = cursor_sprite if cursor_sprite is not None else make_cursor_sprite(max(16, height // 54))
+        self._cursor_bgr = np.ascontiguousarray(sprite[:, :, :3])
+        self._cursor_layer = _Layer(sprite[:, :, 3])
+
+        self._pip_shape_key = None
+        self._pip_layer = None
+        self._pip_origin = None
+        self._pip_index = None
+
+    # --- LAYOUT (once) ---
+    def _layout_pip(self, pip_h, pip_w):
+        self._pip_shape_key = (pip_h, pip_w)
+        pad = self.padding
+        x = pad if self.pip_corner in (TOP_LEFT, BOTTOM_LEFT) else self.width - pip_w - pad
+        y = pad if self.pip_corner in (TOP_LEFT, TOP_RIGHT) else self.height - pip_h - pad
+        if x < 0 or y < 0:
+            self._pip_origin = None # Capture area too small for the overlay
+            return
+        self._pip_origin = (y, x)
+
+        b = self.border
+        if self.pip_shape == RECT:
+            border = np.zeros((pip_h, pip_w), dtype=np.uint8)
+            if b > 0:
+                border[:b, :] = border[-b:, :] = 255
+                border[:, :b] = border[:, -b:] = 255
+            self._pip_layer = _Layer(255 - border, fill_alpha=border, fill_color=self.border_color)
+            self._pip_index = self._pip_layer.frame_index(self.width, y, x)
+            return
+
+        # Round: anti-aliased disc for the webcam inside an anti-aliased ring for the border
+        scale = 16 # 4 fractional bits
+        center = (pip_w * scale // 2, pip_h * scale // 2)
+        radius = min(pip_w, pip_h) * scale // 2 - scale
+        outer = np.zeros((pip_h, pip_w), dtype=np.uint8)
+        inner = np.zeros((pip_h, pip_w), dtype=np.uint8)
+        cv2.circle(outer, center, radius, 255, -1, cv2.LINE_AA, 4)
+        cv2.circle(inner, center, max(0, radius - b * scale), 255, -1, cv2.LINE_AA, 4)
+        inner = np.minimum(inner, outer)
+        self._pip_layer = _Layer(inner, fill_alpha=outer - inner, fill_color=self.border_color)
+        self._pip_index = self._pip_layer.frame_index(self.width, y, x)
+
+    # --- PER FRAME ---
+    def apply(self, frame, cursor=None, webcam_frame=None):
+        """Composites the overlays into `frame` in place. `cursor` is (x, y) relative to the frame."""
+        dst = frame[:, :, :3] if frame.shape[2] == 4 else frame
+
+        if webcam_frame is not None:
+            pixels = None
+            if frame.flags.c_contiguous:
+                pixels = frame.reshape(-1, frame.shape[2])[:, :3]
+            self._apply_pip(dst, webcam_frame, pixels)
+        if cursor is not None:
+            self._apply_cursor(dst, cursor)
+        return frame
+
+    def _apply_pip(self, dst, webcam_frame, pixels):
+        pip_h, pip_w = webcam_frame.shape[:2]
+        if self._pip_shape_key != (pip_h, pip_w):
+            self._layout_pip(pip_h, pip_w)
+        if self._pip_origin is None:
+            return
+        y, x = self._pip_origin
+        self._pip_layer.composite(dst[y:y+pip_h, x:x+pip_w], np.ascontiguousarray(webcam_frame),
+                                  pixels, self._pip_index)
+
+    def _apply_cursor(self, dst, cursor):
+        x, y = cursor
+        sh, sw = self._cursor_bgr.shape[:2]
+        # Clip the sprite against the frame edges
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + sw, self.width), min(y + sh, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if (x1 - x0, y1 - y0) == (sw, sh):
+            self._cursor_layer.composite(dst[y0:y1, x0:x1], self._cursor_bgr)
+            return
+        rows = slice(y0 - y, y1 - y)
+        cols = slice(x0 - x, x1 - x)
+        self._cursor_layer.composite_clipped(dst[y0:y1, x0:x1], self._cursor_bgr[rows, cols], rows, cols)
+
+class CursorTracker:
+    """
+    Global cursor position source, resolved once per recording:
+    GetCursorPos on Windows, pyautogui elsewhere. Failures are logged once, not per frame.
+    """
+
+    def __init__(self):
+        self._position = self._resolve()
+        self._warned = False
+
+    def _resolve(self):
+        if sys.platform == "win32":
+            import ctypes
+            import ctypes.wintypes
+            point = ctypes.wintypes.POINT()
+            get_cursor_pos = ctypes.windll.user32.GetCursorPos
+
+            def position():
+                if not get_cursor_pos(ctypes.byref(point)):
+                    raise OSError("GetCursorPos failed")
+                return point.x, point.y
+            return position
+
+        try:
+            import pyautogui
+            return pyautogui.position
+        except Exception as e:
+            logging.warning(f"Cursor capture unavailable: {e}")
+            return None
+
+    @property
+    def available(self):
+        return self._position is not None
+
+    def position(self):
+        """Returns the (x, y) screen position of the cursor, or None if it cannot be read."""
+        if self._position is None:
+            return None
+        try:
+            x, y = self._position()
+        except Exception as e:
+            # Usually transient (e.g. a secure desktop is shown), so keep trying
+            if not self._warned:
+                logging.warning(f"Cursor position unavailable: {e}")
+                self._warned = True
+            return None
+        return int(x), int(y)
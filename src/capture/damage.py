@@ -0,0 +1,72 @@
+import numpy as np
+
+class DamageDetector:
+    """
+    Cheap "did the screen change since the last frame?" check on raw BGRA frames.
+
+    Keeps one 64-bit digest per row instead of a copy of the frame: each row, read as
+    machine words, is multiplied with fixed odd weights (one integer matmul per band of
+    `band_rows` rows, wrapping, with no frame-sized temporaries), so any single changed word
+    and any shifted content change it.
+
+    The band that changed last is checked first and the first band that differs ends the
+    check. The bands not read then have no current digest: the next call digests them
+    and reports a change, so a frame is only ever called unchanged after every row matched.
+    """
+
+    def __init__(self, shape, band_rows=64, seed=0x5EED):
+        self.band_rows = max(1, int(band_rows))
+        height = shape[0]
+        row_bytes = int(np.prod(shape[1:]))
+        self._word = np.uint64 if row_bytes % 8 == 0 else np.uint32 if row_bytes % 4 == 0 else np.uint8
+        words = row_bytes // np.dtype(self._word).itemsize
+        info = np.iinfo(self._word)
+        self._weights = np.random.default_rng(seed).integers(0, info.max, words, dtype=self._word, endpoint=True) | 1
+
+        self._bands = [slice(y, y + self.band_rows) for y in range(0, height, self.band_rows)]
+        self._digests = np.zeros(height, dtype=self._word)
+        self._stale = np.ones(len(self._bands), dtype=bool) # Bands without a digest of the last frame
+        self._hot = 0 # Band that changed last
+
+        # Counters
+        self.frames_checked = 0
+        self.frames_unchanged = 0
+
+    def reset(self):
+        """Forces the next frame to count as changed."""
+        self._stale[:] = True
+
+    def changed(self, frame):
+        """Returns True if `frame` differs from what was previously seen."""
+        self.frames_checked += 1
+        rows = np.ascontiguousarray(frame).reshape(len(self._digests), -1).view(self._word)
+
+        changed = False
+        start, count = self._hot, len(self._bands)
+        for step in range(count):
+            index = (start + step) % count
+            band = self._bands[index]
+            digest = rows[band] @ self._weights
+            if self._stale[index]:
+                self._digests[band] = digest
+                self._stale[index] = False
+                changed = True
+                continue
+            if not np.array_equal(digest, self._digests[band]):
+                self._digests[band] = digest
+                self._hot = index
+                # Early exit: the bands after this one keep the digests of an older frame
+                for rest in range(step + 1, count):
+                    self._stale[(start + rest) % count] = True
+                return True
+
+        if changed:
+            return True
+        self.frames_unchanged += 1
+        return False
+
+    @property
+    def skip_ratio(self):
+        if self.frames_checked == 0:
+            return 0.0
+        return self.frames_unchanged / self.frames_checked
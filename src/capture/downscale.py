@@ -0,0 +1,29 @@
+import cv2
+import numpy as np
+
+class Downscaler:
+    """
+    Shrinks frames of one fixed size to another, into a caller-provided buffer.
+
+    cv2's INTER_AREA is only fast for an exact factor of two, so the frame is area-halved
+    as often as the target allows (a box filter, nothing is aliased away) and the
+    remaining factor, always below two, is done with INTER_LINEAR. The intermediate
+    buffers are allocated once.
+    """
+
+    def __init__(self, src_size, dst_size, channels=4):
+        width, height = src_size
+        self.dst_size = tuple(dst_size)
+        self._halves = [] # Preallocated output of each halving step
+        while width // 2 >= dst_size[0] and height // 2 >= dst_size[1] and (width, height) != self.dst_size:
+            width, height = width // 2, height // 2
+            self._halves.append(np.empty((height, width, channels), dtype=np.uint8))
+        # Ended exactly on the target: the last halving writes into the output
+        self._exact = (width, height) == self.dst_size
+
+    def __call__(self, src, out):
+        steps = self._halves[:-1] if self._exact and self._halves else self._halves
+        for buffer in steps:
+            src = cv2.resize(src, (buffer.shape[1], buffer.shape[0]), dst=buffer, interpolation=cv2.INTER_AREA)
+        interpolation = cv2.INTER_AREA if self._exact else cv2.INTER_LINEAR
+        return cv2.resize(src, self.dst_size, dst=out, interpolation=interpolation)
@@ -0,0 +1,157 @@
+import time
+import cv2
+import numpy as np
+from capture.compositor import OverlayCompositor
+from capture.encoders import YUV420P
+
+class EncodeStage:
+    """
+    Turns raw BGRA captures into encoder writes: colour conversion, cursor and webcam
+    overlays, CFR frame repeats or VFR timestamps, and reuse of the last composed frame
+    for unchanged screens.
+
+    When the encoder takes YUV420P, the BGRA capture is converted to I420 in a single pass
+    into a preallocated buffer (overlays are drawn on the BGRA frame first) instead of
+    BGRA -> BGR here and BGR -> YUV again in the encoder.
+
+    Has no Qt dependency, so the same code runs in the recorder's encode thread and in
+    the encoder worker process (capture.process_encoder).
+    """
+
+    def __init__(self, encoder, width, height, fps, webcam=None, timestamps=None, compositor=None):
+        self.encoder = encoder
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.webcam = webcam # WebcamReader (capture.webcam), never blocks
+        self.compositor = compositor or OverlayCompositor(width, height)
+        self.timestamps = timestamps # TimestampSidecar in VFR mode, None in CFR mode
+
+        self.frame_count = 0
+        self.frames_repeated = 0 # CFR writes of a frame beyond its first
+        self.busy_seconds = 0.0 # Total time spent in process(), read by the rate controller
+        self._frame = None # Last composed frame, reused for unchanged screens
+        self._yuv = None
+        if encoder.input_format == YUV420P:
+            self._yuv = np.empty((height * 3 // 2, width), dtype=np.uint8)
+
+    @property
+    def encoders(self):
+        return [self.encoder]
+
+    def process(self, buffer, pts, cursor, repeat, due):
+        """
+        Encodes one captured BGRA frame taken at `pts` seconds; in CFR it is written until
+        the file holds `due` frames (FrameClock.frames_due of its capture slot).
+        """
+        started = time.perf_counter()
+        try:
+            self._process(buffer, pts, cursor, repeat, due)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+
+    def _process(self, buffer, pts, cursor, repeat, due):
+        if repeat and self._frame is not None:
+            if self.timestamps is None:
+                # CFR: the timeline still needs frames, re-send the last composed one
+                self._write_cfr(due)
+            # VFR: nothing to write, the previous frame simply lasts longer once the real
+            # timestamps are remuxed in (VideoRecorder only records VFR when that is possible)
+            return
+
+        width, height = self.width, self.height
+        # Cursor sprite and webcam picture-in-picture (latest frame from the reader thread)
+        web_frame = self.webcam.latest() if self.webcam else None
+        overlay = cursor is not None or web_frame is not None
+
+        if self._yuv is not None:
+            if buffer.shape[1] != width or buffer.shape[0] != height:
+                buffer = cv2.resize(buffer, (width, height))
+            # Overlays go straight onto the captured BGRA buffer, which is released after this
+            if overlay:
+                self.compositor.apply(buffer, cursor, web_frame)
+            frame = cv2.cvtColor(buffer, cv2.COLOR_BGRA2YUV_I420, dst=self._yuv)
+        else:
+            frame = cv2.cvtColor(buffer, cv2.COLOR_BGRA2BGR)
+
+            # No resize needed if mss gave us the right size, which it should.
+            # Just in case of some weird driver behavior, we check shape but hopefully skip resize.
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height))
+
+            if overlay:
+                self.compositor.apply(frame, cursor, web_frame)
+
+        self._frame = frame
+
+        # Write Frame
+        if self.timestamps is not None:
+            # VFR: encode once, the real timestamp is applied at remux time
+            self.encoder.write(frame)
+            self.timestamps.append(pts)
+            self.frame_count += 1
+            return
+
+        self._write_cfr(due)
+
+    def _write_cfr(self, due):
+        # CFR: one write per output slot the frame's capture slot covers. More than one
+        # only when capture runs below the output rate, missed slots, or a frame
+        # dropped by backpressure left slots behind; those writes are counted as repeats.
+        writes = max(1, due - self.frame_count)
+        for _ in range(writes):
+            self.encoder.write(self._frame)
+        self.frame_count += writes
+        self.frames_repeated += writes - 1
+
+    def stats(self):
+        return self.webcam.stats() if self.webcam else {}
+
+    def close(self):
+        """Stops the webcam reader; the encoder and sidecar are owned by the caller."""
+        if self.webcam:
+            self.webcam.stop()
+
+class SplitEncodeStage:
+    """
+    Feeds each monitor's part of a stitched multi-monitor canvas to its own EncodeStage,
+    so every monitor ends up in its own file. Same interface as EncodeStage.
+    """
+
+    def __init__(self, stages, rects):
+        self.stages = stages
+        self.rects = rects # (x, y, w, h) of each stage's part of the canvas
+
+    @property
+    def encoder(self):
+        return self.stages[0].encoder
+
+    @property
+    def encoders(self):
+        return [stage.encoder for stage in self.stages]
+
+    @property
+    def frame_count(self):
+        return self.stages[0].frame_count
+
+    @property
+    def frames_repeated(self):
+        return self.stages[0].frames_repeated
+
+    @property
+    def busy_seconds(self):
+        return sum(stage.busy_seconds for stage in self.stages)
+
+    def process(self, buffer, pts, cursor, repeat, due):
+        for stage, (x, y, w, h) in zip(self.stages, self.rects):
+            local = None
+            if cursor is not None and x <= cursor[0] < x + w and y <= cursor[1] < y + h:
+                local = (cursor[0] - x, cursor[1] - y)
+            stage.process(buffer[y:y + h, x:x + w], pts, local, repeat, due)
+
+    def stats(self):
+        return self.stages[0].stats()
+
+    def close(self):
+        for stage in self.stages:
+            stage.close()
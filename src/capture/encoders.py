@@ -0,0 +1,278 @@
+import collections
+import logging
+import socket
+import subprocess
+import threading
+import time
+import cv2
+import numpy as np
+from utils.ffmpeg import check_ffmpeg, popen_flags
+
+# Encoder backends
+AUTO = "auto"
+OPENCV = "opencv"
+FFMPEG = "ffmpeg"
+
+# Raw frame layouts an encoder can take (ffmpeg pix_fmt names)
+BGR24 = "bgr24"     # HxWx3 BGR
+YUV420P = "yuv420p" # planar I420 as an (H*3/2)xW array: Y plane, then U and V at quarter size
+
+# Codecs offered by the ffmpeg backend
+FFMPEG_CODECS = ("libx264", "libx265", "libvpx", "libvpx-vp9")
+
+class EncoderError(Exception):
+    pass
+
+class FrameEncoder:
+    """
+    Interface for video encoder backends.
+
+    open() -> write(frame)* -> close()
+    Frames are HxWx3 BGR uint8 arrays (`input_format` BGR24) unless a backend says otherwise;
+    backends opened with `input_format` YUV420P take I420 frames (see EncodeStage).
+    """
+    input_format = BGR24
+    supports_audio = False
+
+    def __init__(self, output_path, width, height, fps):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        self.fps = fps
+
+    def open(self):
+        raise NotImplementedError
+
+    def write(self, frame):
+        raise NotImplementedError
+
+    def write_audio(self, block):
+        """Feeds a block of float32 samples (frames x channels) to backends that mux audio live."""
+        pass
+
+    def close(self):
+        raise NotImplementedError
+
+class OpenCVEncoder(FrameEncoder):
+    """cv2.VideoWriter backend (MPEG-4 Part 2 by default). Always available, no audio."""
+
+    def __init__(self, output_path, width, height, fps, fourcc="mp4v"):
+        super().__init__(output_path, width, height, fps)
+        self.fourcc = fourcc
+        self._writer = None
+
+    def open(self):
+        self._writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                       self.fps, (self.width, self.height))
+        if not self._writer.isOpened():
+            raise EncoderError("Could not open VideoWriter. Check codec or file permissions.")
+        return self
+
+    def write(self, frame):
+        self._writer.write(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+class FFmpegEncoder(FrameEncoder):
+    """
+    Streams raw frames over stdin to a local ffmpeg process.
+
+    Audio can be muxed by the same process in two ways:
+    - `audio_file`: an existing audio file (optionally trimmed with audio_start / audio_duration,
+      and delayed by `audio_delay` seconds of silence when it begins after the first frame)
+    - `live_audio` = (samplerate, channels): PCM blocks pushed through write_audio() while recording,
+      sent to ffmpeg over a loopback TCP connection (works the same on Windows and POSIX)
+    """
+    supports_audio = True
+
+    def __init__(self, output_path, width, height, fps, codec="libx264", preset="veryfast", crf=23,
+                 input_format=BGR24, audio_file=None, audio_start=0.0, audio_duration=None,
+                 audio_delay=0.0, live_audio=None, fragmented=False):
+        super().__init__(output_path, width, height, fps)
+        if codec not in FFMPEG_CODECS:
+            raise EncoderError(f"Unsupported codec: {codec}")
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.input_format = input_format
+        self.audio_file = audio_file
+        self.audio_start = audio_start
+        self.audio_duration = audio_duration
+        self.audio_delay = audio_delay
+        self.live_audio = live_audio
+        self.fragmented = fragmented # Fragmented MP4: playable up to the last fragment even after a crash
+
+        self._proc = None
+        self._stderr_tail = collections.deque(maxlen=20)
+        self._audio_sock = None
+        self._audio_port = None
+        # Every block until ffmpeg accepts the connection: dropping any would shift the whole track
+        self._audio_pending = collections.deque()
+        self._audio_failed = False # ffmpeg never accepted the connection, live audio is off
+        self._audio_lock = threading.Lock()
+
+    def _video_codec_args(self):
+        if self.codec.startswith("libvpx"):
+            # libvpx has no x264-style presets; fast presets map to its realtime deadline
+            deadline = "realtime" if self.preset in ("ultrafast", "superfast", "veryfast", "faster", "fast") else "good"
+            bitrate = "0" if self.codec == "libvpx-vp9" else "20M" # VP8 needs a ceiling alongside CRF
+            return ["-c:v", self.codec, "-deadline", deadline, "-crf", str(self.crf), "-b:v", bitrate]
+        return ["-c:v", self.codec, "-preset", self.preset, "-crf", str(self.crf)]
+
+    def build_command(self):
+        # Raw inputs are fully described on the command line, so skip stream probing;
+        # otherwise ffmpeg buffers seconds of input before muxing and stalls the pipes.
+        no_probe = ["-probesize", "32", "-analyzeduration", "0"]
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            *no_probe,
+            "-f", "rawvideo", "-pix_fmt", self.input_format,
+            "-s", f"{self.width}x{self.height}", "-framerate", str(self.fps),
+            "-thread_queue_size", "16",
+            "-i", "pipe:0",
+        ]
+
+        audio_codec = "libopus" if self.codec.startswith("libvpx") else "aac"
+        if self.audio_file:
+            cmd += ["-ss", f"{self.audio_start:.3f}"]
+            if self.audio_duration is not None:
+                cmd += ["-t", f"{self.audio_duration:.3f}"]
+            cmd += ["-i", self.audio_file]
+        elif self.live_audio:
+            samplerate, channels = self.live_audio
+            cmd += [*no_probe, "-f", "s16le", "-ar", str(samplerate), "-ac", str(channels),
+                    "-thread_queue_size", "1024",
+                    "-i", f"tcp://127.0.0.1:{self._audio_port}?listen=1"]
+
+        cmd += ["-map", "0:v"]
+        cmd += self._video_codec_args()
+        cmd += ["-pix_fmt", "yuv420p"]
+        if self.audio_file or self.live_audio:
+            cmd += ["-map", "1:a?" if self.audio_file else "1:a", "-c:a", audio_codec]
+            if self.audio_file and self.audio_delay > 0:
+                cmd += ["-af", f"adelay=delays={self.audio_delay * 1000:.0f}:all=1"]
+        if self.output_path.lower().endswith((".mp4", ".mov")):
+            if self.fragmented:
+                cmd += ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+            else:
+                cmd += ["-movflags", "+faststart"]
+        cmd.append(self.output_path)
+        return cmd
+
+    def open(self):
+        if not check_ffmpeg():
+            raise EncoderError("ffmpeg not found in PATH")
+
+        if self.live_audio:
+            # Reserve a free loopback port for ffmpeg to listen on
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.bind(("127.0.0.1", 0))
+                self._audio_port = s.getsockname()[1]
+
+        cmd = self.build_command()
+        logging.info(f"Starting ffmpeg encoder: {' '.join(cmd)}")
+        try:
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                          stderr=subprocess.PIPE, creationflags=popen_flags())
+        except OSError as e:
+            raise EncoderError(f"Could not start ffmpeg: {e}")
+
+        threading.Thread(target=self._drain_stderr, name="FFmpegStderr", daemon=True).start()
+        if self.live_audio:
+            # ffmpeg only starts listening once it has opened the video input, so connect in the background
+            threading.Thread(target=self._connect_audio, name="FFmpegAudioConnect", daemon=True).start()
+        return self
+
+    def _drain_stderr(self):
+        for line in self._proc.stderr:
+            self._stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    def _connect_audio(self):
+        deadline = time.monotonic() + 10.0
+        while time.monotonic() < deadline and self._proc.poll() is None:
+            try:
+                sock = socket.create_connection(("127.0.0.1", self._audio_port), timeout=1.0)
+            except OSError:
+                time.sleep(0.02)
+                continue
+            with self._audio_lock:
+                try:
+                    while self._audio_pending:
+                        sock.sendall(self._audio_pending.popleft())
+                except OSError:
+                    logging.warning("Live audio connection to ffmpeg lost")
+                    self._audio_failed = True
+                    self._audio_pending.clear()
+                    sock.close()
+                    return
+                self._audio_sock = sock
+            return
+        with self._audio_lock:
+            self._audio_failed = True
+            dropped = len(self._audio_pending)
+            self._audio_pending.clear()
+        logging.error(f"ffmpeg never accepted the live audio connection ({dropped} audio blocks dropped)")
+
+    def write(self, frame):
+        try:
+            self._proc.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        except (BrokenPipeError, OSError):
+            raise EncoderError(f"ffmpeg encoder exited: {self._error_text()}")
+
+    def write_audio(self, block):
+        if not self.live_audio or self._proc is None:
+            return
+        pcm = (np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        with self._audio_lock:
+            if self._audio_failed:
+                return
+            if self._audio_sock is None:
+                self._audio_pending.append(pcm)
+                return
+            try:
+                self._audio_sock.sendall(pcm)
+            except OSError:
+                logging.warning("Live audio connection to ffmpeg lost")
+                self._audio_sock = None
+                self._audio_failed = True
+
+    def close(self):
+        if self._proc is None:
+            return
+        with self._audio_lock:
+            if self._audio_sock is not None:
+                try:
+                    self._audio_sock.shutdown(socket.SHUT_WR)
+                    self._audio_sock.close()
+                except OSError:
+                    pass
+                self._audio_sock = None
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        returncode = self._proc.wait()
+        self._proc = None
+        if returncode != 0:
+            raise EncoderError(f"ffmpeg exited with code {returncode}: {self._error_text()}")
+
+    def _error_text(self):
+        return " | ".join(self._stderr_tail) or "no output"
+
+def create_encoder(backend, output_path, width, height, fps, **options):
+    """
+    Builds and opens an encoder. `backend` is "auto", "ffmpeg" or "opencv".
+    Falls back to the OpenCV writer when ffmpeg is absent or fails to start.
+    """
+    if backend in (AUTO, FFMPEG) and check_ffmpeg():
+        try:
+            return FFmpegEncoder(output_path, width, height, fps, **options).open()
+        except EncoderError as e:
+            logging.warning(f"FFmpeg encoder unavailable ({e}), falling back to OpenCV")
+    elif backend == FFMPEG:
+        logging.warning("ffmpeg not found, falling back to OpenCV encoder")
+
+    return OpenCVEncoder(output_path, width, height, fps).open()
@@ -1,32 +1,169 @@
 import logging
 import os
+import threading
 import mss
+import numpy as np
+from mss.exception import ScreenShotError
 from PIL import Image
 
 # Setup Logger
 log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'debug_capture.log')
 logging.basicConfig(filename=log_file, level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def array_to_image(frame):
+    """Converts a BGRA frame from the *_array() API into an RGB PIL image."""
+    height, width = frame.shape[:2]
+    if not frame.flags.c_contiguous:
+        frame = np.ascontiguousarray(frame)
+    # Decode straight from the array buffer: one BGRX -> RGB pass, no intermediate bytes copy
+    return Image.frombuffer("RGB", (width, height), frame, "raw", "BGRX", 0, 1)
+
 class CaptureEngine:
+    """
+    Screen grabber backed by a long-lived mss session.
+
+    The session is opened on first use (or explicitly with open()) and reused
+    for every shot until close(). mss handles (X11 display, Windows DCs) are
+    bound to the thread that created them, so an engine may only be used from
+    the thread that opened it. Create one engine per thread.
+    """
+
     def __init__(self):
-        pass
+        self._sct = None
+        self._owner_thread = None
+        self._monitors = None
+        self._layout_dirty = False
+
+    # --- SESSION LIFECYCLE ---
+    def open(self):
+        """Opens the grab session on the calling thread. Safe to call twice."""
+        if self._sct is not None:
+            self._check_thread()
+            return self
+
+        self._sct = mss.mss()
+        self._owner_thread = threading.get_ident()
+        self._monitors = None
+        self._layout_dirty = False
+        logging.info("Capture session opened")
+        return self
+
+    def close(self):
+        """Releases the grab session. The engine can be reopened afterwards."""
+        if self._sct is None:
+            return
+        self._check_thread()
+        try:
+            self._sct.close()
+        finally:
+            self._sct = None
+            self._owner_thread = None
+            self._monitors = None
+            logging.info("Capture session closed")
+
+    @property
+    def is_open(self):
+        return self._sct is not None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _check_thread(self):
+        if threading.get_ident() != self._owner_thread:
+            raise RuntimeError("CaptureEngine session belongs to another thread. "
+                               "Create a separate CaptureEngine for each thread.")
+
+    def _session(self):
+        """Returns the live mss handle, (re)opening it when needed."""
+        if self._sct is not None and self._layout_dirty:
+            # mss enumerates monitors once per handle, so a new layout needs a new handle
+            logging.info("Screen layout changed, reopening capture session")
+            self.close()
+        if self._sct is None:
+            self.open()
+        else:
+            self._check_thread()
+        return self._sct
+
+    # --- MONITOR GEOMETRY ---
+    @property
+    def monitors(self):
+        """Cached copy of the mss monitor list ([0] is the virtual desktop)."""
+        sct = self._session()
+        if self._monitors is None:
+            self._monitors = [dict(m) for m in sct.monitors]
+            logging.debug(f"All monitors: {self._monitors}")
+        return self._monitors
+
+    def invalidate_monitors(self):
+        """
+        Marks the cached monitor layout as stale.
+        May be called from any thread (e.g. Qt screenAdded/screenRemoved handlers);
+        the session is refreshed on the owner thread before the next grab.
+        """
+        self._layout_dirty = True
 
+    def _grab(self, monitor):
+        sct = self._session()
+        try:
+            return sct.grab(monitor)
+        except ScreenShotError:
+            # Displays may have been reconfigured under us, retry once on a fresh session
+            logging.warning("Grab failed, refreshing capture session and retrying", exc_info=True)
+            self.invalidate_monitors()
+            return self._session().grab(monitor)
+
+    def monitor_for(self, monitor_index=None):
+        """Returns the mss monitor dict for a screen index, or the whole desktop for None."""
+        if monitor_index is None:
+            return self.monitors[0]
+        # monitors[0] is all monitors, so screen 1 is monitors[1]
+        return self.monitors[monitor_index + 1]
+
+    # --- ARRAY CAPTURE (zero-copy) ---
+    def grab_array(self, monitor, out=None):
+        """
+        Grabs an mss monitor/region dict as a (height, width, 4) BGRA uint8 array.
+
+        Without `out` the result is a view over the grab buffer (no copy); it stays
+        valid until the caller drops it. With `out` the pixels are copied into the
+        caller's preallocated array, so repeated calls allocate nothing new.
+        """
+        sct_img = self._grab(monitor)
+        frame = np.frombuffer(sct_img.raw, dtype=np.uint8).reshape(sct_img.height, sct_img.width, 4)
+        if out is None:
+            return frame
+        if out.shape != frame.shape or out.dtype != np.uint8:
+            raise ValueError(f"Output buffer shape {out.shape} does not match grab {frame.shape}")
+        np.copyto(out, frame)
+        return out
+
+    def capture_fullscreen_array(self, monitor_index=None, out=None):
+        """Array variant of capture_fullscreen(). See grab_array() for `out`."""
+        return self.grab_array(self.monitor_for(monitor_index), out=out)
+
+    def capture_region_array(self, left, top, width, height, out=None):
+        """Array variant of capture_region(). See grab_array() for `out`."""
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid capture dimensions: {width}x{height}")
+        monitor = {"top": int(top), "left": int(left), "width": int(width), "height": int(height)}
+        return self.grab_array(monitor, out=out)
+
+    # --- PIL CAPTURE ---
     def capture_fullscreen(self, monitor_index=None):
         """Captures all screens combined or a specific monitor by index."""
         try:
-            with mss.mss() as sct:
-                if monitor_index is not None:
-                    # sct.monitors[0] is all monitors, so screen 1 is sct.monitors[1]
-                    monitor = sct.monitors[monitor_index + 1]
-                    logging.info(f"Capturing monitor {monitor_index + 1}: {monitor}")
-                else:
-                    # All monitors
-                    monitor = sct.monitors[0]
-                    logging.info(f"Capturing all monitors: {monitor}")
-                
-                sct_img = sct.grab(monitor)
-                img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-                return img
+            monitor = self.monitor_for(monitor_index)
+            if monitor_index is not None:
+                logging.info(f"Capturing monitor {monitor_index + 1}: {monitor}")
+            else:
+                logging.info(f"Capturing all monitors: {monitor}")
+
+            img = array_to_image(self.grab_array(monitor))
+            return img
         except Exception as e:
             logging.error(f"Fullscreen Capture Error: {e}", exc_info=True)
             print(f"Fullscreen Capture Error: {e}")
@@ -36,19 +173,16 @@ class CaptureEngine:
         """Captures a specific region."""
         if width <= 0 or height <= 0:
             raise ValueError(f"Invalid capture dimensions: {width}x{height}")
-            
+
         try:
             # MSS uses logical coordinates which match PySide's global screen coordinates
             monitor = {"top": int(top), "left": int(left), "width": int(width), "height": int(height)}
             logging.info(f"MSS capturing region: {monitor}")
-            
-            with mss.mss() as sct:
-                logging.debug(f"All monitors: {sct.monitors}")
-                sct_img = sct.grab(monitor)
-                img = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-                logging.info(f"Captured image size: {img.size}")
-                return img
-            
+
+            img = array_to_image(self.grab_array(monitor))
+            logging.info(f"Captured image size: {img.size}")
+            return img
+
         except Exception as e:
             logging.error(f"Capture Error: {e}", exc_info=True)
             print(f"Capture Error: {e}")
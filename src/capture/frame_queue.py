@@ -0,0 +1,131 @@
+import collections
+import threading
+import numpy as np
+
+# Backpressure policies for when the encoder falls behind and every slot is in use
+BLOCK = "block"              # capture waits for the encoder to free a slot
+DROP_OLDEST = "drop_oldest"  # oldest queued frame is overwritten with the new one
+DROP_NEWEST = "drop_newest"  # new frame is discarded, queued frames are kept
+BACKPRESSURE_POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+# Default memory budget used to size the ring when no explicit capacity is given
+DEFAULT_QUEUE_BUDGET_BYTES = 256 * 1024 * 1024
+
+class FrameSlot:
+    """A preallocated frame buffer plus the metadata that travels with it through the pipeline."""
+
+    def __init__(self, index, shape, dtype=np.uint8):
+        self.index = index
+        self.buffer = np.empty(shape, dtype=dtype)
+        self.pts = 0.0          # presentation time in seconds since recording start
+        self.cursor = None      # (x, y) relative to the frame, or None
+        self.repeat = False     # True if the screen is unchanged since the previous frame
+        self.due = 0            # output frames due once this frame is written (FrameClock.frames_due)
+
+class FrameRing:
+    """
+    Bounded ring of preallocated frame buffers connecting a producer (capture)
+    and a consumer (encode) thread.
+
+    Producer: acquire() -> fill slot.buffer -> commit()   (or cancel() to give it back)
+    Consumer: get() -> process slot -> release()
+    """
+
+    def __init__(self, shape, capacity=None, policy=BLOCK, dtype=np.uint8):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+
+        if capacity is None:
+            frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            capacity = max(2, min(16, DEFAULT_QUEUE_BUDGET_BYTES // max(1, frame_bytes)))
+
+        self.policy = policy
+        self.capacity = capacity
+        self.slots = [FrameSlot(i, shape, dtype) for i in range(capacity)]
+
+        self._free = collections.deque(self.slots)
+        self._ready = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Counters
+        self.frames_queued = 0
+        self.frames_dropped = 0
+        self.max_depth = 0
+
+    # --- PRODUCER SIDE ---
+    def acquire(self, timeout=None):
+        """
+        Returns a free slot to fill, or None if the frame should be skipped
+        (ring closed, timeout, or dropped under the drop_newest policy).
+        """
+        with self._cond:
+            if self._closed:
+                return None
+
+            if not self._free:
+                if self.policy == DROP_NEWEST:
+                    self.frames_dropped += 1
+                    return None
+                if self.policy == DROP_OLDEST and self._ready:
+                    # Recycle the stalest queued frame for the new one
+                    self.frames_dropped += 1
+                    return self._ready.popleft()
+                # BLOCK (or every slot is currently held by the consumer)
+                self._cond.wait_for(lambda: self._free or self._closed, timeout)
+                if self._closed or not self._free:
+                    return None
+
+            return self._free.popleft()
+
+    def commit(self, slot):
+        """Queues a filled slot for the consumer."""
+        with self._cond:
+            self._ready.append(slot)
+            self.frames_queued += 1
+            self.max_depth = max(self.max_depth, len(self._ready))
+            self._cond.notify_all()
+
+    def cancel(self, slot):
+        """Returns an acquired slot without queueing it."""
+        self.release(slot)
+
+    def close(self):
+        """Stops accepting frames. The consumer still drains what is queued."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    # --- CONSUMER SIDE ---
+    def get(self, timeout=None):
+        """Returns the next queued slot, or None once the ring is closed and drained (or on timeout)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._ready or self._closed, timeout)
+            if self._ready:
+                return self._ready.popleft()
+            return None
+
+    def release(self, slot):
+        """Hands a consumed slot back to the producer."""
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    # --- STATS ---
+    @property
+    def depth(self):
+        return len(self._ready)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._ready),
+                "queue_max_depth": self.max_depth,
+                "queue_capacity": self.capacity,
+                "frames_queued": self.frames_queued,
+                "frames_dropped": self.frames_dropped,
+            }
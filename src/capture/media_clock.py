@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Shared recording clock and the per-recording session metadata it produces.
+#
+# Session file (next to the video, "<video>_session.json"):
+#   video_start / audio_start  media time of the first frame / first recorded sample (seconds)
+#   audio_offset               audio_start - video_start: positive when the audio begins after
+#                              the first frame, i.e. audio sample 0 plays at this video time
+#   audio_muxed                the offset is already applied to the audio inside the video file
+#   audio_stems                one file per source (mic, system) when recorded separately; they
+#                              share audio_start / audio_offset
+#   pauses                     [media time, seconds] of every pause (left out of both tracks)
+#   audio_duration             seconds of recorded audio
+#   audio_silence              [audio time, seconds] of every silent run (capture.audio_levels),
+#                              on the audio's own timeline: video time = audio time + audio_offset
+#   silence_threshold_db       RMS level under which audio counted as silent
+
+SESSION_VERSION = 1
+SILENCE_MARGIN = 0.25 # Seconds of silence kept around the audible part when trimming
+
+def session_path(video_path):
+    return os.path.splitext(video_path)[0] + "_session.json"
+
+class MediaClock:
+    """
+    Recording timeline shared by the video and audio recorders of one session.
+
+    Media time runs on time.perf_counter() from start(), with paused spans left out, so a
+    frame grabbed and a sample captured at the same instant get the same media time however
+    late each recorder got going. Each track stamps the perf_counter() time its first frame
+    or sample was taken; the difference is the A/V offset that muxing and export apply.
+    """
+
+    def __init__(self):
+        self._origin = None
+        self._pauses = [] # [start, end] on perf_counter(); end is None while paused
+        self._lock = threading.Lock()
+        self._track_starts = {} # track name -> perf_counter() time of its first frame/sample
+
+    @property
+    def started(self):
+        return self._origin is not None
+
+    def start(self, at=None):
+        self._origin = at if at is not None else time.perf_counter()
+        return self._origin
+
+    def pause(self, at=None):
+        """Returns the perf_counter() time of the pause, to hand on to the recorders."""
+        at = at if at is not None else time.perf_counter()
+        with self._lock:
+            if not self._pauses or self._pauses[-1][1] is not None:
+                self._pauses.append([at, None])
+        return at
+
+    def resume(self, at=None):
+        at = at if at is not None else time.perf_counter()
+        with self._lock:
+            if self._pauses and self._pauses[-1][1] is None:
+                self._pauses[-1][1] = at
+        return at
+
+    def media_time(self, t=None):
+        """perf_counter() time -> seconds since start() without the paused spans (a time inside a pause maps to its start)."""
+        t = t if t is not None else time.perf_counter()
+        paused = 0.0
+        with self._lock:
+            for start, end in self._pauses:
+                if t <= start:
+                    break
+                if end is None or t < end:
+                    t = start
+                    break
+                paused += end - start
+        return t - self._origin - paused
+
+    def now(self):
+        return self.media_time()
+
+    def stamp(self, track, t):
+        """Records `t` (perf_counter()) as the time the first frame/sample of `track` was taken."""
+        self._track_starts[track] = t
+
+    def track_start(self, track):
+        """Media time of the first frame/sample of `track`, or None if it has not started."""
+        t = self._track_starts.get(track)
+        return None if t is None or self._origin is None else self.media_time(t)
+
+    def offset(self, track, reference="video"):
+        """Seconds `track` starts after `reference` (negative: before), or None if either is missing."""
+        start, ref = self.track_start(track), self.track_start(reference)
+        if start is None or ref is None:
+            return None
+        return start - ref
+
+    def pauses(self):
+        """[(media time, seconds)] of every finished pause."""
+        with self._lock:
+            spans = [(start, end) for start, end in self._pauses if end is not None]
+        return [(self.media_time(start), end - start) for start, end in spans]
+
+def write_session(video_path, clock, audio_path=None, audio_muxed=False, samplerate=None, channels=None,
+                  stems=None, silence=None):
+    """Writes the session metadata of a recording next to `video_path`; returns its path."""
+    offset = clock.offset("audio")
+    session = {
+        "version": SESSION_VERSION,
+        "clock": "perf_counter",
+        "video": os.path.basename(video_path),
+        "audio": os.path.basename(audio_path) if audio_path else None,
+        "audio_muxed": audio_muxed,
+        "audio_stems": [os.path.basename(path) for path in stems or []],
+        "video_start": _rounded(clock.track_start("video")),
+        "audio_start": _rounded(clock.track_start("audio")),
+        "audio_offset": _rounded(offset),
+        "audio_samplerate": samplerate,
+        "audio_channels": channels,
+        "pauses": [[round(at, 6), round(length, 6)] for at, length in clock.pauses()],
+    }
+    if silence is not None:
+        session["audio_duration"] = silence["duration"]
+        session["audio_silence"] = [list(segment) for segment in silence["segments"]]
+        session["silence_threshold_db"] = silence["threshold_db"]
+    path = session_path(video_path)
+    with open(path, "w") as f:
+        json.dump(session, f, indent=2)
+    logging.info(f"Session metadata: {path} (audio offset {offset if offset is None else f'{offset * 1000:+.1f} ms'})")
+    return path
+
+def load_session(video_path):
+    """Session metadata of a recording, or None if there is none (older recordings, other files)."""
+    path = session_path(video_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable session metadata {path}: {e}")
+        return None
+
+def audio_offset(video_path):
+    """Seconds the separately recorded audio of `video_path` starts after its first frame (0.0 if unknown)."""
+    session = load_session(video_path)
+    return (session or {}).get("audio_offset") or 0.0
+
+def audible_range(video_path, margin=SILENCE_MARGIN):
+    """
+    (start, end) in video seconds without the leading and trailing silence of the recorded audio,
+    from the session metadata (no decoding); end is None when the audio does not end in silence.
+    None if unknown (no session or no silence data) or if the audio is silent throughout.
+    """
+    session = load_session(video_path)
+    if not session or session.get("audio_silence") is None or session.get("audio_duration") is None:
+        return None
+    segments, duration = session["audio_silence"], session["audio_duration"]
+    start, end = 0.0, None
+    if segments and segments[0][0] <= 0.0:
+        start = segments[0][0] + segments[0][1]
+        if start >= duration - 0.01:
+            return None
+        start = max(0.0, start - margin)
+    if segments and segments[-1][0] + segments[-1][1] >= duration - 0.01: # Rounded to ms
+        end = min(duration, segments[-1][0] + margin)
+    offset = session.get("audio_offset") or 0.0
+    return max(0.0, start + offset), (end + offset if end is not None else None)
+
+def _rounded(value):
+    return None if value is None else round(value, 6)
@@ -0,0 +1,161 @@
+import logging
+import threading
+import time
+import cv2
+import numpy as np
+from capture.engine import CaptureEngine
+
+class _MonitorWorker(threading.Thread):
+    """Grabs one monitor on request, with its own CaptureEngine (mss handles are per thread)."""
+
+    def __init__(self, index, monitor):
+        super().__init__(name=f"MonitorGrab{index + 1}", daemon=True)
+        self.monitor = monitor
+        self.target = None # Canvas view to grab into
+        self.error = None
+        self.busy_seconds = 0.0
+        self.ready = threading.Event()
+        self._go = threading.Event()
+        self._done = threading.Event()
+        self._stopping = False
+
+    def run(self):
+        try:
+            with CaptureEngine() as engine:
+                self.ready.set()
+                while True:
+                    self._go.wait()
+                    self._go.clear()
+                    if self._stopping:
+                        break
+                    start = time.perf_counter()
+                    try:
+                        frame = engine.grab_array(self.monitor)
+                        if frame.shape == self.target.shape:
+                            np.copyto(self.target, frame)
+                        else:
+                            # HiDPI screens grab at physical resolution; fit it into the logical slot
+                            height, width = self.target.shape[:2]
+                            self.target[...] = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                    except Exception as e:
+                        self.error = e
+                    self.busy_seconds += time.perf_counter() - start
+                    self._done.set()
+        except Exception as e:
+            # Opening the session failed
+            self.error = e
+            self.ready.set()
+
+    def request(self, target):
+        self.target = target
+        self._done.clear()
+        self._go.set()
+
+    def wait(self):
+        self._done.wait()
+
+    def stop(self):
+        self._stopping = True
+        self._go.set()
+
+class MultiMonitorGrabber:
+    """
+    Grabs several monitors at the same time, each on its own thread and mss handle, and
+    stitches them into one canvas laid out like the virtual desktop.
+
+    Instead of one huge blocking grab of the whole desktop (mss monitors[0]), every screen is
+    grabbed in parallel straight into its place in the caller's (preallocated) canvas.
+    The canvas is the bounding box of the monitors, rounded up to even dimensions;
+    areas no monitor covers are blacked out on every grab (only those areas, so it costs
+    next to nothing), whatever canvas buffer the caller hands in.
+    """
+
+    def __init__(self, monitors):
+        if not monitors:
+            raise ValueError("No monitors to capture")
+        self.monitors = [dict(m) for m in monitors]
+        self.left = min(m["left"] for m in self.monitors)
+        self.top = min(m["top"] for m in self.monitors)
+        right = max(m["left"] + m["width"] for m in self.monitors)
+        bottom = max(m["top"] + m["height"] for m in self.monitors)
+        self.width = (right - self.left + 1) // 2 * 2
+        self.height = (bottom - self.top + 1) // 2 * 2
+        # (x, y, w, h) of each monitor on the canvas
+        self.rects = [(m["left"] - self.left, m["top"] - self.top, m["width"], m["height"]) for m in self.monitors]
+
+        self._gaps = self._gap_rects() # (x, y, w, h) of the canvas areas no monitor covers
+        self._workers = []
+        self.grabs = 0
+
+    def _gap_rects(self):
+        """The uncovered canvas area as rectangles: per horizontal band between monitor edges, the x ranges no monitor spans."""
+        edges = sorted({0, self.height} | {y for _, y, _, _ in self.rects} | {y + h for _, y, _, h in self.rects})
+        gaps = []
+        for y0, y1 in zip(edges, edges[1:]):
+            spans = sorted((x, x + w) for x, y, w, h in self.rects if y <= y0 and y + h >= y1)
+            cursor = 0
+            for x0, x1 in spans + [(self.width, self.width)]:
+                if x0 > cursor:
+                    gaps.append((cursor, y0, x0 - cursor, y1 - y0))
+                cursor = max(cursor, x1)
+        return gaps
+
+    @property
+    def shape(self):
+        return (self.height, self.width, 4)
+
+    @property
+    def desktop(self):
+        """The canvas as an mss-style monitor dict in desktop coordinates."""
+        return {"left": self.left, "top": self.top, "width": self.width, "height": self.height}
+
+    def start(self):
+        self._workers = [_MonitorWorker(i, m) for i, m in enumerate(self.monitors)]
+        for worker in self._workers:
+            worker.start()
+        for worker in self._workers:
+            worker.ready.wait()
+        errors = [w.error for w in self._workers if w.error is not None]
+        if errors:
+            self.close()
+            raise errors[0]
+        logging.info(f"Multi-monitor capture: {len(self.monitors)} monitors on a {self.width}x{self.height} canvas")
+        return self
+
+    def grab(self, out):
+        """Grabs every monitor into `out` (a canvas of `shape`, BGRA uint8) and returns it."""
+        if out.shape != self.shape:
+            raise ValueError(f"Canvas shape {out.shape} does not match {self.shape}")
+        for x, y, w, h in self._gaps:
+            out[y:y + h, x:x + w] = 0
+
+        for worker, (x, y, w, h) in zip(self._workers, self.rects):
+            worker.request(out[y:y + h, x:x + w])
+        for worker in self._workers:
+            worker.wait()
+        self.grabs += 1
+
+        for worker in self._workers:
+            if worker.error is not None:
+                error, worker.error = worker.error, None
+                raise error
+        return out
+
+    def close(self):
+        """Stops the worker threads; stats() stays available."""
+        for worker in self._workers:
+            worker.stop()
+        for worker in self._workers:
+            worker.join(5)
+
+    def stats(self):
+        """Mean grab time per monitor in milliseconds."""
+        grabs = max(1, self.grabs)
+        return {f"monitor{i + 1}_grab_ms": round(w.busy_seconds / grabs * 1000, 2)
+                for i, w in enumerate(self._workers)}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
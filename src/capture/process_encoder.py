@@ -0,0 +1,393 @@
+import collections
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from capture.encoders import create_encoder, EncoderError
+from capture.encode_stage import EncodeStage
+from capture.webcam import WebcamReader
+from capture.compositor import OverlayCompositor
+from capture.frame_queue import BLOCK, DROP_OLDEST, DROP_NEWEST, BACKPRESSURE_POLICIES, DEFAULT_QUEUE_BUDGET_BYTES
+from capture.vfr import TimestampSidecar
+
+# Worker -> parent status messages
+STATUS_STARTED = "started"
+STATUS_ERROR = "error"
+STATUS_FINISHED = "finished"
+
+class SharedFrameSlot:
+    """Parent-side view of one shared-memory frame slot (same fields as FrameSlot)."""
+
+    def __init__(self, index, buffer):
+        self.index = index
+        self.buffer = buffer
+        self.pts = 0.0
+        self.cursor = None
+        self.repeat = False
+        self.due = 0
+
+class ProcessEncoder:
+    """
+    Runs compositing and encoding (EncodeStage) in a separate worker process so it never
+    competes with the capture loop or the Qt GUI thread for the GIL.
+
+    Frames live in multiprocessing.shared_memory slots written in place by the capture
+    stage; only small (slot, pts, cursor, repeat, due) descriptors cross the process boundary.
+    The producer API (acquire/commit/cancel/close, stats) matches FrameRing, so
+    VideoRecorder drives both the same way.
+    """
+
+    def __init__(self, shape, config, capacity=None, policy=BLOCK):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+
+        frame_bytes = int(np.prod(shape))
+        if capacity is None:
+            capacity = max(2, min(16, DEFAULT_QUEUE_BUDGET_BYTES // max(1, frame_bytes)))
+
+        self.shape = tuple(shape)
+        self.capacity = capacity
+        self.policy = policy
+        self.config = config
+
+        self._ctx = mp.get_context("spawn") # Never fork a process that has Qt threads running
+        self._shms = []
+        try:
+            for _ in range(capacity):
+                self._shms.append(shared_memory.SharedMemory(create=True, size=frame_bytes))
+        except Exception:
+            self._release_shared_memory() # e.g. /dev/shm full: don't leak the slots already made
+            raise
+        self.slots = [SharedFrameSlot(i, np.ndarray(self.shape, dtype=np.uint8, buffer=shm.buf))
+                      for i, shm in enumerate(self._shms)]
+
+        self._frame_queue = self._ctx.Queue()
+        self._free_queue = self._ctx.Queue()
+        self._status_queue = self._ctx.Queue()
+        self._audio_queue = self._ctx.Queue(maxsize=512) if config.get("live_audio") else None
+        self._consumed = self._ctx.Value("q", 0)
+        self._worker_dropped = self._ctx.Value("q", 0)
+        self._written = self._ctx.Value("q", 0)
+        self._busy = self._ctx.Value("d", 0.0)
+
+        self._local_free = collections.deque(self.slots)
+        self._closed = False
+        self._process = None
+        self.final_stats = None
+        self.error = None
+
+        # Counters (producer side)
+        self.frames_queued = 0
+        self._producer_dropped = 0
+        self.max_depth = 0
+
+    # --- LIFECYCLE ---
+    def start(self, timeout=30.0):
+        """
+        Starts the worker and waits until its encoder is open. Raises EncoderError on failure
+        (or whatever starting the process raised); the shared memory is freed either way.
+        """
+        try:
+            return self._start(timeout)
+        except BaseException:
+            if self._process is not None and self._process.is_alive():
+                self._process.terminate()
+                self._process.join(5)
+            self._release_shared_memory()
+            raise
+
+    def _start(self, timeout):
+        self._process = self._ctx.Process(
+            target=_worker_main,
+            args=([shm.name for shm in self._shms], self.shape, self.capacity, self.policy, self.config,
+                  self._frame_queue, self._free_queue, self._status_queue, self._audio_queue,
+                  self._consumed, self._worker_dropped, self._written, self._busy),
+            name="OpenCaptureEncoder",
+            daemon=True,
+        )
+        self._process.start()
+
+        try:
+            status = self._status_queue.get(timeout=timeout)
+        except queue.Empty:
+            self._process.terminate()
+            raise EncoderError("Encoder process did not start in time")
+        if status[0] == STATUS_ERROR:
+            self._process.join(5)
+            raise EncoderError(status[1])
+        logging.info(f"Encoder process started (pid {self._process.pid}, {status[1]})")
+        return self
+
+    def poll_error(self):
+        """Returns an error message if the worker failed or died, otherwise None. Non-blocking."""
+        try:
+            status = self._status_queue.get_nowait()
+        except queue.Empty:
+            status = None
+        if status is not None:
+            if status[0] == STATUS_ERROR:
+                self.error = status[1]
+            elif status[0] == STATUS_FINISHED:
+                self.final_stats = status[1]
+        if (self.error is None and self.final_stats is None
+                and self._process is not None and not self._process.is_alive()):
+            self.error = f"Encoder process exited unexpectedly (code {self._process.exitcode})"
+        return self.error
+
+    def finish(self, timeout=60.0):
+        """
+        Waits for the worker to drain, finalize the file and exit, then frees the shared memory.
+        Returns the worker's final stats, or raises EncoderError if it failed.
+        """
+        self.close()
+        error = self.error
+        deadline = time.monotonic() + timeout
+        while self.final_stats is None and error is None:
+            try:
+                status = self._status_queue.get(timeout=0.5)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    error = f"Encoder process exited unexpectedly (code {self._process.exitcode})"
+                elif time.monotonic() > deadline:
+                    error = "Encoder process did not finish in time"
+                    self._process.terminate()
+                continue
+            if status[0] == STATUS_FINISHED:
+                self.final_stats = status[1]
+            elif status[0] == STATUS_ERROR:
+                error = status[1]
+
+        self._process.join(10)
+        self._release_shared_memory()
+        if error is not None:
+            raise EncoderError(error)
+        return self.final_stats
+
+    def _release_shared_memory(self):
+        self.slots = []
+        for shm in self._shms:
+            try:
+                shm.close()
+            except BufferError:
+                pass # A caller still holds a view; the mapping goes away with it
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shms = []
+
+    # --- PRODUCER SIDE (FrameRing compatible) ---
+    def acquire(self, timeout=None):
+        if self._closed:
+            return None
+        if self._local_free:
+            return self._local_free.popleft()
+
+        if self.policy == DROP_NEWEST:
+            try:
+                index = self._free_queue.get_nowait()
+            except queue.Empty:
+                self._producer_dropped += 1
+                return None
+        else:
+            # BLOCK, and DROP_OLDEST where the worker discards its oldest backlog to free a slot
+            waited = 0.0
+            while True:
+                try:
+                    index = self._free_queue.get(timeout=0.25)
+                    break
+                except queue.Empty:
+                    waited += 0.25
+                    # Give up if the worker died (poll_error() reports why) or the caller's timeout ran out
+                    if not self._process.is_alive() or (timeout is not None and waited >= timeout):
+                        return None
+        return self.slots[index]
+
+    def commit(self, slot):
+        self._frame_queue.put((slot.index, slot.pts, slot.cursor, slot.repeat, slot.due))
+        self.frames_queued += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def cancel(self, slot):
+        self._local_free.append(slot)
+
+    def close(self):
+        """Stops accepting frames and tells the worker to finish once the queue is drained."""
+        if self._closed:
+            return
+        self._closed = True
+        self._frame_queue.put(None)
+        if self._audio_queue is not None:
+            self._audio_queue.put(None)
+
+    @property
+    def supports_audio(self):
+        return self._audio_queue is not None
+
+    def write_audio(self, block):
+        if self._audio_queue is None or self._closed:
+            return
+        try:
+            self._audio_queue.put_nowait(block)
+        except queue.Full:
+            logging.warning("Encoder process audio queue full, dropping block")
+
+    # --- STATS ---
+    @property
+    def frames_dropped(self):
+        return self._producer_dropped + self._worker_dropped.value
+
+    @property
+    def frames_written(self):
+        return self._written.value
+
+    @property
+    def busy_seconds(self):
+        """Time the worker's encode stage has spent processing frames."""
+        return self._busy.value
+
+    @property
+    def depth(self):
+        return self.frames_queued - self._consumed.value
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def finished(self):
+        """True once finish() has released the shared memory."""
+        return self._process is not None and not self._shms
+
+    def stats(self):
+        stats = {
+            "queue_depth": max(0, self.depth),
+            "queue_max_depth": self.max_depth,
+            "queue_capacity": self.capacity,
+            "frames_queued": self.frames_queued,
+            "frames_dropped": self.frames_dropped,
+        }
+        if self.final_stats:
+            # Webcam stats are only reported by the worker once it finishes
+            stats.update(self.final_stats.get("webcam", {}))
+        return stats
+
+def _worker_main(shm_names, shape, capacity, policy, config, frame_queue, free_queue, status_queue,
+                 audio_queue, consumed, dropped, written, busy):
+    """Encoder worker process: attaches to the frame slots and runs an EncodeStage over them."""
+    if config.get("log_file"):
+        logging.basicConfig(filename=config["log_file"], level=logging.DEBUG,
+                            format='%(asctime)s - %(levelname)s - [encoder] %(message)s')
+
+    shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    buffers = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf) for shm in shms]
+
+    encoder = None
+    stage = None
+    timestamps = None
+    try:
+        if config.get("segment_seconds") or config.get("segment_bytes"):
+            from capture.segments import create_segmented_encoder
+            encoder = create_segmented_encoder(config["encoder"], config["output_path"], config["width"],
+                                               config["height"], config["fps"],
+                                               segment_seconds=config["segment_seconds"],
+                                               segment_bytes=config["segment_bytes"], **config["encoder_options"])
+        else:
+            encoder = create_encoder(config["encoder"], config["output_path"], config["width"], config["height"],
+                                     config["fps"], **config["encoder_options"])
+        compositor = OverlayCompositor(config["width"], config["height"], **config["overlay_options"])
+        webcam = None
+        if config["webcam_enabled"]:
+            webcam = WebcamReader.open(compositor.pip_width, square=compositor.pip_square)
+        if config.get("timestamps_path"):
+            timestamps = TimestampSidecar(config["timestamps_path"])
+        stage = EncodeStage(encoder, config["width"], config["height"], config["fps"],
+                            webcam=webcam, timestamps=timestamps, compositor=compositor)
+    except Exception as e:
+        logging.error(f"Encoder process setup failed: {e}", exc_info=True)
+        status_queue.put((STATUS_ERROR, str(e)))
+        if encoder is not None:
+            try: encoder.close()
+            except Exception: pass
+        return
+
+    status_queue.put((STATUS_STARTED, type(encoder).__name__))
+
+    audio_thread = None
+    if audio_queue is not None:
+        def pump_audio():
+            while True:
+                block = audio_queue.get()
+                if block is None:
+                    break
+                encoder.write_audio(block)
+        audio_thread = threading.Thread(target=pump_audio, name="EncoderAudio", daemon=True)
+        audio_thread.start()
+
+    error = None
+    pending = collections.deque()
+    try:
+        while True:
+            if not pending:
+                pending.append(frame_queue.get())
+            # Pick up everything else already queued so backlog is visible
+            while True:
+                try:
+                    pending.append(frame_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if policy == DROP_OLDEST:
+                # Every slot is waiting on us: discard the oldest frames so capture can continue
+                while len(pending) >= capacity and pending[0] is not None:
+                    stale = pending.popleft()
+                    with dropped.get_lock():
+                        dropped.value += 1
+                    with consumed.get_lock():
+                        consumed.value += 1
+                    free_queue.put(stale[0])
+
+            desc = pending.popleft()
+            if desc is None:
+                break # Producer closed and everything before it is done
+
+            index, pts, cursor, repeat, due = desc
+            stage.process(buffers[index], pts, cursor, repeat, due)
+            written.value = stage.frame_count
+            busy.value = stage.busy_seconds
+            with consumed.get_lock():
+                consumed.value += 1
+            free_queue.put(index)
+
+    except Exception as e:
+        logging.error(f"Encoder process error: {e}", exc_info=True)
+        error = e
+        status_queue.put((STATUS_ERROR, str(e)))
+
+    finally:
+        if audio_thread is not None:
+            audio_thread.join(5)
+        stage.close()
+        try:
+            encoder.close()
+        except EncoderError as e:
+            if error is None:
+                error = e
+                status_queue.put((STATUS_ERROR, str(e)))
+        if timestamps is not None:
+            timestamps.close()
+        del buffers
+        for shm in shms:
+            shm.close()
+
+    if error is None:
+        status_queue.put((STATUS_FINISHED, {
+            "frames_written": stage.frame_count,
+            "frames_repeated": stage.frames_repeated,
+            "timestamps_count": timestamps.count if timestamps is not None else 0,
+            "audio_muxed": audio_queue is not None and encoder.supports_audio,
+            "webcam": stage.stats(),
+        }))
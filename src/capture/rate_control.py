@@ -0,0 +1,200 @@
+import logging
+import math
+import time
+
+DEFAULT_MIN_FPS = 10.0
+DEFAULT_MAX_FPS = 60.0
+
+# Rates the controller steps between (plus the configured maximum itself, e.g. 59.94)
+STANDARD_RATES = (10, 12, 15, 20, 24, 25, 30, 40, 48, 50, 60, 72, 75, 90, 100, 120, 144, 165, 240)
+
+def fps_ladder(min_fps, max_fps):
+    """Sorted frame rates between the bounds, always ending at max_fps."""
+    rungs = {float(r) for r in STANDARD_RATES if min_fps <= r < max_fps}
+    rungs.add(float(max_fps))
+    return sorted(rungs)
+
+class FrameClock:
+    """
+    Frame schedule on time.perf_counter() in recording time, i.e. with pauses left out.
+
+    The capture loop waits for time_to_next() and then claims the slot with tick(),
+    which returns the frame's pts. If the loop fell behind by whole intervals, the
+    missed slots are skipped (and counted) instead of being rushed through.
+    The rate can change at any time; the next deadline never moves further out.
+
+    The clock also keeps the timeline of the file, encoded at a fixed `output_fps`:
+    after tick(), `frames_due` is how many output frames the recording must hold once
+    the claimed slot is over. A CFR writer repeats a frame only to reach that count,
+    i.e. for output slots that fall into a slower capture slot or into missed ones.
+    """
+
+    def __init__(self, fps, output_fps=None):
+        self.fps = fps
+        self.interval = 1.0 / fps
+        self.output_fps = output_fps or fps
+        self._origin = None
+        self._paused_at = None
+        self._paused_total = 0.0
+        self._next = 0.0 # Recording time of the next frame slot
+
+        # Counters
+        self.ticks = 0
+        self.missed = 0
+        self.frames_due = 0
+
+    def start(self):
+        """Starts the schedule; returns its origin on time.perf_counter()."""
+        self._origin = time.perf_counter()
+        self._paused_at = None
+        self._paused_total = 0.0
+        self._next = 0.0
+        self.frames_due = 0
+        return self._origin
+
+    def now(self):
+        """Seconds of recording time since start()."""
+        clock = self._paused_at if self._paused_at is not None else time.perf_counter()
+        return clock - self._origin - self._paused_total
+
+    def pause(self, at=None):
+        """`at`: the perf_counter() time the pause was requested, if not now."""
+        if self._paused_at is None:
+            self._paused_at = at if at is not None else time.perf_counter()
+
+    def resume(self, at=None):
+        if self._paused_at is not None:
+            self._paused_total += (at if at is not None else time.perf_counter()) - self._paused_at
+            self._paused_at = None
+            # Show the screen as it is on resume rather than waiting out the interval
+            self._next = min(self._next, self.now())
+
+    def time_to_next(self):
+        """Seconds until the next frame is due (zero or negative: due now)."""
+        return self._next - self.now()
+
+    def tick(self):
+        """Claims the due frame slot and returns its pts."""
+        now = self.now()
+        behind = now - self._next
+        if behind >= self.interval:
+            skipped = int(behind / self.interval)
+            self.missed += skipped
+            self._next += skipped * self.interval
+        self._next += self.interval
+        self.ticks += 1
+        # Output slots up to the end of this one (the epsilon absorbs float error at equal rates)
+        self.frames_due = max(self.frames_due, math.ceil(self._next * self.output_fps - 1e-6))
+        return now
+
+    def set_fps(self, fps):
+        self.fps = fps
+        self.interval = 1.0 / fps
+        self._next = min(self._next, self.now() + self.interval)
+
+class AdaptiveRateController:
+    """
+    Steps the capture frame rate along fps_ladder(min_fps, max_fps) from measured cost.
+
+    Once per `window` seconds it works out the average cost of a frame in the capture stage
+    (grabbing) and in the encode stage (conversion, compositing, encoding), and from that
+    the load each stage would have at the current rate (1.0 = busy all the time).
+    The busier stage is the bottleneck:
+    - above `high` (or with more than 10% of frame slots missed) the rate drops straight
+      to the highest rung expected to run at `target` load
+    - when one rung up is still expected to stay below `low` for `settle_windows` windows
+      in a row, it steps up one rung
+
+    Every change is logged and kept in `changes` for auditing.
+    """
+
+    def __init__(self, max_fps, min_fps=DEFAULT_MIN_FPS, window=1.0, target=0.75, high=0.9, low=0.65,
+                 settle_windows=3):
+        min_fps = min(min_fps, max_fps)
+        self.ladder = fps_ladder(min_fps, max_fps)
+        self.fps = self.ladder[-1]
+        self.window = window
+        self.target = target
+        self.high = high
+        self.low = low
+        self.settle_windows = settle_windows
+
+        self.changes = [] # (recording time, old fps, new fps, reason)
+        self._calm = 0
+        self._last = None # (time, frames, grab busy, encode busy, missed) at the start of the window
+        self.grab_load = 0.0
+        self.encode_load = 0.0
+
+    def calibrate(self, frame_cost):
+        """Picks the starting rate from the measured cost of one frame (seconds)."""
+        fps = self._fit(frame_cost * self.fps)
+        if fps != self.fps:
+            self._change(0.0, fps, f"calibrated at {frame_cost * 1000:.1f} ms/frame")
+        # The output is encoded at this rate, so it is also the ceiling from now on
+        self.ladder = [rung for rung in self.ladder if rung <= fps]
+        return self.fps
+
+    def update(self, now, frames, grab_busy, encode_busy, missed):
+        """
+        Feeds cumulative counters at recording time `now`: frames captured, seconds spent
+        grabbing, seconds spent in the encode stage and frame slots missed so far.
+        Returns the new rate when it changes, otherwise None.
+        """
+        if self._last is None:
+            self._last = (now, frames, grab_busy, encode_busy, missed)
+            return None
+        elapsed = now - self._last[0]
+        if elapsed < self.window:
+            return None
+
+        # Per-frame cost times rate, so a saturated stage still shows how far over it is
+        count = max(1, frames - self._last[1])
+        self.grab_load = (grab_busy - self._last[2]) / count * self.fps
+        self.encode_load = (encode_busy - self._last[3]) / count * self.fps
+        missed_ratio = (missed - self._last[4]) / max(1.0, elapsed * self.fps)
+        self._last = (now, frames, grab_busy, encode_busy, missed)
+
+        load = max(self.grab_load, self.encode_load)
+        reason = (f"grab {self.grab_load:.0%}, encode {self.encode_load:.0%}, "
+                  f"missed {missed_ratio:.0%}")
+        index = self.ladder.index(self.fps)
+
+        if (load > self.high or missed_ratio > 0.1) and index > 0:
+            self._calm = 0
+            # Aim straight for the target load, at least one rung down
+            fps = min(self._fit(load), self.ladder[index - 1])
+            return self._change(now, fps, reason)
+
+        if index + 1 < len(self.ladder) and load * self.ladder[index + 1] / self.fps < self.low:
+            self._calm += 1
+            if self._calm >= self.settle_windows:
+                self._calm = 0
+                return self._change(now, self.ladder[index + 1], reason)
+        else:
+            self._calm = 0
+        return None
+
+    def _fit(self, load):
+        """Highest rung expected to run at `target` load, given `load` at the current rate."""
+        if load <= 0:
+            return self.ladder[-1]
+        best = self.ladder[0]
+        for fps in self.ladder:
+            if load * fps / self.fps <= self.target:
+                best = fps
+        return best
+
+    def _change(self, now, fps, reason):
+        old = self.fps
+        self.fps = fps
+        self.changes.append((round(now, 3), old, fps, reason))
+        logging.info(f"Frame rate {old:g} -> {fps:g} fps at {now:.1f}s ({reason})")
+        return fps
+
+    def stats(self):
+        return {
+            "capture_fps": self.fps,
+            "rate_changes": len(self.changes),
+            "grab_load": round(self.grab_load, 3),
+            "encode_load": round(self.encode_load, 3),
+        }
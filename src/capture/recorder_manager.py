@@ -1,15 +1,26 @@
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QObject, Signal, QTimer
 from PySide6.QtWidgets import QApplication
 import os
 import datetime
 import logging
+import threading
+import time
 from capture.video import VideoRecorder
-from capture.audio import AudioRecorderQueue
+from capture.media_clock import MediaClock, write_session
+from capture.audio_formats import (DEFAULT_AUDIO_FORMAT, DEFAULT_SAMPLERATE, DEFAULT_CHANNELS,
+                                   audio_extension, supported_samplerate)
+from capture.rate_control import DEFAULT_MIN_FPS, DEFAULT_MAX_FPS
 from ui.recording_controls import RecordingControls
 from ui.countdown import CountdownOverlay
 
+LEVEL_INTERVAL_MS = 100 # Level meter refresh; the audio thread meters every block, the UI polls
+
 class RecorderManager(QObject):
     recording_finished = Signal(list) # Emits list of file paths created
+    replay_saved = Signal(str) # Path of a saved replay clip
+    replay_failed = Signal(str)
+    audio_levels = Signal(list) # [(source name, rms dBFS, peak dBFS)], LEVEL_INTERVAL_MS apart
+    _segments_joined = Signal() # Internal: segment join finished on its worker thread
 
     def __init__(self):
         super().__init__()
@@ -18,45 +29,130 @@ class RecorderManager(QObject):
         self.controls = None
         self.countdown = None # New attribute
         self.output_files = []
+        self.replay_buffer = None
+        self.pcm_ring = None
+        self.media_clock = None # Recording clock shared by the video and audio of a session
+        self.save_dir = None
+        self._saving_replay = False
+        self._usage_timer = None
+        self._level_timer = None
+        self._segments_joined.connect(self._finish_recording)
 
     def start_recording(self, region=None, monitor_index=None, 
-                        input_mic=True, input_webcam=False, capture_cursor=True):
+                        input_mic=True, input_webcam=False, capture_cursor=True,
+                        backpressure="block", timing="cfr",
+                        encoder="auto", encoder_options=None, mux_audio=False,
+                        encode_mode="thread", overlay_options=None,
+                        replay_seconds=None, replay_budget_bytes=None,
+                        segment_seconds=None, segment_bytes=None,
+                        adaptive_fps=False, min_fps=DEFAULT_MIN_FPS, max_fps=DEFAULT_MAX_FPS,
+                        output_size=None, output_scale=None, multi_monitor=False, split_monitors=False,
+                        audio_format=DEFAULT_AUDIO_FORMAT, audio_samplerate=DEFAULT_SAMPLERATE,
+                        audio_channels=DEFAULT_CHANNELS, input_system_audio=False,
+                        mic_gain=1.0, system_gain=1.0, mic_device=None, system_device=None,
+                        audio_stems=False):
+        """
+        Records to captures/. With `replay_seconds` it runs as an instant-replay buffer instead:
+        nothing is written until save_replay(), which stores the last N seconds as an MP4.
+        With `segment_seconds` / `segment_bytes` the video is written as rolling segments
+        that are joined (stream copy) into the usual file at stop.
+        The frame rate follows the screen refresh rate, capped at `max_fps`; with `adaptive_fps`
+        it is stepped down (not below `min_fps`) when capture or encoding can't keep up.
+        `output_size` (w, h) or `output_scale` record a smaller video than the captured area.
+        With `multi_monitor`, all screens are grabbed in parallel; `split_monitors` records
+        each one to its own file.
+        The microphone is recorded as `audio_format` (capture.audio_formats: wav, flac, opus)
+        at `audio_samplerate` / `audio_channels`. With `input_system_audio` what the computer
+        plays is recorded too (capture.audio_devices finds the loopback input) and mixed with the
+        microphone at `mic_gain` / `system_gain` (capture.audio_mixer); `audio_stems` writes
+        one file per source instead of the mix.
+        Video and audio are stamped on one MediaClock; the measured A/V offset is saved next
+        to the video as session metadata (capture.media_clock) for merging and export.
+        """
         
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.output_files = []
+        # The rate the file can store is also the rate of the live mux and the replay ring
+        audio_samplerate = supported_samplerate(audio_format, audio_samplerate)
+        audio_sources = []
+        if input_mic or input_system_audio:
+            # sounddevice/PortAudio are only loaded when audio is actually recorded
+            from capture.audio_devices import recording_sources, create_recorder
+            audio_sources = recording_sources(input_mic, input_system_audio, mic_gain, system_gain,
+                                              mic_device, system_device)
         
         save_dir = os.path.join(os.getcwd(), "captures")
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
+        self.save_dir = save_dir
             
         video_filename = os.path.join(save_dir, f"video_{timestamp}.mp4")
-        self.output_files.append(video_filename)
+        self.media_clock = MediaClock()
+        if replay_seconds:
+            # Replay clips are cut by media time: GOPs and the PCM ring are stamped on the clock
+            from capture.replay import ReplayBuffer, PcmRing, DEFAULT_REPLAY_BUDGET_BYTES
+            self.replay_buffer = ReplayBuffer(replay_seconds, replay_budget_bytes or DEFAULT_REPLAY_BUDGET_BYTES,
+                                              media_clock=self.media_clock)
+            # A few seconds of headroom: the video ring may hold up to one keyframe interval extra
+            self.pcm_ring = PcmRing(audio_samplerate, audio_channels, replay_seconds + 5,
+                                    media_clock=self.media_clock) if audio_sources else None
+            video_filename = None
+        else:
+            self.output_files.append(video_filename)
         
-        # Determine FPS from system
+        # Determine FPS from system. With adaptive_fps it is only the upper bound: the recorder
+        # calibrates and adapts the real rate to what the machine can sustain (capture.rate_control)
         fps = 30.0
         try:
             screen = QApplication.primaryScreen()
             rate = screen.refreshRate()
             if rate > 0:
-                fps = rate
+                fps = min(rate, max_fps)
         except:
              pass
              
-        logging.info(f"Target Recording FPS: {fps}")
+        logging.info(f"Target Recording FPS: {fps} (adaptive: {adaptive_fps})")
         
         # Start Video (First phase: Initialization)
         self.video_recorder = VideoRecorder(video_filename, region, monitor_index, 
                                             fps=fps,
                                             webcam_enabled=input_webcam, 
-                                            cursor_enabled=capture_cursor)
+                                            cursor_enabled=capture_cursor,
+                                            backpressure=backpressure,
+                                            timing=timing,
+                                            encoder=encoder,
+                                            encoder_options=encoder_options,
+                                            live_audio=(audio_samplerate, audio_channels) if (mux_audio and audio_sources) else None,
+                                            encode_mode=encode_mode,
+                                            overlay_options=overlay_options,
+                                            replay_buffer=self.replay_buffer,
+                                            segment_seconds=segment_seconds,
+                                            segment_bytes=segment_bytes,
+                                            adaptive_fps=adaptive_fps,
+                                            min_fps=min_fps,
+                                            output_size=output_size,
+                                            output_scale=output_scale,
+                                            multi_monitor=multi_monitor,
+                                            split_monitors=split_monitors,
+                                            media_clock=self.media_clock)
 
         
         # Start Audio
-        if input_mic:
-            audio_filename = os.path.join(save_dir, f"audio_{timestamp}.wav")
-            self.output_files.append(audio_filename)
-            # TODO: Add device selection logic if needed. For now default.
-            self.audio_recorder = AudioRecorderQueue(audio_filename)
+        if audio_sources and self.pcm_ring is not None:
+            # Replay mode: audio only goes into the PCM ring, as recorded (it is placed by media time)
+            self.audio_recorder = create_recorder(None, audio_sources, channels=audio_channels,
+                                                  samplerate=audio_samplerate, sink=self.pcm_ring.write,
+                                                  align_sink=False, media_clock=self.media_clock,
+                                                  audio_format=audio_format)
+        elif audio_sources:
+            audio_filename = os.path.join(save_dir, f"audio_{timestamp}{audio_extension(audio_format)}")
+            # With live muxing the WAV is still written as a fallback in case ffmpeg is unavailable.
+            sink = self.video_recorder.write_audio if mux_audio else None
+            self.audio_recorder = create_recorder(audio_filename, audio_sources, stems=audio_stems,
+                                                  channels=audio_channels, samplerate=audio_samplerate,
+                                                  sink=sink, media_clock=self.media_clock,
+                                                  audio_format=audio_format)
+            self.output_files.extend(self.audio_recorder.output_paths)
             
         # Connect setup ready signal
         if self.video_recorder:
@@ -64,6 +160,8 @@ class RecorderManager(QObject):
             self.video_recorder.start() # This starts the video recorder thread, but not capture
         elif self.audio_recorder:
              # Audio only?
+            if self.media_clock is not None:
+                self.media_clock.start()
             self.audio_recorder.start()
             self._create_controls()
 
@@ -75,6 +173,9 @@ class RecorderManager(QObject):
         
     def _on_countdown_finished(self):
         """Countdown done, actually start capturing."""
+        # Media time 0; each recorder stamps when its first frame / sample was really taken
+        if self.media_clock is not None:
+            self.media_clock.start()
         if self.video_recorder:
             self.video_recorder.start_capture() # This starts the actual video capture
             
@@ -86,14 +187,75 @@ class RecorderManager(QObject):
 
     def _create_controls(self):
         if not self.controls:
-            self.controls = RecordingControls()
+            self.controls = RecordingControls(replay=self.replay_buffer is not None)
             self.controls.pause_clicked.connect(self.toggle_pause)
             self.controls.stop_clicked.connect(self.stop_recording)
             self.controls.cancel_clicked.connect(self.cancel_recording)
+            self.controls.save_replay_clicked.connect(self.save_replay)
+            self.audio_levels.connect(self.controls.set_audio_levels)
+
+        if self.replay_buffer is not None and self._usage_timer is None:
+            # Live memory report for the replay buffer
+            self._usage_timer = QTimer(self)
+            self._usage_timer.timeout.connect(self._update_replay_usage)
+            self._usage_timer.start(1000)
+
+        if self.audio_recorder is not None and self._level_timer is None:
+            # Throttled: the GUI thread polls the meters instead of the audio thread signalling per block
+            self._level_timer = QTimer(self)
+            self._level_timer.timeout.connect(self._update_audio_levels)
+            self._level_timer.start(LEVEL_INTERVAL_MS)
         
         self.controls.show()
 
+    def _update_audio_levels(self):
+        if self.audio_recorder is not None:
+            self.audio_levels.emit(self.audio_recorder.levels())
+
+    # --- INSTANT REPLAY ---
+    def replay_usage(self):
+        """Replay buffer stats (seconds held, bytes used, budget) or None outside replay mode."""
+        if self.replay_buffer is None:
+            return None
+        stats = self.replay_buffer.stats()
+        stats["replay_audio_bytes"] = self.pcm_ring.nbytes if self.pcm_ring is not None else 0
+        return stats
+
+    def _update_replay_usage(self):
+        usage = self.replay_usage()
+        if usage and self.controls:
+            self.controls.set_replay_usage(usage)
+
+    def save_replay(self, seconds=None):
+        """Saves the last `seconds` (default: the whole buffer) to captures/ without stopping capture."""
+        if self.replay_buffer is None or self._saving_replay:
+            return
+        self._saving_replay = True
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = os.path.join(self.save_dir, f"replay_{timestamp}.mp4")
+        threading.Thread(target=self._save_replay_worker, args=(path, seconds),
+                         name="ReplaySave", daemon=True).start()
+
+    def _save_replay_worker(self, path, seconds):
+        from capture.replay import save_replay
+        try:
+            save_replay(self.replay_buffer, path, self.pcm_ring, seconds)
+        except Exception as e:
+            logging.error(f"Replay save failed: {e}", exc_info=True)
+            self.replay_failed.emit(str(e))
+        else:
+            # Only the latest clip is handed on when the buffer stops
+            self.output_files = [path]
+            self.replay_saved.emit(path)
+        finally:
+            self._saving_replay = False
+
     def stop_recording(self):
+        if self._usage_timer is not None:
+            self._usage_timer.stop()
+        if self._level_timer is not None:
+            self._level_timer.stop()
+
         # Update UI to show processing immediately
         if self.controls:
             self.controls.show_processing()
@@ -117,24 +279,92 @@ class RecorderManager(QObject):
             self._on_video_finished()
 
     def _on_video_finished(self):
+        recorder = self.video_recorder
+        if recorder and recorder.manifest_path and os.path.exists(recorder.manifest_path):
+            # Join the segments off the GUI thread; it is a stream copy but can take a while
+            threading.Thread(target=self._join_segments, args=(recorder.manifest_path, recorder.output_path),
+                             name="SegmentJoin", daemon=True).start()
+            return
+        self._finish_recording()
+
+    def _join_segments(self, manifest_file, output_path):
+        from capture.segments import concat_segments, remove_segments, read_manifest
+        try:
+            if concat_segments(manifest_file, output_path):
+                remove_segments(manifest_file)
+            elif self.output_files:
+                # Keep the playable segments; hand the first one on
+                segments = read_manifest(manifest_file)["segments"]
+                self.output_files[0] = os.path.join(os.path.dirname(manifest_file), segments[0]["file"])
+                logging.warning(f"Segments kept in {os.path.dirname(manifest_file)}")
+        except Exception as e:
+            logging.error(f"Joining segments failed: {e}", exc_info=True)
+        self._segments_joined.emit()
+
+    def _finish_recording(self):
+        if self.audio_recorder:
+            logging.info(f"Audio pipeline stats: {self.audio_recorder.stats()}")
+        if self.video_recorder:
+            logging.info(f"Video pipeline stats: {self.video_recorder.get_stats()}")
+            # VFR remuxing may have changed the container (e.g. MKV when ffmpeg is missing)
+            # Split multi-monitor recordings replace the single video entry with one per monitor
+            if self.output_files and self.replay_buffer is None and not self.video_recorder.manifest_path:
+                self.output_files[0:1] = self.video_recorder.output_paths
+
+            # Audio already muxed into the video: drop the fallback WAV (separate tracks are kept)
+            audio_file = self.audio_recorder.output_path if self.audio_recorder else None
+            if self.video_recorder.audio_muxed and audio_file in self.output_files:
+                self.output_files.remove(audio_file)
+                try:
+                    os.remove(audio_file)
+                except OSError:
+                    pass
+
+        self._write_session()
+
         # Cleanup controls
         if self.controls:
             self.controls.close()
             
         self.recording_finished.emit(self.output_files)
 
+    def _write_session(self):
+        """Saves the measured A/V offset next to each video of a recording with audio."""
+        clock, audio = self.media_clock, self.audio_recorder
+        if clock is None or audio is None or not clock.started or not self.video_recorder:
+            return
+        muxed = self.video_recorder.audio_muxed
+        stems = getattr(audio, "stems", False)
+        audio_path = None if (muxed or stems) else audio.output_path
+        stem_paths = audio.output_paths if stems else None
+        for path in self.video_recorder.output_paths:
+            if path and os.path.exists(path):
+                try:
+                    write_session(path, clock, audio_path, muxed, audio.samplerate, audio.channels, stem_paths,
+                                  audio.silence())
+                except OSError as e:
+                    logging.error(f"Could not write session metadata: {e}")
+
     def toggle_pause(self, is_paused):
+        # One instant for both tracks, so they leave out exactly the same span
+        at = time.perf_counter()
+        if self.media_clock is not None:
+            if is_paused:
+                self.media_clock.pause(at)
+            else:
+                self.media_clock.resume(at)
+
         if self.video_recorder:
             if is_paused:
-                self.video_recorder.pause()
+                self.video_recorder.pause(at)
             else:
-                self.video_recorder.resume()
+                self.video_recorder.resume(at)
                 
         if self.audio_recorder:
             if is_paused:
-                self.audio_recorder.pause()
+                self.audio_recorder.pause(at)
             else:
-                self.audio_recorder.resume()
+                self.audio_recorder.resume(at)
 
     def cancel_recording(self):
         # Similar to stop but maybe delete files?
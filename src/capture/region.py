@@ -46,6 +46,12 @@ class RegionSelectionOverlay(QWidget):
         self.overlay_color = QColor(0, 0, 0, 100) # Semi-transparent black
         self.selection_border_color = QColor(0, 120, 215) # Blue
 
+    def reset(self):
+        """Clears the previous selection so a hidden overlay can be shown again."""
+        self.is_selecting = False
+        self.global_selection_rect = QRect()
+        self.update_geometry()
+
     def sync_selection(self, global_rect, is_selecting):
         self.global_selection_rect = global_rect
         self.is_selecting = is_selecting
@@ -0,0 +1,320 @@
+import collections
+import logging
+import os
+import subprocess
+import threading
+import numpy as np
+from capture.encoders import FrameEncoder, EncoderError, BGR24
+from utils.ffmpeg import check_ffmpeg, popen_flags, run_tool
+
+DEFAULT_REPLAY_SECONDS = 60
+DEFAULT_REPLAY_BUDGET_BYTES = 256 * 1024 * 1024
+
+# H.264 NAL unit types used to split and classify the encoded stream
+NAL_IDR = 5
+NAL_AUD = 9
+AUD_START_CODE = b"\x00\x00\x01\x09"
+
+class ReplayBuffer:
+    """
+    Memory-bounded ring of encoded H.264 access units, grouped into GOPs so that the
+    oldest data is always evicted a whole keyframe interval at a time and whatever is
+    left still starts on a keyframe.
+
+    Holds at least `seconds` of video unless `budget_bytes` is reached first.
+    Frames are numbered from the start of the recording (constant frame rate). With a
+    `media_clock` (capture.media_clock) each GOP is stamped with the media time of its first
+    frame, which is what lines it up with the PCM ring on save. Thread-safe.
+    """
+
+    def __init__(self, seconds=DEFAULT_REPLAY_SECONDS, budget_bytes=DEFAULT_REPLAY_BUDGET_BYTES, media_clock=None):
+        self.seconds = seconds
+        self.budget_bytes = budget_bytes
+        self.media_clock = media_clock
+        self.fps = None # Set by the encoder when it opens
+        self._gops = collections.deque() # [first_frame, media time or None, [access units], nbytes]
+        self._lock = threading.Lock()
+        self.frames_total = 0
+        self.bytes_held = 0
+        self.frames_unusable = 0 # Leading frames before the first keyframe
+        self.gops_evicted = 0
+
+    def add(self, unit, keyframe):
+        """Appends one encoded access unit (called by ReplayEncoder's reader thread)."""
+        with self._lock:
+            index = self.frames_total
+            self.frames_total += 1
+            if keyframe:
+                self._gops.append([index, self._frame_time(index), [], 0])
+            elif not self._gops:
+                self.frames_unusable += 1 # Undecodable without its keyframe
+                return
+            gop = self._gops[-1]
+            gop[2].append(unit)
+            gop[3] += len(unit)
+            self.bytes_held += len(unit)
+            self._evict()
+
+    def _evict(self):
+        keep_frames = self.seconds * self.fps
+        while len(self._gops) > 1:
+            # The next GOP alone still covers the requested duration, or memory is over budget
+            if (self.frames_total - self._gops[1][0] >= keep_frames
+                    or self.bytes_held > self.budget_bytes):
+                self.bytes_held -= self._gops.popleft()[3]
+                self.gops_evicted += 1
+            else:
+                break
+
+    def _frame_time(self, index):
+        """Media time of frame `index`: output frame k shows recording time k / fps from the first frame."""
+        start = self.media_clock.track_start("video") if self.media_clock is not None else None
+        return None if start is None else start + index / self.fps
+
+    def snapshot(self, seconds=None):
+        """
+        Returns (first_frame, frame_count, data, start) for the last `seconds` (default: everything
+        held), starting on the nearest keyframe at or before that point. data is an Annex B byte
+        string; start is the media time of first_frame, or None without a media clock.
+        """
+        with self._lock:
+            if not self._gops:
+                return 0, 0, b"", None
+            start = 0
+            if seconds is not None:
+                wanted = self.frames_total - seconds * self.fps
+                for i, gop in enumerate(self._gops):
+                    if gop[0] <= wanted:
+                        start = i
+            gops = list(self._gops)[start:]
+            units = [unit for gop in gops for unit in gop[2]]
+            end = self.frames_total
+        # Access units are immutable bytes, so joining outside the lock is safe
+        return gops[0][0], end - gops[0][0], b"".join(units), gops[0][1]
+
+    @property
+    def seconds_held(self):
+        with self._lock:
+            if not self._gops or not self.fps:
+                return 0.0
+            return (self.frames_total - self._gops[0][0]) / self.fps
+
+    def stats(self):
+        return {
+            "replay_seconds": round(self.seconds_held, 1),
+            "replay_bytes": self.bytes_held,
+            "replay_budget_bytes": self.budget_bytes,
+            "replay_gops": len(self._gops),
+        }
+
+class PcmRing:
+    """
+    Ring of the most recent audio samples (float32, frames x channels) addressed by
+    absolute sample index since the start of the recording. Thread-safe.
+
+    With a `media_clock`, sample 0 is the first recorded sample as the audio recorder stamped
+    it on the clock (track "audio", fed with align_sink off), so read_at() finds the samples
+    of any media time span however late the device opened.
+    """
+
+    def __init__(self, samplerate, channels, seconds, media_clock=None):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.media_clock = media_clock
+        self._buffer = np.zeros((int(samplerate * seconds), channels), dtype=np.float32)
+        self._lock = threading.Lock()
+        self.total = 0 # Samples written so far
+
+    def write(self, block):
+        block = np.asarray(block, dtype=np.float32).reshape(-1, self.channels)
+        size = len(self._buffer)
+        if len(block) > size:
+            skipped = len(block) - size
+            block = block[-size:]
+        else:
+            skipped = 0
+        with self._lock:
+            start = (self.total + skipped) % size
+            first = min(len(block), size - start)
+            self._buffer[start:start + first] = block[:first]
+            self._buffer[:len(block) - first] = block[first:]
+            self.total += skipped + len(block)
+
+    def read(self, start, end):
+        """Copies samples [start, end); the part that already left the ring comes back as silence."""
+        size = len(self._buffer)
+        out = np.zeros((max(0, end - start), self.channels), dtype=np.float32)
+        with self._lock:
+            lo = max(start, self.total - size, 0)
+            hi = min(end, self.total)
+            if hi > lo:
+                # At most two contiguous runs: up to the end of the ring, then from its start
+                a = lo % size
+                first = min(hi - lo, size - a)
+                out[lo - start:lo - start + first] = self._buffer[a:a + first]
+                out[lo - start + first:hi - start] = self._buffer[:hi - lo - first]
+        return out
+
+    def read_at(self, start, duration):
+        """
+        Samples from media time `start` for `duration` seconds, silence where there are none;
+        None while the first sample is not stamped on the media clock.
+        """
+        audio_start = self.media_clock.track_start("audio") if self.media_clock is not None else None
+        if audio_start is None:
+            return None
+        first = int(round((start - audio_start) * self.samplerate))
+        return self.read(first, first + int(round(duration * self.samplerate)))
+
+    @property
+    def nbytes(self):
+        return self._buffer.nbytes
+
+class ReplayEncoder(FrameEncoder):
+    """
+    Encodes to a raw H.264 elementary stream on ffmpeg's stdout and feeds the access units
+    into a ReplayBuffer. Keyframes are forced every `keyframe_seconds` so eviction and
+    saving stay fine-grained; B-frames are off so decode order equals presentation order.
+    """
+
+    def __init__(self, buffer, width, height, fps, preset="veryfast", crf=23, keyframe_seconds=1.0,
+                 input_format=BGR24, **ignored):
+        super().__init__(None, width, height, fps)
+        self.buffer = buffer
+        self.preset = preset
+        self.crf = crf
+        self.gop_frames = max(1, int(round(fps * keyframe_seconds)))
+        self.input_format = input_format
+        self._proc = None
+        self._reader = None
+        self._stderr_tail = collections.deque(maxlen=20)
+
+    def build_command(self):
+        return [
+            "ffmpeg", "-loglevel", "error",
+            "-probesize", "32", "-analyzeduration", "0",
+            "-f", "rawvideo", "-pix_fmt", self.input_format,
+            "-s", f"{self.width}x{self.height}", "-framerate", str(self.fps),
+            "-i", "pipe:0",
+            "-c:v", "libx264", "-preset", self.preset, "-tune", "zerolatency", "-crf", str(self.crf),
+            "-g", str(self.gop_frames), "-keyint_min", str(self.gop_frames), "-sc_threshold", "0", "-bf", "0",
+            "-x264-params", "aud=1", # Access unit delimiters mark every frame boundary
+            "-pix_fmt", "yuv420p",
+            "-f", "h264", "pipe:1",
+        ]
+
+    def open(self):
+        if not check_ffmpeg():
+            raise EncoderError("Replay buffer needs ffmpeg in PATH")
+        self.buffer.fps = self.fps
+        cmd = self.build_command()
+        logging.info(f"Starting replay encoder: {' '.join(cmd)}")
+        try:
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                          stderr=subprocess.PIPE, creationflags=popen_flags())
+        except OSError as e:
+            raise EncoderError(f"Could not start ffmpeg: {e}")
+        threading.Thread(target=self._drain_stderr, name="ReplayStderr", daemon=True).start()
+        self._reader = threading.Thread(target=self._read_packets, name="ReplayReader", daemon=True)
+        self._reader.start()
+        return self
+
+    def _drain_stderr(self):
+        for line in self._proc.stderr:
+            self._stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    def _read_packets(self):
+        """Splits the Annex B stream into access units at each delimiter."""
+        pending = bytearray()
+        stdout = self._proc.stdout
+        while True:
+            chunk = stdout.read1(1 << 16)
+            if not chunk:
+                break
+            scan_from = max(1, len(pending) - 4)
+            pending += chunk
+            while True:
+                cut = pending.find(AUD_START_CODE, scan_from)
+                if cut < 0:
+                    break
+                if pending[cut - 1] == 0:
+                    cut -= 1 # Four byte start code
+                self._emit(bytes(pending[:cut]))
+                del pending[:cut]
+                scan_from = 5
+        if pending:
+            self._emit(bytes(pending))
+
+    def _emit(self, unit):
+        if unit:
+            self.buffer.add(unit, _has_idr(unit))
+
+    def write(self, frame):
+        try:
+            self._proc.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        except (BrokenPipeError, OSError):
+            raise EncoderError(f"Replay encoder exited: {' | '.join(self._stderr_tail) or 'no output'}")
+
+    def close(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+        returncode = self._proc.wait()
+        self._reader.join()
+        self._proc = None
+        if returncode != 0:
+            raise EncoderError(f"ffmpeg exited with code {returncode}: {' | '.join(self._stderr_tail)}")
+
+def _has_idr(unit):
+    pos = unit.find(b"\x00\x00\x01")
+    while 0 <= pos < len(unit) - 3:
+        if unit[pos + 3] & 0x1F == NAL_IDR:
+            return True
+        pos = unit.find(b"\x00\x00\x01", pos + 3)
+    return False
+
+def save_replay(buffer, output_path, pcm_ring=None, seconds=None):
+    """
+    Writes the last `seconds` held by `buffer` (and the audio `pcm_ring` holds for the same
+    media time span) to an MP4 without touching the running capture. The video is stream-copied.
+    Returns the duration saved in seconds; raises EncoderError on failure.
+    """
+    first_frame, frame_count, data, start = buffer.snapshot(seconds)
+    if not frame_count:
+        raise EncoderError("Replay buffer is still empty")
+
+    base = os.path.splitext(output_path)[0]
+    video_tmp = base + "_replay.h264"
+    audio_tmp = base + "_replay.wav"
+    with open(video_tmp, "wb") as f:
+        f.write(data)
+
+    fps = buffer.fps
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps), "-f", "h264", "-i", video_tmp]
+    if pcm_ring is not None:
+        import soundfile as sf
+        rate = pcm_ring.samplerate
+        samples = pcm_ring.read_at(start, frame_count / fps) if start is not None else None
+        if samples is None:
+            # No shared clock: assume audio sample 0 was captured with frame 0
+            logging.warning("Replay audio is not stamped on the media clock; lining it up by frame index")
+            first = int(first_frame / fps * rate)
+            samples = pcm_ring.read(first, first + int(frame_count / fps * rate))
+        sf.write(audio_tmp, samples, rate, subtype="PCM_16")
+        cmd += ["-i", audio_tmp, "-map", "0:v", "-map", "1:a", "-c:a", "aac"]
+    cmd += ["-c:v", "copy", "-movflags", "+faststart", output_path]
+
+    try:
+        if not run_tool(cmd):
+            raise EncoderError("Saving the replay failed, see debug_capture.log")
+    finally:
+        for tmp in (video_tmp, audio_tmp):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    duration = frame_count / fps
+    logging.info(f"Replay saved: {output_path} ({duration:.1f}s, {len(data) / 1e6:.1f} MB video)")
+    return duration
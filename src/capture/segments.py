@@ -0,0 +1,206 @@
+import json
+import logging
+import os
+import threading
+from capture.encoders import FrameEncoder, EncoderError, create_encoder
+from utils.ffmpeg import check_ffmpeg, run_tool
+
+MANIFEST_VERSION = 1
+
+def segments_dir(output_path):
+    return os.path.splitext(output_path)[0] + "_segments"
+
+def manifest_path(output_path):
+    return os.path.join(segments_dir(output_path), "manifest.json")
+
+def write_manifest(path, manifest):
+    """Atomically replaces the manifest, so a crash leaves either the old or the new one."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_manifest(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+class SegmentedEncoder(FrameEncoder):
+    """
+    Writes a recording as a series of independently playable files that roll over every
+    `segment_seconds` of video or `segment_bytes` on disk, with a JSON manifest next to them.
+
+    `make_encoder(path)` opens the encoder for one segment. The next segment is opened
+    before the previous one is finalized in the background, so the encode stage never
+    waits for a file to be closed. A crash loses at most the segment being written
+    (and with fragmented MP4 not even that).
+    """
+
+    def __init__(self, output_path, width, height, fps, make_encoder, segment_seconds=None, segment_bytes=None):
+        super().__init__(output_path, width, height, fps)
+        if not segment_seconds and not segment_bytes:
+            raise ValueError("Segmented output needs segment_seconds and/or segment_bytes")
+        self.make_encoder = make_encoder
+        self.input_format = None # Taken from the first segment's encoder
+        self.segment_frames = int(segment_seconds * fps) if segment_seconds else None
+        self.segment_bytes = segment_bytes
+        self.directory = segments_dir(output_path)
+        self.manifest_path = manifest_path(output_path)
+        self.ext = os.path.splitext(output_path)[1] or ".mp4"
+
+        self.segments = [] # Manifest entries
+        self._current = None
+        self._current_path = None
+        self._frames = 0 # Frames in the current segment
+        self._closers = []
+        self._close_errors = []
+        # Entries are updated by the encode thread and the closer threads: every change and
+        # every manifest write happens under this lock, so a write never sees a dict mid-change
+        self._manifest_lock = threading.Lock()
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._roll_over()
+        return self
+
+    def _manifest(self, complete=False):
+        return {
+            "version": MANIFEST_VERSION,
+            "output": os.path.basename(self.output_path),
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "complete": complete,
+            "segments": self.segments,
+        }
+
+    def _roll_over(self):
+        previous = self._current
+        index = len(self.segments) + 1
+        name = f"segment_{index:04d}{self.ext}"
+        path = os.path.join(self.directory, name)
+        encoder = self.make_encoder(path)
+        if self.input_format is None:
+            self.input_format = encoder.input_format
+        elif encoder.input_format != self.input_format:
+            # e.g. ffmpeg vanished and the segment fell back to OpenCV
+            encoder.close()
+            raise EncoderError(f"Segment encoder changed input format to {encoder.input_format}")
+        with self._manifest_lock:
+            if previous is not None:
+                self.segments[-1].update(frames=self._frames, duration=round(self._frames / self.fps, 3))
+            self.segments.append({"file": name, "frames": 0, "duration": 0.0, "closed": False})
+            write_manifest(self.manifest_path, self._manifest())
+        self._current_path = path
+        self._current = encoder
+        self._frames = 0
+
+        if previous is not None:
+            entry = self.segments[-2]
+            closer = threading.Thread(target=self._finalize, args=(previous, entry), name="SegmentClose", daemon=True)
+            closer.start()
+            self._closers.append(closer)
+            logging.info(f"Segment {entry['file']} done ({entry['duration']}s), recording into {name}")
+
+    def _finalize(self, encoder, entry):
+        try:
+            encoder.close()
+            with self._manifest_lock:
+                entry["closed"] = True
+                write_manifest(self.manifest_path, self._manifest())
+        except EncoderError as e:
+            logging.error(f"Finalizing segment {entry['file']} failed: {e}")
+            self._close_errors.append(e)
+
+    def _segment_full(self):
+        if self.segment_frames and self._frames >= self.segment_frames:
+            return True
+        # The size is only polled about once a second of video
+        if self.segment_bytes and self._frames % max(1, int(self.fps)) == 0:
+            try:
+                return os.path.getsize(self._current_path) >= self.segment_bytes
+            except OSError:
+                return False
+        return False
+
+    def write(self, frame):
+        if self._frames and self._segment_full():
+            self._roll_over()
+        self._current.write(frame)
+        self._frames += 1
+
+    def close(self):
+        if self._current is None:
+            return
+        entry = self.segments[-1]
+        with self._manifest_lock:
+            entry.update(frames=self._frames, duration=round(self._frames / self.fps, 3))
+        self._finalize(self._current, entry)
+        self._current = None
+        for closer in self._closers:
+            closer.join()
+        with self._manifest_lock:
+            write_manifest(self.manifest_path, self._manifest(complete=not self._close_errors))
+        if self._close_errors:
+            raise self._close_errors[0]
+
+def create_segmented_encoder(backend, output_path, width, height, fps,
+                             segment_seconds=None, segment_bytes=None, **options):
+    """Opens a SegmentedEncoder whose segments come from create_encoder(backend, ...)."""
+    options["fragmented"] = True # Only used by the ffmpeg backend
+
+    def make_encoder(path):
+        return create_encoder(backend, path, width, height, fps, **options)
+
+    return SegmentedEncoder(output_path, width, height, fps, make_encoder,
+                            segment_seconds=segment_seconds, segment_bytes=segment_bytes).open()
+
+def concat_segments(manifest_file, output_path):
+    """
+    Joins the segments listed in a manifest into `output_path` with the ffmpeg concat demuxer
+    (stream copy, no re-encoding). Also works on the manifest of a crashed recording.
+    Returns True on success.
+    """
+    if not check_ffmpeg():
+        logging.warning("ffmpeg not found, segments left as separate files")
+        return False
+
+    manifest = read_manifest(manifest_file)
+    directory = os.path.dirname(os.path.abspath(manifest_file))
+    files = [os.path.join(directory, seg["file"]) for seg in manifest["segments"]
+             if seg.get("frames", 0) > 0 or not manifest.get("complete")]
+    files = [f for f in files if os.path.exists(f) and os.path.getsize(f) > 0]
+    if not files:
+        logging.error(f"No segments to join in {manifest_file}")
+        return False
+
+    list_path = os.path.join(directory, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in files:
+            escaped = path.replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy"]
+    if output_path.lower().endswith((".mp4", ".mov")):
+        cmd += ["-movflags", "+faststart"]
+    cmd.append(output_path)
+    success = run_tool(cmd)
+    os.remove(list_path)
+    if success:
+        logging.info(f"Joined {len(files)} segments into {output_path}")
+    return success
+
+def remove_segments(manifest_file):
+    """Deletes a segment directory after a successful join."""
+    directory = os.path.dirname(os.path.abspath(manifest_file))
+    manifest = read_manifest(manifest_file)
+    for seg in manifest["segments"]:
+        path = os.path.join(directory, seg["file"])
+        if os.path.exists(path):
+            os.remove(path)
+    os.remove(manifest_file)
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass # Something else was put there; leave it
@@ -0,0 +1,80 @@
+import logging
+import os
+from utils.ffmpeg import check_ffmpeg, check_mkvmerge, run_tool
+
+# Frame timing modes for VideoRecorder
+CFR = "cfr" # constant frame rate: late frames are duplicated to keep real-time duration
+VFR = "vfr" # variable frame rate: every frame written once, real timestamps kept in a sidecar
+
+TIMECODE_HEADER = "# timecode format v2"
+
+def sidecar_path(video_path):
+    return os.path.splitext(video_path)[0] + "_timestamps.txt"
+
+class TimestampSidecar:
+    """
+    Records one presentation timestamp (milliseconds) per encoded frame,
+    in the mkvmerge "timecode format v2" text format.
+    Line buffered, so the timestamps survive a crash along with the frames already written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._last_ms = None
+        self._file = open(path, "w", buffering=1)
+        self._file.write(TIMECODE_HEADER + "\n")
+
+    def append(self, pts):
+        ms = round(pts * 1000.0, 3)
+        # Timestamps must be strictly increasing for the muxer
+        if self._last_ms is not None and ms <= self._last_ms:
+            ms = self._last_ms + 0.001
+        self._file.write(f"{ms:.3f}\n")
+        self._last_ms = ms
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+def exact_remux_available():
+    """Whether remux_vfr() can apply per-frame timestamps (VideoRecorder records CFR otherwise)."""
+    return check_mkvmerge()
+
+def remux_vfr(video_path, timestamps_path, frame_count, nominal_fps):
+    """
+    Applies the real frame timestamps to a file that was encoded at a nominal rate.
+    Returns the path of the playable result (normally `video_path` itself).
+
+    Needs mkvmerge for exact per-frame timestamps (the result is copied back to MP4 if ffmpeg
+    exists). Without it the file is left at its nominal rate and the sidecar is kept for later
+    remuxing: ffmpeg alone can't apply per-frame timestamps without re-encoding, and stretching
+    the whole timeline would make busy and static spans equally long.
+    """
+    if frame_count <= 0:
+        return video_path
+
+    base, ext = os.path.splitext(video_path)
+
+    if check_mkvmerge():
+        mkv_path = base + "_vfr.mkv"
+        cmd = ["mkvmerge", "-q", "-o", mkv_path, "--timestamps", f"0:{timestamps_path}", video_path]
+        if run_tool(cmd):
+            if not check_ffmpeg():
+                logging.info(f"VFR remux written as MKV: {mkv_path}")
+                os.remove(video_path)
+                return mkv_path
+
+            tmp_path = base + "_vfr" + ext
+            if run_tool(["ffmpeg", "-y", "-i", mkv_path, "-c", "copy", tmp_path]):
+                os.remove(mkv_path)
+                os.replace(tmp_path, video_path)
+                os.remove(timestamps_path)
+                logging.info(f"VFR remux applied {frame_count} timestamps to {video_path}")
+                return video_path
+            os.remove(mkv_path)
+
+    logging.warning(f"VFR remux failed or mkvmerge missing: the output is not true VFR. "
+                    f"Video kept at nominal {nominal_fps} fps, timestamps in {timestamps_path}")
+    return video_path
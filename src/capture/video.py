@@ -1,210 +1,676 @@
 import cv2
 import numpy as np
-import mss
+import os
 import time
-import platform
 import logging
+import tempfile
+import threading
 from PySide6.QtCore import QThread, Signal
-import pyautogui
 from datetime import datetime
 import collections
+from capture.engine import CaptureEngine, log_file
+from capture.frame_queue import FrameRing, BLOCK
+from capture.vfr import CFR, VFR, TimestampSidecar, sidecar_path, remux_vfr, exact_remux_available
+from capture.damage import DamageDetector
+from capture.encoders import create_encoder, EncoderError, AUTO, YUV420P
+from capture.encode_stage import EncodeStage, SplitEncodeStage
+from capture.webcam import WebcamReader
+from capture.compositor import OverlayCompositor, CursorTracker
+from capture.downscale import Downscaler
+from capture.multi_monitor import MultiMonitorGrabber
+from capture.rate_control import FrameClock, AdaptiveRateController, DEFAULT_MIN_FPS
+
+# Where compositing and encoding run
+ENCODE_THREAD = "thread"   # a worker thread of this process
+ENCODE_PROCESS = "process" # a worker process fed through shared memory (capture.process_encoder)
+
+def output_dimensions(width, height, output_size=None, output_scale=None):
+    """
+    Encoded size for a `width` x `height` capture: fitted inside `output_size` (w, h) with the
+    aspect ratio kept, or multiplied by `output_scale`. Never upscales; always even.
+    """
+    scale = 1.0
+    if output_size:
+        scale = min(output_size[0] / width, output_size[1] / height)
+    elif output_scale:
+        scale = output_scale
+    scale = min(scale, 1.0)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
 
 class VideoRecorder(QThread):
+    """
+    Screen recorder split into two stages:
+    - capture (this QThread): grabs BGRA frames into a bounded ring of preallocated buffers
+    - encode: colour conversion, cursor/webcam overlay and the encoder backend (capture.encode_stage)
+
+    An encoder stall therefore only fills the ring instead of stalling the grab loop.
+    What happens when the ring is full is controlled by `backpressure` (see capture.frame_queue).
+    `encode_mode` ENCODE_PROCESS moves the encode stage into a worker process with the ring in
+    shared memory, so compositing and encoding never compete with capture or the GUI for the GIL.
+
+    `timing` selects how late frames are handled:
+    - CFR: a frame is written once per output frame slot its capture slot covers (FrameClock),
+      so missed slots and a capture rate below the output rate show up as counted repeats
+    - VFR: every frame is written once and its real timestamp is remuxed in at stop (see capture.vfr;
+      needs mkvmerge, CFR is recorded without it)
+
+    With `skip_unchanged`, frames identical to the previous one (same pixels, same cursor position)
+    skip colour conversion and compositing: CFR re-writes the last composed frame,
+    VFR simply lets the previous frame's timestamp run on.
+
+    `encoder` picks the backend ("auto", "ffmpeg" or "opencv", see capture.encoders) and
+    `encoder_options` is passed to it (codec, preset, crf, ...). With `live_audio` set to
+    (samplerate, channels), audio pushed through write_audio() is muxed into the same file.
+
+    With a `replay_buffer` nothing is written to disk: encoded packets go into the
+    memory-bounded ring (capture.replay) and are saved on demand.
+    With `segment_seconds` / `segment_bytes` the output rolls over into playable segments
+    plus a manifest (capture.segments) instead of one file that is only valid once closed.
+
+    With `multi_monitor`, recording all screens grabs every monitor concurrently on its own
+    thread (capture.multi_monitor) instead of one huge grab of the virtual desktop;
+    `split_monitors` then writes each monitor to its own file (see output_paths).
+
+    `output_size` (w, h) or `output_scale` shrink the recording: each grab is downscaled
+    (capture.downscale) straight into its smaller ring slot, so everything after the grab works on output pixels.
+
+    With `adaptive_fps` (off by default), `fps` is an upper bound: a short calibration (grab,
+    composite and encode) picks the output rate the machine can sustain, and while recording
+    the capture rate steps between `min_fps` and that rate from the measured grab and encode
+    cost (capture.rate_control).
+
+    With a `media_clock` (capture.media_clock), the time of the first frame is stamped on the
+    recording clock shared with the audio recorder, which lines its track up against it.
+    """
     error_occurred = Signal(str)
     recording_started = Signal() # Renamed concept: now means "Setup Done, Ready for Countdown"
 
-    def __init__(self, output_path, region=None, monitor_index=None, fps=20.0, 
-                 webcam_enabled=False, cursor_enabled=True):
+    def __init__(self, output_path, region=None, monitor_index=None, fps=20.0,
+                 webcam_enabled=False, cursor_enabled=True,
+                 queue_size=None, backpressure=BLOCK, timing=CFR, skip_unchanged=True,
+                 encoder=AUTO, encoder_options=None, live_audio=None, encode_mode=ENCODE_THREAD,
+                 overlay_options=None, replay_buffer=None, segment_seconds=None, segment_bytes=None,
+                 adaptive_fps=False, min_fps=DEFAULT_MIN_FPS, output_size=None, output_scale=None,
+                 multi_monitor=False, split_monitors=False, media_clock=None):
         super().__init__()
         self.output_path = output_path
         self.region = region # tuple (x, y, w, h)
         self.monitor_index = monitor_index # int
         self.fps = fps
+        self.output_size = output_size # (w, h) box the output is fitted into
+        self.output_scale = output_scale # or a plain factor, e.g. 0.5
+        self._downscaler = None # Set in run() when the output is smaller than the capture
+        self._multi = None # MultiMonitorGrabber when all screens are grabbed in parallel
+        self._canvas = None # Full-size stitched canvas, only needed to downscale it
+        self.adaptive_fps = adaptive_fps
+        self.min_fps = min_fps
         self.webcam_enabled = webcam_enabled
         self.cursor_enabled = cursor_enabled
-        
+        self.overlay_options = dict(overlay_options or {}) # pip_corner, pip_scale, pip_shape (see capture.compositor)
+        self.queue_size = queue_size # None = sized from a memory budget
+        self.backpressure = backpressure
+        self.timing = timing
+        if timing == VFR and not exact_remux_available():
+            # VFR writes nothing for repeated frames: only a per-frame remux gives them back their time
+            logging.warning("VFR timing needs mkvmerge for exact frame timestamps; recording CFR instead")
+            self.timing = CFR
+        self.skip_unchanged = skip_unchanged
+        self.encoder_backend = encoder
+        self.encoder_options = dict(encoder_options or {})
+        self.live_audio = live_audio
+        self.encode_mode = encode_mode
+        self.replay_buffer = replay_buffer # capture.replay.ReplayBuffer: keep the last N seconds instead of a file
+        if replay_buffer is not None:
+            # Replay packets are timed by frame index, and the buffer must live in this process
+            self.timing = CFR
+            self.encode_mode = ENCODE_THREAD
+            self.live_audio = None
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.manifest_path = None # Set for segmented output (see capture.segments)
+        if (segment_seconds or segment_bytes) and replay_buffer is None:
+            from capture.segments import manifest_path
+            self.manifest_path = manifest_path(output_path)
+            # Segments are joined by the manager after stop, so per-file timestamps and
+            # live audio are not available; the WAV is kept and merged as usual
+            self.timing = CFR
+            self.live_audio = None
+        self.multi_monitor = multi_monitor
+        self.split_monitors = (split_monitors and multi_monitor and region is None
+                               and monitor_index is None and replay_buffer is None)
+        if self.split_monitors:
+            # One plain file per monitor, all written by the encode thread of this process
+            self.encode_mode = ENCODE_THREAD
+            self.timing = CFR
+            self.live_audio = None
+            self.manifest_path = None
+            self.output_size = self.output_scale = None
+        self._split_paths = None
+        self.encoder = None
+        self.audio_muxed = False # True once a recording finished with live audio in the video file
+        self.media_clock = media_clock
+
+        # Control state; only changed through _set_state() so the capture loop is woken at once
         self.is_running = True
         self.is_paused = False
-        self._recording_active = False # New flag: waits for countdown
-        
+        self._pause_at = None # perf_counter() time of the last pause/resume request
+        self._recording_active = False # Waits for countdown
+        self._state_changed = threading.Condition()
+
+        # Pipeline state / counters
+        self.frame_ring = None # FrameRing, or ProcessEncoder in process mode
+        self.webcam = None # WebcamReader in thread mode
+        self.damage = None
+        self.clock = None # FrameClock of the capture loop
+        self.rate_control = None # AdaptiveRateController when adaptive_fps is on
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.frames_repeated = 0
+        self._encode_error = None
+        self._timestamps = None
+
     def start_capture(self):
         """Called after countdown to actually begin writing frames."""
-        self._recording_active = True
+        self._set_state(_recording_active=True)
+
+    def _set_state(self, **state):
+        with self._state_changed:
+            for name, value in state.items():
+                setattr(self, name, value)
+            self._state_changed.notify_all()
+
+    def _wait_state(self, predicate, timeout=None):
+        """Blocks until predicate() holds or `timeout` runs out; returns predicate()."""
+        with self._state_changed:
+            return self._state_changed.wait_for(predicate, timeout)
+
+    def write_audio(self, block):
+        """Forwards an audio block to the encoder when audio is muxed live (any thread)."""
+        encoder = self.encoder
+        if encoder is not None and encoder.supports_audio:
+            encoder.write_audio(block)
+
+    @property
+    def output_paths(self):
+        """Every video file written: one per monitor with split_monitors, else just output_path."""
+        return list(self._split_paths or [self.output_path])
+
+    def get_stats(self):
+        """Snapshot of pipeline counters (safe to call from any thread)."""
+        stats = {
+            "frames_captured": self.frames_captured,
+            "frames_written": self.frames_written,
+            "frames_repeated": self.frames_repeated,
+        }
+        ring = self.frame_ring
+        if ring is not None:
+            stats.update(ring.stats())
+            if self.encode_mode == ENCODE_PROCESS:
+                stats["frames_written"] = ring.frames_written
+        webcam = self.webcam
+        if webcam is not None:
+            stats.update(webcam.stats())
+        if self.replay_buffer is not None:
+            stats.update(self.replay_buffer.stats())
+        clock = self.clock
+        if clock is not None:
+            stats["frames_late"] = clock.missed
+        if self.rate_control is not None:
+            stats.update(self.rate_control.stats())
+        if self._multi is not None:
+            stats.update(self._multi.stats())
+        damage = self.damage
+        if damage is not None:
+            stats["frames_unchanged"] = damage.frames_unchanged
+            stats["skip_ratio"] = round(damage.skip_ratio, 3)
+        return stats
 
     def run(self):
         try:
-            with mss.mss() as sct:
+            # The engine is bound to this thread, so it is created here rather than in __init__
+            with CaptureEngine() as engine:
                 # Determine capture area
                 if self.region:
                     monitor = {"top": self.region[1], "left": self.region[0], "width": self.region[2], "height": self.region[3]}
                 elif self.monitor_index is not None:
-                    # sct.monitors[0] is all, [1] is first. 
-                    if self.monitor_index + 1 < len(sct.monitors):
-                        monitor = sct.monitors[self.monitor_index + 1]
+                    # monitors[0] is all, [1] is first.
+                    if self.monitor_index + 1 < len(engine.monitors):
+                        monitor = engine.monitor_for(self.monitor_index)
                     else:
-                        monitor = sct.monitors[1] # Fallback
+                        monitor = engine.monitor_for(0) # Fallback
                 else:
-                    monitor = sct.monitors[0] # All screens
+                    monitor = engine.monitor_for(None) # All screens
+                    if self.multi_monitor and len(engine.monitors) > 2:
+                        # Each screen is grabbed on its own thread into one stitched canvas
+                        self._multi = MultiMonitorGrabber(engine.monitors[1:]).start()
+                        monitor = self._multi.desktop
 
                 # Keep original monitor for capturing
                 capture_monitor = monitor.copy()
-                
+
                 # Align capture dimensions to be even numbers upfront
-                # This ensures sct.grab() returns the correct size, avoiding expensive cv2.resize() in the loop
+                # This ensures the grab returns the correct size, avoiding expensive cv2.resize() in the loop
                 if capture_monitor["width"] % 2 != 0:
                     capture_monitor["width"] -= 1
                 if capture_monitor["height"] % 2 != 0:
                     capture_monitor["height"] -= 1
-                
-                width = capture_monitor["width"]
-                height = capture_monitor["height"]
-                    
-                logging.info(f"Video Capture Target: {width}x{height}")
-                
-                # Video Writer Setup
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
-                out = cv2.VideoWriter(self.output_path, fourcc, self.fps, (width, height))
-                
-                if not out.isOpened():
-                    msg = "Could not open VideoWriter. Check codec or file permissions."
-                    logging.error(msg)
-                    self.error_occurred.emit(msg)
-                    return
 
-                # Webcam Setup
-                cap_webcam = None
-                if self.webcam_enabled:
-                    # Use CAP_DSHOW on Windows to avoid black screens/long delays
-                    backend = cv2.CAP_DSHOW if platform.system() == "Windows" else cv2.CAP_ANY
-                    cap_webcam = cv2.VideoCapture(0, backend)
-                    
-                    if not cap_webcam.isOpened():
-                        logging.warning("Could not open webcam.")
-                        cap_webcam = None
-                    else:
-                        # Warmup
-                        ret, _ = cap_webcam.read()
-                        if not ret:
-                            logging.warning("Webcam opened but failed to read frame.")
-                            cap_webcam = None
+                capture_width = capture_monitor["width"]
+                capture_height = capture_monitor["height"]
+
+                logging.info(f"Video Capture Target: {capture_width}x{capture_height}")
+
+                # Probe one grab so the frame buffers match what the grabber really returns
+                if self._multi is not None:
+                    frame_shape = self._multi.shape
+                else:
+                    frame_shape = engine.grab_array(capture_monitor).shape
+
+                # Output size, even like the capture size; downscaling happens right at the grab
+                width, height = output_dimensions(capture_width, capture_height, self.output_size, self.output_scale)
+                if (width, height) != (capture_width, capture_height):
+                    self._downscaler = Downscaler((frame_shape[1], frame_shape[0]), (width, height), frame_shape[2])
+                    if self._multi is not None:
+                        self._canvas = np.empty(frame_shape, dtype=np.uint8)
+                    frame_shape = (height, width, frame_shape[2])
+                    logging.info(f"Video Output: {width}x{height} (area downscale at grab time)")
+                cursor_scale = (width / capture_width, height / capture_height)
+
+                if self.adaptive_fps:
+                    # The output rate is fixed per file, so it is chosen before the encoder opens
+                    self.rate_control = AdaptiveRateController(self.fps, self.min_fps)
+                    self.fps = self.rate_control.calibrate(
+                        self._measure_frame_cost(engine, capture_monitor, frame_shape, width, height))
+                self.clock = FrameClock(self.fps)
+                logging.info(f"Output frame rate: {self.fps:g} fps")
+
+                process_mode = self.encode_mode == ENCODE_PROCESS
+
+                if process_mode:
+                    # Encoder, webcam and sidecar all live in the worker process
+                    if not self._start_encoder_process(frame_shape, width, height):
+                        return
+                    stage = None
+                else:
+                    stage = self._create_encode_stage(width, height)
+                    if stage is None:
+                        return
+                    # Preallocated frame ring between the capture and encode stages
+                    self.frame_ring = FrameRing(frame_shape, capacity=self.queue_size, policy=self.backpressure)
+                logging.info(f"Frame ring: {self.frame_ring.capacity} slots, policy={self.backpressure}, "
+                             f"encode in {self.encode_mode}")
+
+                # The webcam overlay changes every frame, so there is nothing to skip with it on
+                if self.skip_unchanged and not self.webcam_enabled:
+                    self.damage = DamageDetector(frame_shape)
 
                 # Ready for countdown
-                self.recording_started.emit() 
-                
+                self.recording_started.emit()
+
                 # Wait for start signal (Countdown)
-                while self.is_running and not self._recording_active:
-                     time.sleep(0.05)
-                
+                self._wait_state(lambda: self._recording_active or not self.is_running)
+
                 if not self.is_running:
                     # Stopped during countdown
-                    out.release()
-                    if cap_webcam: cap_webcam.release()
+                    if process_mode:
+                        self._finish_encoder_process()
+                        if self.timing == VFR and os.path.exists(sidecar_path(self.output_path)):
+                            os.remove(sidecar_path(self.output_path))
+                    else:
+                        for out in stage.encoders:
+                            self._close_encoder(out)
+                        stage.close()
                     return
 
+                if process_mode:
+                    encode_thread = None
+                else:
+                    if self.timing == VFR:
+                        self._timestamps = TimestampSidecar(sidecar_path(self.output_path))
+                        stage.timestamps = self._timestamps
+                    encode_thread = threading.Thread(
+                        target=self._encode_loop,
+                        args=(stage,),
+                        name="VideoEncode",
+                        daemon=True,
+                    )
+                    encode_thread.start()
+
+                cursor_tracker = CursorTracker() if self.cursor_enabled else None
+
                 logging.info("Starting Main Capture Loop")
-                start_time = time.time()
-                frame_count = 0
-                
+                clock = self.clock
+                origin = clock.start()
+                if self.media_clock is not None:
+                    # Frame pts are relative to this instant
+                    self.media_clock.stamp("video", origin)
+                grab_busy = 0.0 # Seconds spent grabbing, for the rate controller
+                last_cursor = None
+
                 while self.is_running:
                     if self.is_paused:
-                        # Adjust start_time to account for pause duration so we don't jump ahead
-                        pause_start = time.time()
-                        while self.is_paused and self.is_running:
-                            time.sleep(0.1)
-                        # Remove paused duration from 'virtual' start time
-                        start_time += (time.time() - pause_start)
+                        # Paused time is left out of the recording timeline
+                        clock.pause(self._pause_at)
+                        self._wait_state(lambda: not self.is_paused or not self.is_running)
+                        # Stopped while paused: the pause runs until now
+                        clock.resume(None if self.is_paused else self._pause_at)
                         continue
-                        
-                    # Target Frame Calculation for Sync
-                    now = time.time()
-                    elapsed = now - start_time
-                    expected_frames = int(elapsed * self.fps)
-                    
-                    # If we have already written enough frames for this timecode, assume we are "ahead" and wait
-                    # But usually screen recording is slow, so we are "behind".
-                    if frame_count > expected_frames:
-                        # Sleep a tiny bit to limit cpu usage if we are super fast
-                        time.sleep(0.005) 
+
+                    if process_mode and self.frame_ring.poll_error():
+                        # The worker failed; stop capturing, finish() reports the error
+                        break
+
+                    # Wait for the next frame slot; pause and stop cut the wait short
+                    delay = clock.time_to_next()
+                    if delay > 0:
+                        self._wait_state(lambda: self.is_paused or not self.is_running, delay)
                         continue
-                    
-                    # Capture Screen
-                    img = sct.grab(capture_monitor)
-                    frame = np.array(img)
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-                    
-                    # No resize needed if mss gave us the right size, which it should.
-                    # Just in case of some weird driver behavior, we check shape but hopefully skip resize.
-                    if frame.shape[1] != width or frame.shape[0] != height:
-                        frame = cv2.resize(frame, (width, height))
-                    
-                    # Draw Cursor
-                    if self.cursor_enabled:
-                        try:
-                            # ... (Cursor logic same as before, omitted for brevity if using replace_file_content carefully)
-                            cur_x, cur_y = pyautogui.position()
-                            rel_x = cur_x - capture_monitor["left"]
-                            rel_y = cur_y - capture_monitor["top"]
-                            if 0 <= rel_x < width and 0 <= rel_y < height:
-                                cv2.circle(frame, (rel_x, rel_y), 5, (0, 0, 255), 2)
-                        except: pass
-                            
-                    # Draw Webcam Overlay
-                    if cap_webcam:
-                        try:
-                            ret, web_frame = cap_webcam.read()
-                            if ret:
-                                # Resize webcam frame
-                                target_w = width // 5
-                                scale = target_w / web_frame.shape[1]
-                                target_h = int(web_frame.shape[0] * scale)
-                                web_frame = cv2.resize(web_frame, (target_w, target_h))
-                                
-                                padding = 20
-                                y_offset = height - target_h - padding
-                                x_offset = width - target_w - padding
-                                
-                                if y_offset >= 0 and x_offset >= 0:
-                                    h_w, w_w = web_frame.shape[:2]
-                                    if (y_offset + h_w) <= frame.shape[0] and (x_offset + w_w) <= frame.shape[1]:
-                                         frame[y_offset:y_offset+h_w, x_offset:x_offset+w_w] = web_frame
-                                         cv2.rectangle(frame, (x_offset, y_offset), (x_offset+w_w, y_offset+h_w), (255, 255, 255), 2)
-                        except Exception as e_web:
-                             pass
-
-                    # Write Frame
-                    # Logic: If we are behind by N frames, write this frame N times to catch up
-                    # This ensures the video files duration matches Real Time exactly.
-                    
-                    frames_to_write = max(1, expected_frames - frame_count + 1)
-                    
-                    # Cap frames to write to avoid huge lag spike filling? 
-                    # E.g. if system froze for 5s, we'd write 100 frames. That's actually desired for sync.
-                    
-                    for _ in range(frames_to_write):
-                         out.write(frame)
-                         frame_count += 1
-
-                # Cleanup
-                logging.info(f"Stopping recording. Total frames written: {frame_count}")
-                try:
-                    out.release()
-                except: pass
-                
-                if cap_webcam:
-                    try: cap_webcam.release()
-                    except: pass
-                    
+                    # If we fell behind, the missed slots are skipped; CFR fills them with repeats
+                    pts = clock.tick()
+
+                    dropped_before = self.frame_ring.frames_dropped
+                    slot = self.frame_ring.acquire()
+                    if self.damage is not None and self.frame_ring.frames_dropped != dropped_before:
+                        # A dropped frame may have carried the last change, so don't repeat across it
+                        self.damage.reset()
+                    if slot is None:
+                        # Dropped by backpressure policy (or ring closed by an encoder failure)
+                        continue
+
+                    # Capture Screen straight into the preallocated slot
+                    grab_start = time.perf_counter()
+                    try:
+                        self._grab(engine, capture_monitor, slot.buffer)
+                    except Exception:
+                        self.frame_ring.cancel(slot)
+                        raise
+                    grab_busy += time.perf_counter() - grab_start
+                    slot.pts = pts
+                    # Cumulative, so slots of frames dropped on the way are still filled by the next one
+                    slot.due = clock.frames_due
+
+                    # Sample cursor now so it matches the grabbed frame; it is drawn in the encode stage
+                    slot.cursor = None
+                    if cursor_tracker is not None:
+                        position = cursor_tracker.position()
+                        if position is not None:
+                            slot.cursor = (int((position[0] - capture_monitor["left"]) * cursor_scale[0]),
+                                           int((position[1] - capture_monitor["top"]) * cursor_scale[1]))
+
+                    # Damage check on the raw BGRA buffer, before any conversion work is spent on it
+                    slot.repeat = False
+                    if self.damage is not None:
+                        screen_changed = self.damage.changed(slot.buffer)
+                        slot.repeat = not screen_changed and slot.cursor == last_cursor
+                    last_cursor = slot.cursor
+
+                    self.frame_ring.commit(slot)
+                    self.frames_captured += 1
+
+                    if self.rate_control is not None:
+                        encode_busy = stage.busy_seconds if stage is not None else self.frame_ring.busy_seconds
+                        fps = self.rate_control.update(pts, self.frames_captured, grab_busy, encode_busy,
+                                                       clock.missed)
+                        if fps is not None:
+                            clock.set_fps(fps)
+
+                if process_mode:
+                    # The worker drains what is queued and finalizes the file
+                    timestamps_count = self._finish_encoder_process()
+                else:
+                    # Let the encode stage drain what is queued, then finalize the file
+                    self.frame_ring.close()
+                    encode_thread.join()
+
+                    # Cleanup
+                    logging.info(f"Stopping recording. Total frames written: {self.frames_written}")
+                    logging.info(f"Recording stats: {self.get_stats()}")
+                    muxing = bool(self.live_audio) and stage.encoder.supports_audio
+                    for out in stage.encoders:
+                        self._close_encoder(out)
+                    self.audio_muxed = muxing and self._encode_error is None
+                    stage.close()
+
+                    timestamps_count = 0
+                    if self._timestamps is not None:
+                        self._timestamps.close()
+                        timestamps_count = self._timestamps.count
+
+                if self.timing == VFR:
+                    self.output_path = remux_vfr(self.output_path, sidecar_path(self.output_path),
+                                                 timestamps_count, self.fps)
+
+                if self._encode_error is not None:
+                    self.error_occurred.emit(str(self._encode_error))
+
         except Exception as e:
             logging.error(f"Video Recording Error: {e}", exc_info=True)
+            if self.frame_ring is not None:
+                self.frame_ring.close()
+                if self.encode_mode == ENCODE_PROCESS and not self.frame_ring.finished:
+                    # Let the worker finalize what it has and free the shared memory
+                    try: self.frame_ring.finish()
+                    except EncoderError: pass
+            self.error_occurred.emit(str(e))
+
+        finally:
+            if self._multi is not None:
+                self._multi.close()
+
+    def _grab(self, engine, monitor, out):
+        """Grabs `monitor` into the preallocated `out`, downscaling on the way when the output is smaller."""
+        if self._multi is not None:
+            if self._downscaler is None:
+                self._multi.grab(out)
+                return
+            frame = self._multi.grab(self._canvas)
+        elif self._downscaler is None:
+            engine.grab_array(monitor, out=out)
+            return
+        else:
+            frame = engine.grab_array(monitor)
+        # Straight from the grab buffer, the full-size frame is never copied
+        self._downscaler(frame, out)
+
+    def _measure_frame_cost(self, engine, monitor, frame_shape, width, height, frames=40):
+        """
+        Cost of one frame before anything else is running: the slower of the median grab (and
+        scale) and the median encode stage pass (conversion, cursor compositing, one encoder
+        write), the two stages running side by side. The encode stage writes to a throwaway
+        file with the recording's backend and options; the webcam is not open yet.
+        """
+        buffer = np.empty(frame_shape, dtype=np.uint8)
+        options = self._encoder_options()
+        options.pop("live_audio", None)
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(self.output_path or "")[1] or ".mp4")
+        os.close(fd)
+        try:
+            try:
+                out = create_encoder(self.encoder_backend, path, width, height, self.fps, **options)
+            except EncoderError:
+                out = None # Reported when the real encoder is opened
+            stage = EncodeStage(out, width, height, self.fps) if out is not None else None
+            cursor = (width // 2, height // 2)
+            grab_costs, encode_costs = [], []
+            try:
+                for i in range(frames):
+                    start = time.perf_counter()
+                    self._grab(engine, monitor, buffer)
+                    grab_costs.append(time.perf_counter() - start)
+                    if stage is not None:
+                        busy = stage.busy_seconds
+                        stage.process(buffer, i / self.fps, cursor, False, i + 1)
+                        encode_costs.append(stage.busy_seconds - busy)
+            finally:
+                if out is not None:
+                    try: out.close()
+                    except EncoderError: pass
+        finally:
+            try: os.remove(path)
+            except OSError: pass
+        # The encoder's input queue takes the first frames without waiting on the encoder
+        encode_cost = float(np.median(encode_costs[frames // 2:])) if encode_costs else 0.0
+        return max(float(np.median(grab_costs)), encode_cost)
+
+    def _close_encoder(self, out):
+        try:
+            out.close()
+        except EncoderError as e:
+            logging.error(f"Encoder finalize failed: {e}")
+            if self._encode_error is None:
+                self._encode_error = e
+        except: pass
+        finally:
+            self.encoder = None
+
+    def _encoder_options(self):
+        options = dict(self.encoder_options)
+        if self.live_audio:
+            options["live_audio"] = self.live_audio
+        # ffmpeg takes I420 straight from the encode stage; the OpenCV fallback stays on BGR
+        options.setdefault("input_format", YUV420P)
+        return options
+
+    def _create_encode_stage(self, width, height):
+        """Opens the encoder (and webcam) for the in-process encode thread. Returns None on failure."""
+        if self.split_monitors and self._multi is not None:
+            return self._create_split_stage()
+        options = self._encoder_options()
+        try:
+            if self.replay_buffer is not None:
+                from capture.replay import ReplayEncoder
+                out = ReplayEncoder(self.replay_buffer, width, height, self.fps, **options).open()
+            elif self.manifest_path:
+                from capture.segments import create_segmented_encoder
+                out = create_segmented_encoder(self.encoder_backend, self.output_path, width, height, self.fps,
+                                               segment_seconds=self.segment_seconds,
+                                               segment_bytes=self.segment_bytes, **options)
+            else:
+                out = create_encoder(self.encoder_backend, self.output_path, width, height, self.fps, **options)
+        except EncoderError as e:
+            logging.error(str(e))
             self.error_occurred.emit(str(e))
-            
+            return None
+        self.encoder = out
+        logging.info(f"Video encoder: {type(out).__name__}")
+
+        # Webcam frames are read on their own thread so the camera's rate never paces the recording
+        compositor = OverlayCompositor(width, height, **self.overlay_options)
+        if self.webcam_enabled:
+            self.webcam = WebcamReader.open(compositor.pip_width, square=compositor.pip_square)
+        return EncodeStage(out, width, height, self.fps, webcam=self.webcam, compositor=compositor)
+
+    def _create_split_stage(self):
+        """One encoder per monitor, fed from that monitor's part of the canvas. Returns None on failure."""
+        base, ext = os.path.splitext(self.output_path)
+        # Encoders want even frame sizes
+        rects = [(x, y, w // 2 * 2, h // 2 * 2) for x, y, w, h in self._multi.rects]
+        paths = [f"{base}_monitor{i + 1}{ext}" for i in range(len(rects))]
+        options = self._encoder_options()
+        stages = []
+        try:
+            for path, (x, y, w, h) in zip(paths, rects):
+                out = create_encoder(self.encoder_backend, path, w, h, self.fps, **options)
+                compositor = OverlayCompositor(w, h, **self.overlay_options)
+                stages.append(EncodeStage(out, w, h, self.fps, compositor=compositor))
+        except EncoderError as e:
+            for stage in stages:
+                self._close_encoder(stage.encoder)
+            logging.error(str(e))
+            self.error_occurred.emit(str(e))
+            return None
+        self._split_paths = paths
+        self.output_path = paths[0]
+        self.encoder = stages[0].encoder
+        logging.info(f"Recording {len(paths)} monitors to separate files: {paths}")
+
+        # The webcam overlay goes onto the first monitor only
+        if self.webcam_enabled:
+            compositor = stages[0].compositor
+            self.webcam = WebcamReader.open(compositor.pip_width, square=compositor.pip_square)
+            stages[0].webcam = self.webcam
+        return SplitEncodeStage(stages, rects)
+
+    def _encode_loop(self, stage):
+        """Encode stage: drains the frame ring until it is closed and empty."""
+        ring = self.frame_ring
+        try:
+            while True:
+                slot = ring.get()
+                if slot is None:
+                    break # Closed and drained
+
+                try:
+                    stage.process(slot.buffer, slot.pts, slot.cursor, slot.repeat, slot.due)
+                    self.frames_written = stage.frame_count
+                    self.frames_repeated = stage.frames_repeated
+                finally:
+                    ring.release(slot)
+
+        except Exception as e:
+            logging.error(f"Video Encode Error: {e}", exc_info=True)
+            self._encode_error = e
+            # Stop the capture stage; closing the ring unblocks it if it waits for a slot
+            self.stop()
+            ring.close()
+
+    def _start_encoder_process(self, frame_shape, width, height):
+        """Starts the encoder worker process over shared-memory frame slots. Returns False on failure."""
+        from capture.process_encoder import ProcessEncoder
+
+        options = self._encoder_options()
+        config = {
+            "output_path": self.output_path,
+            "width": width,
+            "height": height,
+            "fps": self.fps,
+            "encoder": self.encoder_backend,
+            "encoder_options": options,
+            "live_audio": self.live_audio,
+            "webcam_enabled": self.webcam_enabled,
+            "overlay_options": self.overlay_options,
+            "segment_seconds": self.segment_seconds if self.manifest_path else None,
+            "segment_bytes": self.segment_bytes if self.manifest_path else None,
+            "timestamps_path": sidecar_path(self.output_path) if self.timing == VFR else None,
+            "log_file": log_file,
+        }
+        try:
+            self.frame_ring = ProcessEncoder(frame_shape, config, capacity=self.queue_size,
+                                             policy=self.backpressure).start()
+        except Exception as e: # EncoderError, or e.g. the spawn bootstrap failing; the slots are freed
+            logging.error(f"Encoder process failed to start: {e}")
+            self.error_occurred.emit(str(e))
+            return False
+        # Live audio blocks are relayed to the worker's encoder
+        self.encoder = self.frame_ring
+        return True
+
+    def _finish_encoder_process(self):
+        """Waits for the worker to finalize the file. Returns the number of VFR timestamps written."""
+        self.encoder = None
+        try:
+            final = self.frame_ring.finish()
+        except EncoderError as e:
+            logging.error(f"Encoder process failed: {e}")
+            if self._encode_error is None:
+                self._encode_error = e
+            return 0
+
+        self.frames_written = final["frames_written"]
+        self.frames_repeated = final["frames_repeated"]
+        self.audio_muxed = final["audio_muxed"]
+        logging.info(f"Stopping recording. Total frames written: {self.frames_written}")
+        logging.info(f"Recording stats: {self.get_stats()}")
+        return final["timestamps_count"]
+
     def stop(self):
-        self.is_running = False
-        # Do not wait() here to avoid blocking the main thread. 
+        self._set_state(is_running=False)
+        # Do not wait() here to avoid blocking the main thread.
         # The manager should listen to the 'finished' signal.
 
-    def pause(self):
-        self.is_paused = True
-    
-    def resume(self):
-        self.is_paused = False
+    def pause(self, at=None):
+        """`at`: perf_counter() time of the request, so audio and video leave out the same span."""
+        self._set_state(is_paused=True, _pause_at=at)
+
+    def resume(self, at=None):
+        self._set_state(is_paused=False, _pause_at=at)
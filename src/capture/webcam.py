@@ -0,0 +1,144 @@
+import logging
+import platform
+import threading
+import time
+import cv2
+
+def open_webcam(device=0):
+    """Opens and warms up a webcam. Returns the capture or None."""
+    # Use CAP_DSHOW on Windows to avoid black screens/long delays
+    backend = cv2.CAP_DSHOW if platform.system() == "Windows" else cv2.CAP_ANY
+    cap_webcam = cv2.VideoCapture(device, backend)
+
+    if not cap_webcam.isOpened():
+        logging.warning("Could not open webcam.")
+        return None
+
+    # Warmup
+    ret, _ = cap_webcam.read()
+    if not ret:
+        logging.warning("Webcam opened but failed to read frame.")
+        cap_webcam.release()
+        return None
+    return cap_webcam
+
+class WebcamReader(threading.Thread):
+    """
+    Reads the webcam on its own thread and keeps only the most recent frame,
+    already resized to the overlay size (`overlay_width` wide, camera aspect ratio,
+    or centre-cropped to a square with `square`).
+
+    latest() never blocks, so the webcam's own rate (often 30 fps or less) no longer
+    paces the screen recording. Published frames are never modified afterwards,
+    which makes handing over the reference enough - no copy per composite.
+    """
+
+    def __init__(self, cap_webcam, overlay_width, square=False):
+        super().__init__(name="WebcamReader", daemon=True)
+        self.cap_webcam = cap_webcam
+        self.overlay_width = overlay_width
+        self.square = square
+        self._crop = None # (rows, cols) slices for the square crop
+        self.overlay_size = None # (w, h), known after the first frame
+        self.is_running = True
+
+        self._lock = threading.Lock()
+        self._release_lock = threading.Lock()
+        self._released = False
+        self._latest = None
+        self._latest_time = 0.0
+
+        # Stats
+        self.frames_read = 0
+        self.read_errors = 0
+        self._start_time = None
+        self._stop_time = None
+        self._frames_used = 0
+        self._staleness_total = 0.0
+        self._staleness_max = 0.0
+
+    @classmethod
+    def open(cls, overlay_width, square=False, device=0):
+        """Opens the webcam and starts reading. Returns the reader or None if there is no webcam."""
+        cap_webcam = open_webcam(device)
+        if cap_webcam is None:
+            return None
+        reader = cls(cap_webcam, overlay_width, square=square)
+        reader.start()
+        return reader
+
+    def run(self):
+        self._start_time = time.perf_counter()
+        try:
+            while self.is_running:
+                ret, frame = self.cap_webcam.read() # Blocks until the camera delivers
+                if not ret:
+                    self.read_errors += 1
+                    time.sleep(0.01)
+                    continue
+
+                if self.overlay_size is None:
+                    self._layout(frame.shape[0], frame.shape[1])
+                if self._crop is not None:
+                    frame = frame[self._crop]
+                frame = cv2.resize(frame, self.overlay_size, interpolation=cv2.INTER_AREA)
+
+                with self._lock:
+                    self._latest = frame
+                    self._latest_time = time.perf_counter()
+                self.frames_read += 1
+        finally:
+            # Released here, never while read() may still be running on this thread
+            self._release()
+
+    def _release(self):
+        with self._release_lock:
+            if self._released:
+                return
+            self._released = True
+        try: self.cap_webcam.release()
+        except: pass
+
+    def _layout(self, cam_h, cam_w):
+        if self.square:
+            side = min(cam_h, cam_w)
+            top, left = (cam_h - side) // 2, (cam_w - side) // 2
+            self._crop = (slice(top, top + side), slice(left, left + side))
+            self.overlay_size = (self.overlay_width, self.overlay_width)
+        else:
+            scale = self.overlay_width / cam_w
+            self.overlay_size = (self.overlay_width, max(1, int(cam_h * scale)))
+
+    def latest(self):
+        """Returns the most recent overlay frame (or None before the first one). Never blocks."""
+        with self._lock:
+            frame = self._latest
+            taken = self._latest_time
+        if frame is not None:
+            staleness = time.perf_counter() - taken
+            self._frames_used += 1
+            self._staleness_total += staleness
+            self._staleness_max = max(self._staleness_max, staleness)
+        return frame
+
+    def stats(self):
+        end = self._stop_time or time.perf_counter()
+        elapsed = end - self._start_time if self._start_time else 0.0
+        used = self._frames_used
+        return {
+            "webcam_frames": self.frames_read,
+            "webcam_fps": round(self.frames_read / elapsed, 1) if elapsed > 0 else 0.0,
+            "webcam_staleness_ms": round(self._staleness_total / used * 1000, 1) if used else 0.0,
+            "webcam_max_staleness_ms": round(self._staleness_max * 1000, 1),
+        }
+
+    def stop(self):
+        """Stops reading; the camera is released once the reader thread is out of read()."""
+        self.is_running = False
+        self._stop_time = time.perf_counter()
+        if self.is_alive():
+            self.join(2.0)
+        if self.is_alive():
+            logging.warning("Webcam read still blocked; the camera is released when it returns")
+        else:
+            self._release() # Never started, or already released by the thread
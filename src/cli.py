@@ -0,0 +1,306 @@
+import sys
+import os
+import argparse
+
+# Add local directory to path for imports to work in frozen/script mode
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+# Subcommands, so src/main.py can tell a command line from a GUI launch
+COMMANDS = ("shot", "record", "burst", "export", "send", "devices")
+
+def parse_seconds(text):
+    """'500ms', '30s', '5m', '1h' or plain seconds -> seconds."""
+    text = str(text).strip().lower()
+    units = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    for suffix in ("ms", "s", "m", "h"):
+        if text.endswith(suffix):
+            return float(text[:-len(suffix)]) * units[suffix]
+    return float(text)
+
+def parse_region(text):
+    """'x,y,w,h' -> tuple of ints."""
+    parts = [int(p) for p in text.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("Region must be x,y,w,h")
+    return tuple(parts)
+
+def parse_device(text):
+    """Audio device index or name."""
+    return int(text) if text.isdigit() else text
+
+def default_output(prefix, ext):
+    """captures/<prefix>_<time>.<ext>, like the dashboard."""
+    import datetime
+    save_dir = os.path.join(os.getcwd(), "captures")
+    os.makedirs(save_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    return os.path.join(save_dir, f"{prefix}_{timestamp}.{ext}")
+
+def fail(message):
+    print(f"Error: {message}", file=sys.stderr)
+    return 1
+
+def cmd_shot(args):
+    from capture.engine import CaptureEngine
+    import time
+
+    output = args.output or default_output("capture", args.format or "png")
+    if args.delay:
+        time.sleep(args.delay)
+    try:
+        with CaptureEngine() as engine:
+            if args.region:
+                img = engine.capture_region(*args.region)
+            else:
+                img = engine.capture_fullscreen(args.monitor)
+        # PIL picks the format from the extension unless one was asked for
+        fmt = {"jpg": "JPEG"}.get(args.format, args.format.upper() if args.format else None)
+        img.save(output, format=fmt)
+    except Exception as e:
+        return fail(f"Capture failed: {e}")
+    print(output)
+    return 0
+
+def cmd_record(args):
+    import threading
+    import signal
+    from PySide6.QtCore import QCoreApplication, Qt
+    from capture.video import VideoRecorder
+    from capture.rate_control import DEFAULT_MIN_FPS
+    from capture.media_clock import MediaClock, write_session
+    from capture.audio_formats import audio_extension, supported_samplerate
+
+    # VideoRecorder is a QThread: it needs a core application, but no widgets or event loop
+    if QCoreApplication.instance() is None:
+        app = QCoreApplication(sys.argv[:1])
+    output = args.output or default_output("video", "mp4")
+
+    audio_recorder = None
+    audio_path = None
+    audio_sources = []
+    if args.mic or args.system_audio:
+        from capture.audio_devices import recording_sources, create_recorder
+        try:
+            audio_sources = recording_sources(args.mic, args.system_audio, args.mic_gain, args.system_gain,
+                                              args.mic_device, args.system_device)
+        except ValueError as e:
+            return fail(e)
+    samplerate = supported_samplerate(args.audio_format, args.samplerate)
+    clock = MediaClock()
+    recorder = VideoRecorder(output, region=args.region, monitor_index=args.monitor, fps=args.fps,
+                             cursor_enabled=not args.no_cursor, encoder=args.encoder,
+                             timing=args.timing, live_audio=(samplerate, args.channels) if audio_sources else None,
+                             adaptive_fps=args.adaptive_fps, min_fps=min(DEFAULT_MIN_FPS, args.fps),
+                             output_scale=args.scale, multi_monitor=True, media_clock=clock)
+    if audio_sources:
+        # The audio file is only a fallback for when the encoder can't mux the audio live
+        # (stems are kept either way)
+        audio_path = os.path.splitext(output)[0] + audio_extension(args.audio_format)
+        audio_recorder = create_recorder(audio_path, audio_sources, stems=args.stems, channels=args.channels,
+                                         samplerate=samplerate, sink=recorder.write_audio, media_clock=clock,
+                                         audio_format=args.audio_format)
+
+    # No event loop runs here, so take the signals on the recorder's thread
+    ready = threading.Event()
+    errors = []
+    recorder.recording_started.connect(ready.set, Qt.DirectConnection)
+    recorder.error_occurred.connect(errors.append, Qt.DirectConnection)
+    recorder.start()
+    while not ready.wait(0.1):
+        if recorder.isFinished():
+            return fail(f"Recording could not start: {errors[0] if errors else 'see debug_capture.log'}")
+
+    # Ctrl+C (or the duration running out) stops the recording cleanly
+    done = threading.Event()
+    signal.signal(signal.SIGINT, lambda *a: done.set())
+    clock.start()
+    recorder.start_capture()
+    if audio_recorder:
+        audio_recorder.start()
+    print(f"Recording {'for %gs' % args.duration if args.duration else 'until Ctrl+C'}...", file=sys.stderr)
+    done.wait(args.duration)
+
+    if audio_recorder:
+        audio_recorder.stop()
+    recorder.stop()
+    recorder.wait()
+
+    stems = audio_recorder.output_paths if args.stems and audio_recorder else []
+    if stems or (audio_path and recorder.audio_muxed):
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+        audio_path = None
+    if audio_recorder:
+        # Measured A/V offset, for merging the WAV or exporting later
+        for path in recorder.output_paths:
+            if os.path.exists(path):
+                write_session(path, clock, audio_path, recorder.audio_muxed,
+                              audio_recorder.samplerate, audio_recorder.channels, stems, audio_recorder.silence())
+    for path in recorder.output_paths + ([audio_path] if audio_path else []) + stems:
+        print(path)
+    stats = recorder.get_stats()
+    print(f"{stats['frames_written']} frames written, {stats.get('frames_late', 0)} late, "
+          f"{stats.get('capture_fps', args.fps):g} fps at the end", file=sys.stderr)
+    return fail(errors[0]) if errors else 0
+
+def cmd_export(args):
+    from editor.export import export_video
+
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in ("mp4", "gif"):
+        return fail(f"Unsupported export format: {fmt} (expected mp4 or gif)")
+    if not os.path.exists(args.input):
+        return fail(f"No such file: {args.input}")
+    end_ms = args.end * 1000 if args.end is not None else -1
+    try:
+        message = export_video(args.input, args.output, fmt, trim_start_ms=args.start * 1000,
+                               trim_end_ms=end_ms, audio_path=args.audio, audio_offset=args.audio_offset,
+                               trim_silence=args.trim_silence)
+    except Exception as e:
+        return fail(f"Export failed: {e}")
+    print(message)
+    return 0
+
+def cmd_burst(args):
+    from capture.burst import BurstCapture
+    import datetime
+    import signal
+
+    if args.count is None and args.duration is None:
+        args.count = 10
+    output_dir = args.output or os.path.join(
+        os.getcwd(), "captures", f"burst_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    burst = BurstCapture(output_dir, monitor_index=args.monitor, region=args.region,
+                         interval=args.interval, count=args.count, duration=args.duration,
+                         fmt=args.format, quality=args.quality, workers=args.workers, prefix="shot")
+
+    # Ctrl+C ends the series; shots already taken are still written
+    signal.signal(signal.SIGINT, lambda *a: burst.stop())
+
+    def on_shot(index, stats):
+        if not args.quiet:
+            print(f"\r{stats['shots']} taken, {stats['written']} written, backlog {stats['backlog']}",
+                  end="", flush=True, file=sys.stderr)
+
+    files = burst.run(on_shot=on_shot)
+    stats = burst.stats()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"{len(files)} shots written to {output_dir}")
+    print(f"interval {stats['interval_ms']:.1f} ms, jitter {stats['jitter_ms']:.2f} ms, "
+          f"latest shot {stats['late_max_ms']:.1f} ms behind schedule, "
+          f"encode {stats['encode_ms']:.1f} ms/shot, max backlog {stats['backlog_max']}")
+    return 0 if not burst.errors else 1
+
+def cmd_send(args):
+    # Only the stdlib client is imported: this is what a hotkey runs
+    from utils.ipc import send_command, IPCError
+    import json
+
+    try:
+        reply = send_command(" ".join(args.words), timeout=args.timeout)
+    except IPCError as e:
+        return fail(f"{e}. Start it with: python src/main.py --resident")
+    print(json.dumps(reply))
+    return 0 if reply.get("ok") else 1
+
+def cmd_devices(args):
+    from capture.audio_devices import list_input_devices
+    try:
+        devices = list_input_devices()
+    except Exception as e:
+        return fail(f"Could not list audio devices: {e}")
+    for info in devices:
+        print(f"{info['index']:>3}  {info['kind']:<8}  {info['channels']} ch  {info['samplerate']:>6} Hz  "
+              f"{info['name']} ({info['hostapi']})")
+    return 0
+
+def build_parser():
+    from capture.audio_formats import AUDIO_FORMATS, DEFAULT_AUDIO_FORMAT, DEFAULT_SAMPLERATE, DEFAULT_CHANNELS
+
+    parser = argparse.ArgumentParser(prog="opencapture", description="OpenCapture command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    shot = commands.add_parser("shot", help="Take one screenshot")
+    shot.add_argument("-m", "--monitor", type=int, help="Screen index (default: all screens)")
+    shot.add_argument("-r", "--region", type=parse_region, help="Capture x,y,w,h instead of a screen")
+    shot.add_argument("-f", "--format", choices=["png", "jpg", "webp", "bmp"],
+                      help="Image format (default: from the output extension, else png)")
+    shot.add_argument("--delay", type=parse_seconds, help="Wait before capturing, e.g. 3s")
+    shot.add_argument("-o", "--output", help="Output file (default captures/capture_<time>.png)")
+    shot.set_defaults(func=cmd_shot)
+
+    record = commands.add_parser("record", help="Record the screen to a video")
+    record.add_argument("-m", "--monitor", type=int, help="Screen index (default: all screens)")
+    record.add_argument("-r", "--region", type=parse_region, help="Record x,y,w,h instead of a screen")
+    record.add_argument("-d", "--duration", type=parse_seconds, help="Stop after this long (default: Ctrl+C)")
+    record.add_argument("--fps", type=float, default=30.0, help="Frame rate (upper bound when adaptive)")
+    record.add_argument("--adaptive-fps", action="store_true",
+                        help="Lower the rate when the machine can't keep up")
+    record.add_argument("--timing", choices=["cfr", "vfr"], default="cfr")
+    record.add_argument("--scale", type=float, help="Output scale, e.g. 0.5")
+    record.add_argument("--encoder", default="auto", help="auto, ffmpeg or opencv")
+    record.add_argument("--mic", action="store_true", help="Record the default microphone too")
+    record.add_argument("--system-audio", action="store_true",
+                        help="Record what the computer plays too (needs a loopback input, see 'devices')")
+    record.add_argument("--mic-device", type=parse_device, help="Microphone index or name (see 'devices')")
+    record.add_argument("--system-device", type=parse_device,
+                        help="Loopback input index or name (default: found automatically)")
+    record.add_argument("--mic-gain", type=float, default=1.0, help="Microphone level in the mix, e.g. 0.8")
+    record.add_argument("--system-gain", type=float, default=1.0, help="System audio level in the mix")
+    record.add_argument("--stems", action="store_true",
+                        help="One audio file per source instead of the mixed one (the video still gets the mix)")
+    record.add_argument("--audio-format", choices=list(AUDIO_FORMATS), default=DEFAULT_AUDIO_FORMAT,
+                        help="File format of the microphone track when it is not muxed into the video")
+    record.add_argument("--samplerate", type=int, default=DEFAULT_SAMPLERATE, help="Microphone sample rate in Hz")
+    record.add_argument("--channels", type=int, choices=[1, 2], default=DEFAULT_CHANNELS)
+    record.add_argument("--no-cursor", action="store_true", help="Leave the mouse cursor out")
+    record.add_argument("-o", "--output", help="Output file (default captures/video_<time>.mp4)")
+    record.set_defaults(func=cmd_record)
+
+    export = commands.add_parser("export", help="Trim / convert a recording to MP4 or GIF")
+    export.add_argument("input", help="Recorded video")
+    export.add_argument("output", help="Output .mp4 or .gif")
+    export.add_argument("--start", type=parse_seconds, default=0.0, help="Trim start, e.g. 5s")
+    export.add_argument("--end", type=parse_seconds, help="Trim end (default: end of the video)")
+    export.add_argument("--audio", help="Separate audio recording to include")
+    export.add_argument("--audio-offset", type=float,
+                        help="Seconds the audio starts after the first frame (default: measured while recording)")
+    export.add_argument("--trim-silence", action="store_true",
+                        help="Leave out leading and trailing silence (as detected while recording)")
+    export.add_argument("-f", "--format", choices=["mp4", "gif"], help="Default: from the output extension")
+    export.set_defaults(func=cmd_export)
+
+    burst = commands.add_parser("burst", help="Take a series of screenshots")
+    burst.add_argument("-n", "--count", type=int, help="Number of shots (default 10 without --duration)")
+    burst.add_argument("-d", "--duration", type=parse_seconds, help="Keep shooting for this long, e.g. 5m")
+    burst.add_argument("-i", "--interval", type=parse_seconds, default=0.5,
+                       help="Time between shots, e.g. 500ms (0 = as fast as possible, default 500ms)")
+    burst.add_argument("-f", "--format", choices=["png", "jpg", "webp"], default="png")
+    burst.add_argument("-q", "--quality", type=int, default=90, help="JPEG / WebP quality")
+    burst.add_argument("-m", "--monitor", type=int, help="Screen index (default: all screens)")
+    burst.add_argument("-r", "--region", type=parse_region, help="Capture x,y,w,h instead of a screen")
+    burst.add_argument("-o", "--output", help="Output folder (default captures/burst_<time>)")
+    burst.add_argument("--workers", type=int, help="Encoder threads")
+    burst.add_argument("--quiet", action="store_true", help="No progress line")
+    burst.set_defaults(func=cmd_burst)
+
+    send = commands.add_parser("send", help="Send a command to the resident app (main.py --resident)",
+                               description="Commands: ping, show, quit, capture region, "
+                                           "capture monitor N [to FILE], capture all [to FILE], "
+                                           "record start [monitor N | region X,Y,W,H], record stop, replay save")
+    send.add_argument("words", nargs=argparse.REMAINDER, help="The command, e.g. capture monitor 2")
+    send.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for a reply")
+    send.set_defaults(func=cmd_send)
+
+    devices = commands.add_parser("devices", help="List the audio inputs (microphones and loopback inputs)")
+    devices.set_defaults(func=cmd_devices)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
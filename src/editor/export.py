@@ -0,0 +1,150 @@
+import os
+import logging
+import cv2
+from PIL import Image
+import numpy as np
+from capture.encoders import create_encoder, FFmpegEncoder, AUTO
+from capture.media_clock import audio_offset as session_audio_offset, audible_range
+from utils.ffmpeg import check_ffmpeg, merge_audio_video
+
+def export_video(video_path, output_path, fmt, trim_start_ms=0, trim_end_ms=-1, audio_path=None,
+                 encoder=AUTO, encoder_options=None, progress_callback=None, is_canceled=None,
+                 audio_offset=None, trim_silence=False):
+    """
+    Exports the [trim_start_ms, trim_end_ms] range of a recording as "mp4" or "gif".
+    Runs without any widgets so it can be driven from the editor thread or the command line.
+    A separate `audio_path` is placed `audio_offset` seconds after the first frame; by default
+    the offset measured while recording (session metadata, capture.media_clock).
+    With `trim_silence` the range is narrowed to leave out leading and trailing silence, as
+    found while recording (session metadata; the audio is not decoded for it).
+    Returns a human readable status message; raises on failure.
+    """
+    print(f"Exporting to {output_path}...")
+    if trim_silence:
+        audible = audible_range(video_path)
+        if audible is None:
+            logging.info("No silence data for this recording; exporting the whole range")
+        else:
+            start, end = audible
+            trim_start_ms = max(trim_start_ms, start * 1000)
+            if end is not None:
+                trim_end_ms = end * 1000 if trim_end_ms == -1 else min(trim_end_ms, end * 1000)
+            logging.info(f"Trimmed silence: exporting {trim_start_ms / 1000:.2f}s to "
+                         f"{'end' if trim_end_ms == -1 else f'{trim_end_ms / 1000:.2f}s'}")
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0: fps = 20.0
+
+    total_duration_ms = float(trim_end_ms)
+    if total_duration_ms == -1:
+        total_duration_ms = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps * 1000
+
+    start_frame = int(trim_start_ms / 1000 * fps)
+    end_frame = int(total_duration_ms / 1000 * fps)
+    total_frames_to_process = max(1, end_frame - start_frame)
+
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    frames = []
+    audio_export_path = None
+    has_audio_file = bool(audio_path and os.path.exists(audio_path))
+    if not has_audio_file:
+        audio_offset = 0.0 # Audio muxed into the video is already in place
+    elif audio_offset is None:
+        audio_offset = session_audio_offset(video_path)
+
+    if fmt == "mp4":
+        # The ffmpeg backend muxes the trimmed audio itself: either the separate recording
+        # or the audio track already inside the source video.
+        # Audio time of the first exported frame; negative while the audio has not begun
+        audio_time = trim_start_ms / 1000 - audio_offset
+        duration = max(0.0, (total_duration_ms - trim_start_ms) / 1000)
+        options = dict(encoder_options or {})
+        options.update(
+            audio_file=audio_path if has_audio_file else video_path,
+            audio_start=max(0.0, audio_time),
+            audio_delay=max(0.0, -audio_time),
+            audio_duration=max(0.0, duration + min(0.0, audio_time)),
+        )
+        out = create_encoder(encoder, output_path, width, height, fps, **options)
+
+        # Other backends: slice the audio separately and merge afterwards if possible
+        if not isinstance(out, FFmpegEncoder) and has_audio_file:
+            try:
+                import soundfile as sf
+                data, samplerate = sf.read(audio_path)
+                # Slice data (on the audio's own timeline)
+                start_idx = int((trim_start_ms / 1000 - audio_offset) * samplerate)
+                end_idx = int((total_duration_ms / 1000 - audio_offset) * samplerate)
+                if start_idx < 0:
+                    # The audio began after the first exported frame: lead in with silence
+                    data = np.concatenate([np.zeros((-start_idx,) + data.shape[1:], dtype=data.dtype), data])
+                    end_idx -= start_idx
+                    start_idx = 0
+
+                if start_idx < len(data):
+                     sliced_data = data[start_idx:end_idx] if end_idx > start_idx else data[start_idx:]
+                     audio_export_path = output_path.replace(".mp4", "_audio.wav")
+                     sf.write(audio_export_path, sliced_data, samplerate)
+                     print(f"Exported trimmed audio to {audio_export_path}")
+            except Exception as e:
+                print(f"Audio export failed: {e}")
+
+    curr = start_frame
+    processed_count = 0
+
+    try:
+        while True:
+            if is_canceled and is_canceled(): # Check cancellation
+                 break
+
+            ret, frame = cap.read()
+            if not ret or (end_frame > 0 and curr > end_frame):
+                break
+
+            if fmt == "mp4":
+                out.write(frame)
+            else:
+                # GIF
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                frames.append(Image.fromarray(rgb_frame))
+
+            curr += 1
+            processed_count += 1
+
+            # Emit progress
+            if progress_callback:
+                progress_callback(int((processed_count / total_frames_to_process) * 100))
+    finally:
+        cap.release()
+        if fmt == "mp4":
+            out.close()
+
+    if fmt == "gif" and frames:
+        frames[0].save(output_path, save_all=True, append_images=frames[1:], duration=1000/fps, loop=0)
+
+    final_msg = f"Export finished.\nVideo: {output_path}"
+
+    # ATTEMPT MERGE IF FFMPEG EXISTS
+    if fmt == "mp4" and audio_export_path:
+        if check_ffmpeg():
+            merged_path = output_path.replace(".mp4", "_merged.mp4")
+            success = merge_audio_video(output_path, audio_export_path, merged_path)
+            if success:
+                # Replace original with merged? Or keep both?
+                # Let's replace to be "Single File" as requested
+                try:
+                    os.remove(output_path)
+                    os.remove(audio_export_path)
+                    os.rename(merged_path, output_path)
+                    final_msg = f"Export finished (Merged).\nFile: {output_path}"
+                except:
+                    final_msg += f"\nMerged File: {merged_path}"
+        else:
+            final_msg += "\n\nNote: Audio saved separately (_audio.wav). Install FFmpeg to merge automatically."
+
+    logging.info(f"Export complete: {output_path} ({processed_count} frames)")
+    return final_msg
@@ -3,8 +3,6 @@ from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, Q
 from PySide6.QtCore import Qt, QTimer, QUrl, QSize, Signal
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtMultimediaWidgets import QVideoWidget
-import cv2
-from PIL import Image
 import os
 
 class VideoEditorWindow(QMainWindow):
@@ -26,6 +24,11 @@ class VideoEditorWindow(QMainWindow):
                 break
         self.video_path = video_path
         self.audio_path = audio_path
+        # Where the separate audio track starts on the video timeline (measured while recording)
+        self.audio_offset_ms = 0
+        if audio_path:
+            from capture.media_clock import audio_offset
+            self.audio_offset_ms = int(round(audio_offset(video_path) * 1000))
         
         self.init_ui()
         self.setup_player()
@@ -121,6 +124,16 @@ class VideoEditorWindow(QMainWindow):
         self.lbl_trim_end.setObjectName("sectionHeader")
         trim_layout.addWidget(self.lbl_trim_end)
 
+        # Silence found while recording (session metadata): no need to decode the audio again
+        from capture.media_clock import audible_range
+        self.audible_range = audible_range(self.video_path)
+        self.btn_trim_silence = QPushButton("Trim Silence")
+        self.btn_trim_silence.setFixedHeight(40)
+        self.btn_trim_silence.setToolTip("Set Start / End around the audible part of the recording")
+        self.btn_trim_silence.setEnabled(self.audible_range is not None)
+        self.btn_trim_silence.clicked.connect(self.trim_silence)
+        trim_layout.addWidget(self.btn_trim_silence)
+
         
         self.trim_start_ms = 0
         self.trim_end_ms = -1 # -1 means end
@@ -130,8 +143,11 @@ class VideoEditorWindow(QMainWindow):
     def setup_player(self):
         # Video Player
         self.media_player = QMediaPlayer()
-        # self.media_player.setAudioOutput(self.audio_output) # Video file has no audio usually in this setup
         self.media_player.setVideoOutput(self.video_widget)
+        if not self.audio_path:
+            # No separate track: play the audio muxed into the video file (ffmpeg live mux), if any
+            self.audio_output = QAudioOutput()
+            self.media_player.setAudioOutput(self.audio_output)
         self.media_player.setSource(QUrl.fromLocalFile(self.video_path))
         
         self.media_player.positionChanged.connect(self.position_changed)
@@ -155,7 +171,7 @@ class VideoEditorWindow(QMainWindow):
             self.btn_play.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
         else:
             self.media_player.play()
-            if self.media_player_audio: self.media_player_audio.play()
+            if self.media_player_audio: self.sync_audio(self.media_player.position())
             self.btn_play.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
 
     def toggle_mute(self):
@@ -175,17 +191,35 @@ class VideoEditorWindow(QMainWindow):
         new_pos = self.media_player.position() + (direction * step_ms)
         self.media_player.setPosition(max(0, new_pos))
         if self.media_player_audio:
-             self.media_player_audio.setPosition(max(0, new_pos))
+             self.sync_audio(max(0, new_pos))
+
+    def sync_audio(self, position):
+        """Puts the audio player where the video is at `position`, holding it back until the audio begins."""
+        target = position - self.audio_offset_ms
+        playing = self.media_player.playbackState() == QMediaPlayer.PlayingState
+        self.media_player_audio.setPosition(max(0, target))
+        if target < 0:
+            self.media_player_audio.pause()
+            if playing:
+                QTimer.singleShot(-target, self._start_audio)
+        elif playing:
+            self.media_player_audio.play()
+        else:
+            self.media_player_audio.pause()
+
+    def _start_audio(self):
+        if self.media_player.playbackState() == QMediaPlayer.PlayingState:
+            self.media_player_audio.play()
 
     def position_changed(self, position):
         self.slider.setValue(position)
         self.update_duration_label(position, self.media_player.duration())
         
-        # Sync audio drift check (simple)
+        # The tracks start aligned (session offset); this only catches the two players drifting apart
         if self.media_player_audio and self.media_player_audio.playbackState() == QMediaPlayer.PlayingState:
-             diff = abs(self.media_player_audio.position() - position)
+             diff = abs(self.media_player_audio.position() - (position - self.audio_offset_ms))
              if diff > 200: # 200ms drift
-                 self.media_player_audio.setPosition(position)
+                 self.sync_audio(position)
 
     def duration_changed(self, duration):
         self.slider.setRange(0, duration)
@@ -196,7 +230,7 @@ class VideoEditorWindow(QMainWindow):
     def set_position(self, position):
         self.media_player.setPosition(position)
         if self.media_player_audio:
-            self.media_player_audio.setPosition(position)
+            self.sync_audio(position)
 
     def update_duration_label(self, current, total):
         def fmt(ms):
@@ -214,6 +248,14 @@ class VideoEditorWindow(QMainWindow):
         self.trim_end_ms = self.media_player.position()
         self.lbl_trim_end.setText(f"End: {self.trim_end_ms/1000:.1f}s")
 
+    def trim_silence(self):
+        start, end = self.audible_range
+        self.trim_start_ms = int(start * 1000)
+        self.lbl_trim_start.setText(f"Start: {self.trim_start_ms/1000:.1f}s")
+        if end is not None:
+            self.trim_end_ms = int(end * 1000)
+            self.lbl_trim_end.setText(f"End: {self.trim_end_ms/1000:.1f}s")
+
     def save_as_gif(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save GIF", "", "GIF Files (*.gif)")
         if not path:
@@ -258,99 +300,16 @@ class VideoEditorWindow(QMainWindow):
             QMessageBox.critical(self, "Export Failed", message)
 
     def _export_thread(self, output_path, fmt):
+        from editor.export import export_video
         try:
-            print(f"Exporting to {output_path}...")
-            cap = cv2.VideoCapture(self.video_path)
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            if fps <= 0: fps = 20.0
-            
-            total_duration_ms = float(self.trim_end_ms)
-            if total_duration_ms == -1:
-                total_duration_ms = self.media_player.duration()
-                
-            start_frame = int(self.trim_start_ms / 1000 * fps)
-            end_frame = int(total_duration_ms / 1000 * fps)
-            total_frames_to_process = max(1, end_frame - start_frame)
-            
-            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-            
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            
-            frames = []
-            audio_export_path = None
-            
-            if fmt == "mp4":
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-                
-                # Handling Audio Slice separately
-                if self.audio_path and os.path.exists(self.audio_path):
-                    try:
-                        import soundfile as sf
-                        data, samplerate = sf.read(self.audio_path)
-                        # Slice data
-                        start_idx = int(self.trim_start_ms / 1000 * samplerate)
-                        end_idx = int(total_duration_ms / 1000 * samplerate)
-                        
-                        if start_idx < len(data):
-                             sliced_data = data[start_idx:end_idx] if end_idx > start_idx else data[start_idx:]
-                             audio_export_path = output_path.replace(".mp4", "_audio.wav")
-                             sf.write(audio_export_path, sliced_data, samplerate)
-                             print(f"Exported trimmed audio to {audio_export_path}")
-                    except Exception as e:
-                        print(f"Audio export failed: {e}")
-            
-            curr = start_frame
-            processed_count = 0
-            
-            while True:
-                if self.progress_dialog.wasCanceled(): # Check cancellation
-                     break
-                     
-                ret, frame = cap.read()
-                if not ret or (end_frame > 0 and curr > end_frame):
-                    break
-                
-                if fmt == "mp4":
-                    out.write(frame)
-                else:
-                    # GIF
-                    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    frames.append(Image.fromarray(rgb_frame))
-                
-                curr += 1
-                processed_count += 1
-                
-                # Emit progress
-                progress = int((processed_count / total_frames_to_process) * 100)
-                self.export_progress.emit(progress)
-            
-            cap.release()
-            if fmt == "mp4":
-                out.release()
-            elif fmt == "gif" and frames:
-                frames[0].save(output_path, save_all=True, append_images=frames[1:], duration=1000/fps, loop=0)
-            
-            # ATTEMPT MERGE IF FFMPEG EXISTS
-            final_msg = f"Export finished.\nVideo: {output_path}"
-            if fmt == "mp4" and audio_export_path:
-                if self.check_ffmpeg():
-                    merged_path = output_path.replace(".mp4", "_merged.mp4")
-                    success = self.merge_audio_video(output_path, audio_export_path, merged_path)
-                    if success:
-                        # Replace original with merged? Or keep both?
-                        # Let's replace to be "Single File" as requested
-                        try:
-                            os.remove(output_path)
-                            os.remove(audio_export_path)
-                            os.rename(merged_path, output_path)
-                            final_msg = f"Export finished (Merged).\nFile: {output_path}"
-                        except:
-                            final_msg += f"\nMerged File: {merged_path}"
-                else:
-                    final_msg += "\n\nNote: Audio saved separately (_audio.wav). Install FFmpeg to merge automatically."
-
+            final_msg = export_video(
+                self.video_path, output_path, fmt,
+                trim_start_ms=self.trim_start_ms,
+                trim_end_ms=self.trim_end_ms,
+                audio_path=self.audio_path,
+                progress_callback=self.export_progress.emit,
+                is_canceled=self.progress_dialog.wasCanceled,
+            )
             self.export_finished_signal.emit("success", final_msg)
             
         except Exception as e:
@@ -359,28 +318,12 @@ class VideoEditorWindow(QMainWindow):
 
     def check_ffmpeg(self):
         """Check if ffmpeg is in system path."""
-        import shutil
-        return shutil.which("ffmpeg") is not None
+        from utils.ffmpeg import check_ffmpeg
+        return check_ffmpeg()
 
     def merge_audio_video(self, video_path, audio_path, output_path):
-        import subprocess
-        try:
-            # -y overwrites output
-            # -c:v copy -c:a aac copies video, encodes audio to aac
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-i", audio_path,
-                "-c:v", "copy",
-                "-c:a", "aac",
-                "-strict", "experimental",
-                output_path
-            ]
-            subprocess.check_call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            return True
-        except Exception as e:
-            print(f"Merge Error: {e}")
-            return False
+        from utils.ffmpeg import merge_audio_video
+        return merge_audio_video(video_path, audio_path, output_path)
             
     def closeEvent(self, event):
         self.media_player.stop()
@@ -5,12 +5,17 @@ import os
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from PySide6.QtWidgets import QApplication
-from PySide6.QtCore import Qt
-from ui.dashboard import Dashboard
+# Only Qt and the dashboard are imported before the window is up. Capture, editor and
+# media modules (cv2, numpy, mss, sounddevice, QtMultimedia) are imported on first use,
+# or preloaded in the background once the window is showing (Dashboard.preload_capture_stack).
+# bench_startup.py checks this and the time to first paint against a budget.
 
-def main():
-    app = QApplication(sys.argv)
+def create_app(argv=None, show=True):
+    """Builds the application and the dashboard (shown unless `show` is False); returns (app, window)."""
+    from PySide6.QtWidgets import QApplication
+    from ui.dashboard import Dashboard
+
+    app = QApplication(sys.argv if argv is None else argv)
     
     # Initialize Main Dashboard
     window = Dashboard()
@@ -19,9 +24,34 @@ def main():
     from ui.styles import DARK_THEME
     app.setStyleSheet(DARK_THEME)
     
-    window.show()
-    
+    if show:
+        window.show()
+    return app, window
+
+def main():
+    # --resident: stay in the tray, warmed up, and take commands from `main.py send ...`
+    resident = "--resident" in sys.argv
+    argv = [arg for arg in sys.argv if arg != "--resident"]
+    app, window = create_app(argv, show=not resident)
+    if resident:
+        app.setQuitOnLastWindowClosed(False)
+        if not window.start_resident():
+            # Already running: bring that instance forward instead
+            from utils.ipc import send_command, IPCError
+            try:
+                send_command("show")
+            except IPCError:
+                pass
+            sys.exit(0)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Needed for the encoder worker process in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+    # `main.py shot|record|burst|export ...` runs headless, without building any widgets
+    import cli
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMMANDS:
+        sys.exit(cli.main())
     main()
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import shlex
+import time
+from PySide6.QtCore import QObject
+from PySide6.QtNetwork import QLocalServer
+from utils.ipc import server_name, is_running
+
+HELP = ("ping | show | quit | capture region | capture monitor N [to FILE] | capture all [to FILE] | "
+        "record start [monitor N | region X,Y,W,H] | record stop | replay save")
+
+class CommandServer(QObject):
+    """
+    Local command channel of the resident app (protocol and client: utils.ipc).
+
+    Listens on a per-user local socket (a named pipe on Windows) that only the current
+    user can connect to, and runs each command on the GUI thread against the Dashboard,
+    reusing its warm capture engine and overlays. Monitors are numbered from 1, like
+    in the dashboard.
+    """
+
+    def __init__(self, dashboard, name=None):
+        super().__init__(dashboard)
+        self.dashboard = dashboard
+        self.name = name or server_name()
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def start(self):
+        """Starts listening. Returns False if another resident instance already owns the name."""
+        # Ask first: with UserAccessOption, listen() would silently take the name over
+        if is_running(self.name):
+            logging.info(f"Command server: {self.name} is served by another instance")
+            return False
+        # Anything left is from an instance that crashed
+        QLocalServer.removeServer(self.name)
+        if not self.server.listen(self.name):
+            logging.error(f"Command server could not listen on {self.name}: {self.server.errorString()}")
+            return False
+        logging.info(f"Command server listening on {self.server.fullServerName()}")
+        return True
+
+    def close(self):
+        self.server.close()
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            sock.readyRead.connect(lambda s=sock: self._on_ready_read(s))
+            sock.disconnected.connect(sock.deleteLater)
+            if sock.canReadLine():
+                # The request may have arrived together with the connection
+                self._on_ready_read(sock)
+
+    def _on_ready_read(self, sock):
+        if not sock.canReadLine():
+            return
+        line = bytes(sock.readLine()).decode("utf-8", errors="replace").strip()
+        start = time.perf_counter()
+        reply = self.handle(line)
+        logging.info(f"Command '{line}' -> {reply} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        sock.write(json.dumps(reply).encode("utf-8") + b"\n")
+        sock.flush()
+        sock.disconnectFromServer()
+
+    # --- COMMANDS ---
+    def handle(self, line):
+        """Runs one command line and returns the reply dict."""
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        if not words:
+            return {"ok": False, "error": f"Empty command. Commands: {HELP}"}
+        handler = getattr(self, f"cmd_{words[0].lower()}", None)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command '{words[0]}'. Commands: {HELP}"}
+        try:
+            return handler(words[1:])
+        except ValueError as e:
+            # Bad arguments or wrong state: the client gets the message
+            logging.warning(f"Command '{line}' rejected: {e}")
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            logging.error(f"Command '{line}' failed: {e}", exc_info=True)
+            return {"ok": False, "error": str(e)}
+
+    def cmd_ping(self, args):
+        return {"ok": True, "pid": os.getpid()}
+
+    def cmd_show(self, args):
+        self.dashboard.showNormal()
+        self.dashboard.raise_()
+        self.dashboard.activateWindow()
+        return {"ok": True}
+
+    def cmd_quit(self, args):
+        from PySide6.QtWidgets import QApplication
+        from PySide6.QtCore import QTimer
+        # After the reply is sent
+        QTimer.singleShot(0, QApplication.instance().quit)
+        return {"ok": True}
+
+    def cmd_capture(self, args):
+        if not args:
+            raise ValueError("capture what? region, monitor N or all")
+        target = args[0].lower()
+        if target == "region":
+            # Interactive: the selection opens the editor as usual
+            self.dashboard.start_capture()
+            return {"ok": True}
+
+        if target == "monitor":
+            if len(args) < 2:
+                raise ValueError("capture monitor needs a monitor number")
+            monitor_index = self._monitor_index(args[1])
+            rest = args[2:]
+        elif target == "all":
+            monitor_index = None
+            rest = args[1:]
+        else:
+            raise ValueError(f"Unknown capture target '{args[0]}'")
+
+        path = None
+        if rest:
+            if rest[0].lower() != "to" or len(rest) != 2:
+                raise ValueError("Expected 'to FILE'")
+            path = os.path.abspath(rest[1])
+
+        if path is None:
+            # Same as the dashboard buttons: grab and open the editor
+            self.dashboard.start_full_capture(monitor_index)
+            return {"ok": True}
+        img = self.dashboard.get_capture_engine().capture_fullscreen(monitor_index)
+        img.save(path)
+        return {"ok": True, "path": path, "size": list(img.size)}
+
+    def cmd_record(self, args):
+        if not args:
+            raise ValueError("record start or record stop")
+        action = args[0].lower()
+        dashboard = self.dashboard
+        manager = getattr(dashboard, 'recorder_manager', None)
+        recording = bool(manager and manager.video_recorder and manager.video_recorder.isRunning())
+
+        if action == "stop":
+            if not recording:
+                raise ValueError("Not recording")
+            manager.stop_recording()
+            return {"ok": True}
+        if action != "start":
+            raise ValueError(f"Unknown record action '{args[0]}'")
+        if recording:
+            raise ValueError("Already recording")
+
+        monitor_index, region = 0, None
+        if len(args) >= 3 and args[1].lower() == "monitor":
+            monitor_index = self._monitor_index(args[2])
+        elif len(args) >= 3 and args[1].lower() == "region":
+            region = tuple(int(v) for v in args[2].split(","))
+            if len(region) != 4:
+                raise ValueError("Region must be X,Y,W,H")
+            monitor_index = None
+        elif len(args) > 1:
+            raise ValueError("Expected 'monitor N' or 'region X,Y,W,H'")
+
+        tab = dashboard.video_tab
+        dashboard.start_recording_manager(monitor_index, region, tab.chk_mic.isChecked(),
+                                          tab.chk_webcam.isChecked(), tab.chk_cursor.isChecked())
+        return {"ok": True}
+
+    def cmd_replay(self, args):
+        if not args or args[0].lower() != "save":
+            raise ValueError("replay save")
+        manager = getattr(self.dashboard, 'recorder_manager', None)
+        if manager is None or manager.replay_buffer is None:
+            raise ValueError("No replay buffer running")
+        manager.save_replay()
+        return {"ok": True}
+
+    def _monitor_index(self, text):
+        from PySide6.QtGui import QGuiApplication
+        number = int(text)
+        count = len(QGuiApplication.screens())
+        if not 1 <= number <= count:
+            raise ValueError(f"Monitor {number} does not exist (1-{count})")
+        return number - 1
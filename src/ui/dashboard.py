@@ -1,9 +1,36 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QPushButton, 
                                QLabel, QHBoxLayout, QListWidget, QSystemTrayIcon, QMenu, QStyle, QApplication, QTabWidget, QMessageBox)
-from PySide6.QtCore import Qt, QSize
+from PySide6.QtCore import Qt, QSize, QThread, Signal
 from PySide6.QtGui import QIcon, QAction
 import sys
 
+# Imported in the background after the window is shown, see Dashboard.preload_capture_stack.
+# Audio (PortAudio) and QtMultimedia stay on first use: they are slow to initialise and
+# only needed once a recording is made or opened.
+PRELOAD_MODULES = ("capture.engine", "capture.region", "editor.window", "capture.video")
+PRELOAD_DELAY_MS = 500
+SEGMENT_SECONDS = 300 # Length of each part with "Crash-Safe Segments"
+
+class BurstWorker(QThread):
+    """Runs a capture.burst.BurstCapture off the UI thread and reports its progress."""
+    progress = Signal(dict) # BurstCapture.stats() after each shot
+    finished_burst = Signal(list, dict) # Written files, final stats
+    failed = Signal(str)
+
+    def __init__(self, burst):
+        super().__init__()
+        self.burst = burst
+
+    def run(self):
+        try:
+            files = self.burst.run(on_shot=lambda index, stats: self.progress.emit(stats))
+        except Exception as e:
+            import logging
+            logging.error(f"Burst capture failed: {e}", exc_info=True)
+            self.failed.emit(str(e))
+            return
+        self.finished_burst.emit(files, self.burst.stats())
+
 class ImageCaptureWidget(QWidget):
     def __init__(self, parent_dashboard):
         super().__init__()
@@ -45,6 +72,51 @@ class ImageCaptureWidget(QWidget):
             btn_all.clicked.connect(lambda checked=False: self.dashboard.start_full_capture(None))
             layout.addWidget(btn_all)
 
+        # Burst: a series of screenshots written in the background
+        from PySide6.QtWidgets import QGroupBox, QSpinBox, QComboBox
+        burst_group = QGroupBox("Burst Capture")
+        burst_layout = QVBoxLayout()
+
+        burst_row = QHBoxLayout()
+        burst_row.addWidget(QLabel("Every"))
+        self.spin_burst_interval = QSpinBox()
+        self.spin_burst_interval.setRange(0, 60000)
+        self.spin_burst_interval.setSingleStep(100)
+        self.spin_burst_interval.setValue(500)
+        self.spin_burst_interval.setSuffix(" ms")
+        self.spin_burst_interval.setSpecialValueText("As fast as possible")
+        burst_row.addWidget(self.spin_burst_interval)
+        self.spin_burst_count = QSpinBox()
+        self.spin_burst_count.setRange(1, 100000)
+        self.spin_burst_count.setValue(10)
+        self.spin_burst_count.setSuffix(" shots")
+        burst_row.addWidget(self.spin_burst_count)
+        burst_layout.addLayout(burst_row)
+
+        target_row = QHBoxLayout()
+        self.combo_burst_screen = QComboBox()
+        for i, screen in enumerate(screens):
+            self.combo_burst_screen.addItem(screen.name(), i)
+        if len(screens) > 1:
+            self.combo_burst_screen.addItem("All Screens", None)
+        target_row.addWidget(self.combo_burst_screen)
+        self.combo_burst_format = QComboBox()
+        self.combo_burst_format.addItems(["png", "jpg", "webp"])
+        target_row.addWidget(self.combo_burst_format)
+        burst_layout.addLayout(target_row)
+
+        self.btn_burst = QPushButton("Start Burst")
+        self.btn_burst.setFixedHeight(40)
+        self.btn_burst.clicked.connect(self.dashboard.toggle_burst)
+        burst_layout.addWidget(self.btn_burst)
+
+        # Shots taken / written, encoder backlog and interval jitter while it runs
+        self.lbl_burst_status = QLabel("")
+        burst_layout.addWidget(self.lbl_burst_status)
+
+        burst_group.setLayout(burst_layout)
+        layout.addWidget(burst_group)
+
         layout.addStretch()
 
 class VideoCaptureWidget(QWidget):
@@ -72,6 +144,55 @@ class VideoCaptureWidget(QWidget):
         self.chk_mic.setChecked(True)
         options_layout.addWidget(self.chk_mic)
 
+        # What the computer plays, through a loopback input (capture.audio_devices)
+        self.chk_system_audio = QCheckBox("Record System Audio")
+        self.chk_system_audio.setToolTip("Mixed with the microphone; needs a loopback input "
+                                         "(PulseAudio/PipeWire monitor, Stereo Mix, BlackHole)")
+        options_layout.addWidget(self.chk_system_audio)
+
+        # Microphone file format, sample rate and channels
+        from PySide6.QtWidgets import QComboBox
+        from capture.audio_formats import AUDIO_FORMATS, SAMPLERATES, DEFAULT_SAMPLERATE
+        audio_row = QHBoxLayout()
+        audio_row.addWidget(QLabel("Audio"))
+        self.combo_audio_format = QComboBox()
+        for name, label in zip(AUDIO_FORMATS, ("WAV", "FLAC (lossless)", "Opus (small)")):
+            self.combo_audio_format.addItem(label, name)
+        self.combo_audio_format.setToolTip("Compressed formats are encoded while recording")
+        audio_row.addWidget(self.combo_audio_format)
+        self.combo_samplerate = QComboBox()
+        for rate in SAMPLERATES:
+            self.combo_samplerate.addItem(f"{rate / 1000:g} kHz", rate)
+        self.combo_samplerate.setCurrentIndex(SAMPLERATES.index(DEFAULT_SAMPLERATE))
+        audio_row.addWidget(self.combo_samplerate)
+        self.combo_channels = QComboBox()
+        self.combo_channels.addItem("Mono", 1)
+        self.combo_channels.addItem("Stereo", 2)
+        audio_row.addWidget(self.combo_channels)
+        self.chk_mic.toggled.connect(self.on_audio_toggled)
+        options_layout.addLayout(audio_row)
+
+        # Level of each source in the mix, and whether to keep them as separate files
+        from PySide6.QtWidgets import QSpinBox
+        mix_row = QHBoxLayout()
+        mix_row.addWidget(QLabel("Mic"))
+        self.spin_mic_gain = QSpinBox()
+        mix_row.addWidget(self.spin_mic_gain)
+        mix_row.addWidget(QLabel("System"))
+        self.spin_system_gain = QSpinBox()
+        mix_row.addWidget(self.spin_system_gain)
+        for spin in (self.spin_mic_gain, self.spin_system_gain):
+            spin.setRange(0, 200)
+            spin.setSingleStep(10)
+            spin.setValue(100)
+            spin.setSuffix(" %")
+        self.chk_audio_stems = QCheckBox("Separate Tracks")
+        self.chk_audio_stems.setToolTip("One audio file per source instead of the mix")
+        mix_row.addWidget(self.chk_audio_stems)
+        self.chk_system_audio.toggled.connect(self.on_audio_toggled)
+        options_layout.addLayout(mix_row)
+        self.on_audio_toggled()
+
         self.chk_webcam = QCheckBox("Round Webcam Overlay")
         options_layout.addWidget(self.chk_webcam)
         
@@ -79,6 +200,29 @@ class VideoCaptureWidget(QWidget):
         self.chk_cursor.setChecked(True)
         options_layout.addWidget(self.chk_cursor)
 
+        # Opt-in: rolling 5 minute files joined at stop (CFR only, needs ffmpeg for the join)
+        self.chk_segments = QCheckBox("Crash-Safe Segments")
+        self.chk_segments.setToolTip("Write the video in 5 minute parts that survive a crash; "
+                                     "joined into one file at stop (needs ffmpeg)")
+        options_layout.addWidget(self.chk_segments)
+
+        # Opt-in: the screen refresh rate becomes an upper bound (capture.rate_control)
+        self.chk_adaptive_fps = QCheckBox("Adaptive Frame Rate")
+        self.chk_adaptive_fps.setToolTip("Lower the frame rate when capture or encoding can't keep up "
+                                         "with the screen refresh rate; every change is logged")
+        options_layout.addWidget(self.chk_adaptive_fps)
+
+        # Instant replay length (seconds kept in memory)
+        replay_row = QHBoxLayout()
+        replay_row.addWidget(QLabel("Replay Length"))
+        self.spin_replay = QSpinBox()
+        self.spin_replay.setRange(30, 120)
+        self.spin_replay.setSingleStep(15)
+        self.spin_replay.setValue(60)
+        self.spin_replay.setSuffix(" s")
+        replay_row.addWidget(self.spin_replay)
+        options_layout.addLayout(replay_row)
+
         options_group.setLayout(options_layout)
         layout.addWidget(options_group)
 
@@ -99,8 +243,23 @@ class VideoCaptureWidget(QWidget):
             btn.clicked.connect(lambda checked=False, idx=i: self.dashboard.start_video_capture("screen", idx))
             layout.addWidget(btn)
 
+        # Instant replay: keeps recording the primary screen, saves the last N seconds on demand
+        self.btn_replay = QPushButton("Start Replay Buffer")
+        self.btn_replay.setFixedHeight(50)
+        self.btn_replay.setToolTip("Keep the last seconds of the primary screen in memory; save them at any time")
+        self.btn_replay.clicked.connect(lambda: self.dashboard.start_video_capture("replay", 0))
+        layout.addWidget(self.btn_replay)
+
         layout.addStretch()
 
+    def on_audio_toggled(self, checked=None):
+        mic, system = self.chk_mic.isChecked(), self.chk_system_audio.isChecked()
+        for combo in (self.combo_audio_format, self.combo_samplerate, self.combo_channels):
+            combo.setEnabled(mic or system)
+        self.spin_mic_gain.setEnabled(mic)
+        self.spin_system_gain.setEnabled(system)
+        self.chk_audio_stems.setEnabled(mic and system)
+
 class Dashboard(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -194,6 +353,11 @@ class Dashboard(QMainWindow):
         capture_video_action = QAction("Record Video (Region)", self)
         capture_video_action.triggered.connect(lambda: self.start_video_capture("region"))
         menu.addAction(capture_video_action)
+
+        self.save_replay_action = QAction("Save Replay", self)
+        self.save_replay_action.setEnabled(False) # Only while a replay buffer is running
+        self.save_replay_action.triggered.connect(self.save_replay)
+        menu.addAction(self.save_replay_action)
         
         quit_action = QAction("Quit", self)
         quit_action.triggered.connect(QApplication.instance().quit)
@@ -205,6 +369,47 @@ class Dashboard(QMainWindow):
     def showEvent(self, event):
         self.load_recent_captures()
         super().showEvent(event)
+        if not getattr(self, '_preload_scheduled', False):
+            # Once the window is up, warm the capture stack so the first capture doesn't pay for it
+            self._preload_scheduled = True
+            from PySide6.QtCore import QTimer
+            QTimer.singleShot(PRELOAD_DELAY_MS, self.preload_capture_stack)
+
+    def start_resident(self):
+        """
+        Resident mode: the app lives in the tray with everything a capture needs already loaded
+        (capture session open, overlays built, capture/encoder modules imported) and takes
+        commands from utils.ipc clients. Returns False if another instance is already resident.
+        """
+        from ui.command_server import CommandServer
+        self.command_server = CommandServer(self)
+        if not self.command_server.start():
+            return False
+        self.resident = True
+
+        engine = self.get_capture_engine()
+        engine.open()
+        engine.monitors # Enumerate screens now rather than on the first grab
+        self.get_region_overlays()
+        self.preload_capture_stack()
+        self.tray_icon.setToolTip("OpenCapture (resident)")
+        return True
+
+    def preload_capture_stack(self):
+        """Imports the capture/editor modules on a background thread (they are otherwise loaded on first use)."""
+        import threading
+
+        def preload():
+            import importlib
+            import logging
+            for name in PRELOAD_MODULES:
+                try:
+                    importlib.import_module(name)
+                except Exception as e:
+                    # Not fatal: the module is imported again (and the error shown) when it is used
+                    logging.warning(f"Preloading {name} failed: {e}")
+
+        threading.Thread(target=preload, name="PreloadCaptureStack", daemon=True).start()
 
     # --- IMAGE CAPTURE METHODS ---
     def start_capture(self):
@@ -212,17 +417,32 @@ class Dashboard(QMainWindow):
         QApplication.processEvents()
         
         # Open Overlay for each screen
-        from capture.region import RegionSelectionOverlay
-        from PySide6.QtGui import QGuiApplication
-        
-        self.overlays = []
-        for screen in QGuiApplication.screens():
-            overlay = RegionSelectionOverlay(screen)
-            overlay.selection_made.connect(self.on_selection_made)
-            overlay.selection_updated.connect(self.on_selection_updated)
-            overlay.canceled.connect(self.on_capture_canceled)
+        self.overlays = list(self.get_region_overlays())
+        for overlay in self.overlays:
+            overlay.reset()
             overlay.show()
-            self.overlays.append(overlay)
+
+    def get_region_overlays(self):
+        """
+        One selection overlay per screen for image capture, built once and reused (they only
+        hide on close). Rebuilt when the screen layout changes.
+        """
+        from PySide6.QtGui import QGuiApplication
+        screens = QGuiApplication.screens()
+        layout = [(screen.name(), screen.geometry().getRect()) for screen in screens]
+        if getattr(self, '_region_overlays', None) is None or layout != self._region_overlay_layout:
+            from capture.region import RegionSelectionOverlay
+            for overlay in getattr(self, '_region_overlays', None) or []:
+                overlay.deleteLater()
+            self._region_overlays = []
+            for screen in screens:
+                overlay = RegionSelectionOverlay(screen)
+                overlay.selection_made.connect(self.on_selection_made)
+                overlay.selection_updated.connect(self.on_selection_updated)
+                overlay.canceled.connect(self.on_capture_canceled)
+                self._region_overlays.append(overlay)
+            self._region_overlay_layout = layout
+        return self._region_overlays
 
     def on_selection_updated(self, rect):
         for overlay in self.overlays:
@@ -234,20 +454,53 @@ class Dashboard(QMainWindow):
             for overlay in self.overlays:
                 overlay.close()
             self.overlays = []
-        self.show()
+        self._restore_window()
+
+    def _restore_window(self):
+        """Brings the dashboard back after a capture; in resident mode it stays in the tray."""
+        if not getattr(self, 'resident', False):
+            self.show()
+
+    def get_capture_engine(self):
+        """Returns the dashboard's long-lived capture engine, creating it on first use."""
+        if getattr(self, 'capture_engine', None) is None:
+            from capture.engine import CaptureEngine
+            from PySide6.QtGui import QGuiApplication
+
+            self.capture_engine = CaptureEngine()
+
+            # Refresh cached monitor geometry whenever the screen layout changes
+            app = QGuiApplication.instance()
+            app.screenAdded.connect(self._on_screen_layout_changed)
+            app.screenRemoved.connect(self._on_screen_layout_changed)
+            for screen in QGuiApplication.screens():
+                screen.geometryChanged.connect(self._on_screen_layout_changed)
+            app.aboutToQuit.connect(self.capture_engine.close)
+        return self.capture_engine
+
+    def _on_screen_layout_changed(self, *args):
+        from PySide6.QtGui import QScreen
+        if args and isinstance(args[0], QScreen):
+            # Newly added screens need their own geometry hook
+            try:
+                args[0].geometryChanged.connect(self._on_screen_layout_changed, Qt.UniqueConnection)
+            except (RuntimeError, TypeError):
+                pass
+        self.capture_engine.invalidate_monitors()
 
     def start_full_capture(self, monitor_index=None):
-        from capture.engine import CaptureEngine
         from editor.window import EditorWindow
         import time
         
-        self.hide()
-        QApplication.processEvents()
-        time.sleep(0.2)
-        QApplication.processEvents()
+        if self.isVisible():
+            # Let the window manager remove the dashboard before grabbing
+            self.hide()
+            QApplication.processEvents()
+            time.sleep(0.2)
+            QApplication.processEvents()
 
         try:
-            engine = CaptureEngine()
+            engine = self.get_capture_engine()
             img = engine.capture_fullscreen(monitor_index)
             
             self.editor = EditorWindow(img)
@@ -255,10 +508,9 @@ class Dashboard(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Capture Failed", f"An error occurred:\n{str(e)}")
         
-        self.show()
+        self._restore_window()
         
     def on_selection_made(self, x, y, w, h):
-        from capture.engine import CaptureEngine
         from editor.window import EditorWindow
         import time
         
@@ -283,7 +535,7 @@ class Dashboard(QMainWindow):
                 w = int(w * dpr)
                 h = int(h * dpr)
 
-            engine = CaptureEngine()
+            engine = self.get_capture_engine()
             img = engine.capture_region(x, y, w, h)
             
             self.editor = EditorWindow(img)
@@ -292,13 +544,70 @@ class Dashboard(QMainWindow):
             import traceback
             traceback.print_exc()
             QMessageBox.critical(self, "Capture Failed", f"An error occurred during capture:\n{str(e)}")
-        
-        self.show()
+
+        self._restore_window()
+
+    def toggle_burst(self):
+        """Starts a burst with the Image tab settings, or stops the running one."""
+        worker = getattr(self, 'burst_worker', None)
+        if worker is not None and worker.isRunning():
+            worker.burst.stop()
+            self.image_tab.btn_burst.setEnabled(False) # Until the queued shots are written
+            return
+
+        from capture.burst import BurstCapture
+        import os
+        import datetime
+        tab = self.image_tab
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_dir = os.path.join(os.getcwd(), "captures", f"burst_{timestamp}")
+        burst = BurstCapture(output_dir,
+                             monitor_index=tab.combo_burst_screen.currentData(),
+                             interval=tab.spin_burst_interval.value() / 1000.0,
+                             count=tab.spin_burst_count.value(),
+                             fmt=tab.combo_burst_format.currentText(),
+                             prefix="shot")
+
+        self.burst_worker = BurstWorker(burst)
+        self.burst_worker.progress.connect(self.on_burst_progress)
+        self.burst_worker.finished_burst.connect(self.on_burst_finished)
+        self.burst_worker.failed.connect(self.on_burst_failed)
+        tab.btn_burst.setText("Stop Burst")
+        tab.lbl_burst_status.setText("Starting...")
+        self.burst_worker.start()
+
+    def on_burst_progress(self, stats):
+        self.image_tab.lbl_burst_status.setText(
+            f"{stats['shots']} taken, {stats['written']} written | backlog {stats['backlog']} | "
+            f"jitter {stats['jitter_ms']:.1f} ms")
+
+    def on_burst_finished(self, files, stats):
+        from utils.history import HistoryManager
+        tab = self.image_tab
+        tab.btn_burst.setText("Start Burst")
+        tab.btn_burst.setEnabled(True)
+        tab.lbl_burst_status.setText(
+            f"{stats['written']} shots written | every {stats['interval_ms']:.0f} ms, "
+            f"jitter {stats['jitter_ms']:.1f} ms | max backlog {stats['backlog_max']}")
+        if files:
+            import os
+            folder = os.path.dirname(files[0])
+            HistoryManager().add_entry(folder)
+            self.load_recent_captures()
+            self.tray_icon.showMessage("Burst Finished", f"{len(files)} shots in {folder}",
+                                       QSystemTrayIcon.Information, 3000)
+
+    def on_burst_failed(self, message):
+        tab = self.image_tab
+        tab.btn_burst.setText("Start Burst")
+        tab.btn_burst.setEnabled(True)
+        tab.lbl_burst_status.setText("")
+        QMessageBox.critical(self, "Burst Failed", f"An error occurred during capture:\n{message}")
 
     # --- VIDEO CAPTURE METHODS ---
     def start_video_capture(self, mode, monitor_index=None):
         """
-        mode: 'region' or 'screen'
+        mode: 'region', 'screen' or 'replay' (instant-replay buffer of a screen)
         """
         self.hide()
         QApplication.processEvents()
@@ -325,6 +634,9 @@ class Dashboard(QMainWindow):
                 overlay.canceled.connect(self.on_capture_canceled)
                 overlay.show()
                 self.overlays.append(overlay)
+        elif mode == 'replay':
+            self.start_recording_manager(monitor_index, None, record_mic, record_webcam, capture_cursor,
+                                         replay_seconds=self.video_tab.spin_replay.value())
         else:
             # Full screen video
             # TODO: trigger recorder manager with specific monitor
@@ -348,25 +660,61 @@ class Dashboard(QMainWindow):
              
         self.start_recording_manager(None, (x, y, w, h), mic, webcam, cursor)
 
-    def start_recording_manager(self, monitor_index, region, mic, webcam, cursor):
+    def start_recording_manager(self, monitor_index, region, mic, webcam, cursor, replay_seconds=None):
         from capture.recorder_manager import RecorderManager
         
         self.recorder_manager = RecorderManager()
         self.recorder_manager.recording_finished.connect(self.on_recording_finished)
+        if replay_seconds:
+            self.recorder_manager.replay_saved.connect(self.on_replay_saved)
+            self.recorder_manager.replay_failed.connect(
+                lambda msg: self.tray_icon.showMessage("Replay", f"Save failed: {msg}", QSystemTrayIcon.Warning))
+            self.save_replay_action.setEnabled(True)
+        # Crash-safe rolling segments, joined at stop (needs ffmpeg for the join)
+        segment_seconds = None
+        if self.video_tab.chk_segments.isChecked():
+            from utils.ffmpeg import check_ffmpeg
+            if check_ffmpeg():
+                segment_seconds = SEGMENT_SECONDS
+            else:
+                import logging
+                logging.warning("Crash-safe segments need ffmpeg to be joined; recording one file")
         self.recorder_manager.start_recording(
             monitor_index=monitor_index,
             region=region,
             input_mic=mic,
             input_webcam=webcam,
-            capture_cursor=cursor
+            capture_cursor=cursor,
+            overlay_options={"pip_shape": "round"}, # The option is offered as "Round Webcam Overlay"
+            replay_seconds=replay_seconds,
+            segment_seconds=segment_seconds,
+            adaptive_fps=self.video_tab.chk_adaptive_fps.isChecked(),
+            multi_monitor=True, # Only used when recording all screens: one grab thread per monitor
+            audio_format=self.video_tab.combo_audio_format.currentData(),
+            audio_samplerate=self.video_tab.combo_samplerate.currentData(),
+            audio_channels=self.video_tab.combo_channels.currentData(),
+            input_system_audio=self.video_tab.chk_system_audio.isChecked(),
+            mic_gain=self.video_tab.spin_mic_gain.value() / 100,
+            system_gain=self.video_tab.spin_system_gain.value() / 100,
+            audio_stems=self.video_tab.chk_audio_stems.isChecked(),
         )
         
         # Show floating controls (inside manager or here? Manager is better to own it)
         # We'll assume manager handles showing the control UI
 
+    def save_replay(self):
+        if getattr(self, 'recorder_manager', None):
+            self.recorder_manager.save_replay()
+
+    def on_replay_saved(self, path):
+        from utils.history import HistoryManager
+        HistoryManager().add_entry(path)
+        self.tray_icon.showMessage("Replay Saved", path, QSystemTrayIcon.Information, 3000)
+
     def on_recording_finished(self, output_files):
         print(f"Recording finished. Files: {output_files}")
-        self.show()
+        self.save_replay_action.setEnabled(False)
+        self._restore_window()
         
         # Open Video Editor
         from editor.video_window import VideoEditorWindow
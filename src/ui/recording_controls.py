@@ -1,15 +1,22 @@
-from PySide6.QtWidgets import QWidget, QHBoxLayout, QPushButton, QLabel, QApplication
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QPushButton, QLabel, QApplication, QProgressBar
 from PySide6.QtCore import Qt, QTimer, Signal, QPoint
 from PySide6.QtGui import QIcon, QAction
 import sys
+from capture.audio_levels import SILENCE_DB
+
+METER_RANGE_DB = 60 # The level bars span -60..0 dBFS
+CLIP_DB = -1.0 # Peaks above this show the bar in red
+METER_COLORS = {"ok": "#55cc55", "silent": "#777777", "clip": "#ff5555"}
 
 class RecordingControls(QWidget):
     stop_clicked = Signal()
     pause_clicked = Signal(bool) # True=Paused, False=Resumed
     cancel_clicked = Signal()
+    save_replay_clicked = Signal()
 
-    def __init__(self):
+    def __init__(self, replay=False):
         super().__init__()
+        self.replay = replay # Instant-replay buffer instead of a normal recording
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setObjectName("recordingControls")
@@ -29,6 +36,27 @@ class RecordingControls(QWidget):
         self.lbl_timer.setObjectName("timerLabel")
         layout.addWidget(self.lbl_timer)
 
+        # Audio level bars, one per source, added by set_audio_levels()
+        self.meters = {}
+        self.meter_layout = QVBoxLayout()
+        self.meter_layout.setSpacing(3)
+        layout.addLayout(self.meter_layout)
+
+        if self.replay:
+            self.lbl_rec.setText("REPLAY")
+
+            # Buffer usage (seconds held / memory), updated by the manager
+            self.lbl_usage = QLabel("0s | 0 MB")
+            self.lbl_usage.setToolTip("Replay buffer: seconds held | memory used")
+            layout.addWidget(self.lbl_usage)
+
+            self.btn_save_replay = QPushButton("Save Replay")
+            self.btn_save_replay.setObjectName("primaryInfo")
+            self.btn_save_replay.setFixedHeight(36)
+            self.btn_save_replay.setToolTip("Save the last seconds to a video without stopping")
+            self.btn_save_replay.clicked.connect(self.save_replay_clicked.emit)
+            layout.addWidget(self.btn_save_replay)
+
         # Pause Button
         from PySide6.QtWidgets import QStyle
         self.btn_pause = QPushButton()
@@ -88,13 +116,39 @@ class RecordingControls(QWidget):
         else:
             self.timer.start(1000)
             self.btn_pause.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
-            self.lbl_rec.setText("REC")
+            self.lbl_rec.setText("REPLAY" if self.replay else "REC")
             self.lbl_rec.setStyleSheet("color: #ff5555; font-weight: bold;")
 
 
             
         self.pause_clicked.emit(self.is_paused)
 
+    def set_replay_usage(self, usage):
+        """Shows replay buffer stats as reported by RecorderManager.replay_usage()."""
+        used_mb = (usage["replay_bytes"] + usage["replay_audio_bytes"]) / (1024 * 1024)
+        budget_mb = usage["replay_budget_bytes"] / (1024 * 1024)
+        self.lbl_usage.setText(f"{usage['replay_seconds']:.0f}s | {used_mb:.0f}/{budget_mb:.0f} MB")
+
+    def set_audio_levels(self, levels):
+        """Shows [(source, rms dBFS, peak dBFS)] as emitted by RecorderManager.audio_levels."""
+        for name, rms, peak in levels:
+            bar = self.meters.get(name)
+            if bar is None:
+                bar = QProgressBar()
+                bar.setRange(0, METER_RANGE_DB)
+                bar.setTextVisible(False)
+                bar.setFixedSize(70, 6)
+                bar.setProperty("state", None)
+                self.meter_layout.addWidget(bar)
+                self.meters[name] = bar
+            bar.setValue(int(max(0, METER_RANGE_DB + peak)))
+            bar.setToolTip(f"{name}: {rms:.0f} dB RMS, {peak:.0f} dB peak")
+            # Grey while the input is silent (muted or dead microphone), red when it clips
+            state = "clip" if peak > CLIP_DB else "silent" if rms < SILENCE_DB else "ok"
+            if bar.property("state") != state:
+                bar.setProperty("state", state)
+                bar.setStyleSheet(f"QProgressBar::chunk {{ background-color: {METER_COLORS[state]}; }}")
+
     def on_stop(self):
         self.timer.stop()
         self.stop_clicked.emit()
@@ -118,6 +172,8 @@ class RecordingControls(QWidget):
         self.timer.stop()
         self.btn_pause.hide()
         self.btn_stop.hide()
+        if self.replay:
+            self.btn_save_replay.hide()
         # self.btn_cancel.hide()
         
         self.lbl_rec.setText("SAVING...")
@@ -0,0 +1,60 @@
+import logging
+import shutil
+import subprocess
+import sys
+
+def check_ffmpeg():
+    """Check if ffmpeg is in system path."""
+    return shutil.which("ffmpeg") is not None
+
+def check_mkvmerge():
+    """Check if mkvmerge (MKVToolNix) is in system path."""
+    return shutil.which("mkvmerge") is not None
+
+def popen_flags():
+    # Avoid flashing a console window for every tool call in the windowed (frozen) build
+    if sys.platform == "win32":
+        return subprocess.CREATE_NO_WINDOW
+    return 0
+
+def run_tool(cmd):
+    """Runs an external tool to completion. Returns True on success, logs stderr on failure."""
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                creationflags=popen_flags())
+    except OSError as e:
+        logging.error(f"Could not run {cmd[0]}: {e}")
+        return False
+
+    if result.returncode != 0:
+        err = result.stderr.decode(errors="replace").strip()[-2000:]
+        logging.error(f"{cmd[0]} failed ({result.returncode}): {err}")
+        return False
+    return True
+
+def merge_audio_video(video_path, audio_path, output_path, audio_offset=0.0):
+    """
+    Muxes a separate audio file into a video (video stream copied, audio encoded to AAC).
+    `audio_offset`: seconds the audio starts after the first video frame (negative: before),
+    as measured while recording (capture.media_clock).
+    """
+    # -y overwrites output
+    # -c:v copy -c:a aac copies video, encodes audio to aac
+    audio_input = ["-ss", f"{-audio_offset:.3f}"] if audio_offset < 0 else []
+    cmd = [
+        "ffmpeg", "-y",
+        "-i", video_path,
+        *audio_input, "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy",
+        "-c:a", "aac",
+        "-strict", "experimental",
+    ]
+    if audio_offset > 0:
+        # Silence up front; the audio is re-encoded anyway
+        cmd += ["-af", f"adelay=delays={audio_offset * 1000:.0f}:all=1"]
+    cmd.append(output_path)
+    success = run_tool(cmd)
+    if not success:
+        print("Merge Error: see debug_capture.log")
+    return success
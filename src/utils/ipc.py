@@ -0,0 +1,68 @@
+import json
+import os
+import sys
+import socket
+import getpass
+import tempfile
+
+# Command channel of the resident app (see ui.command_server). Kept free of Qt so a client
+# (a hotkey binding, a script) starts in a few milliseconds.
+#
+# Protocol: the client sends one UTF-8 line, e.g. "capture monitor 2", and the server
+# answers with one line of JSON ({"ok": true, ...} or {"ok": false, "error": "..."})
+# and closes the connection.
+
+DEFAULT_TIMEOUT = 5.0
+SOCKET_ENV = "OPENCAPTURE_SOCKET" # Overrides the server name (tests, several instances)
+
+def server_name():
+    """
+    Name the resident app listens on: a socket path on Linux/macOS, a pipe name on Windows.
+    Per user, so several users on one machine don't talk to each other's instance.
+    """
+    name = os.environ.get(SOCKET_ENV)
+    if name:
+        return name
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    if sys.platform == "win32":
+        return f"opencapture-{user}"
+    return os.path.join(tempfile.gettempdir(), f"opencapture-{user}.sock")
+
+class IPCError(Exception):
+    pass
+
+def send_command(command, timeout=DEFAULT_TIMEOUT, name=None):
+    """Sends one command to the resident app and returns its JSON reply (a dict)."""
+    name = name or server_name()
+    request = command.strip().encode("utf-8") + b"\n"
+    try:
+        if sys.platform == "win32":
+            # QLocalServer listens on a named pipe there
+            with open(rf"\\.\pipe\{name}", "r+b", buffering=0) as pipe:
+                pipe.write(request)
+                reply = pipe.readline()
+        else:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(name)
+                sock.sendall(request)
+                reply = b""
+                while not reply.endswith(b"\n"):
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    reply += chunk
+    except (OSError, socket.timeout) as e:
+        raise IPCError(f"OpenCapture is not running in resident mode ({e})") from e
+    if not reply:
+        raise IPCError("No reply from OpenCapture")
+    return json.loads(reply.decode("utf-8"))
+
+def is_running(name=None):
+    try:
+        return send_command("ping", timeout=1.0, name=name).get("ok", False)
+    except (IPCError, ValueError):
+        return False
@@ -0,0 +1,142 @@
+import sys
+import os
+import threading
+import time
+import numpy as np
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+from capture.audio_ring import AudioRing
+
+CHANNELS = 2
+CAPACITY = 1000 # Samples; small so every run wraps many times
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"  {'PASS' if ok else 'FAIL'}  {name}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def ramp(start, count):
+    """Samples numbered start .. start + count - 1 (exact in float32); the second channel is negated."""
+    values = np.arange(start, start + count, dtype=np.float32) % (1 << 24)
+    return np.stack([values, -values], axis=1)
+
+def make_ring():
+    # samplerate x seconds = CAPACITY samples
+    return AudioRing(CAPACITY, CHANNELS, seconds=1.0)
+
+def read_all(ring, max_frames=None):
+    """Everything peek() offers (at most `max_frames`), joined, then advanced past."""
+    views = ring.peek(max_frames)
+    data = np.concatenate(views) if views else np.zeros((0, CHANNELS), dtype=np.float32)
+    ring.advance(len(data))
+    return data
+
+def verify_wraparound():
+    print(f"wraparound: blocks across the end of a {CAPACITY}-sample ring")
+    ring = make_ring()
+    ring.write(ramp(0, 700))
+    first = read_all(ring)
+    # 700 + 600 crosses the end of the ring: the block is split over its end and its start
+    ring.write(ramp(700, 600))
+    views = ring.peek()
+    check("unread samples come back as two views", len(views) == 2,
+          f"{[len(view) for view in views]}")
+    second = read_all(ring)
+    check("first block read back", np.array_equal(first, ramp(0, 700)))
+    check("block across the wrap read back in order", np.array_equal(second, ramp(700, 600)))
+    check("no overrun counted", ring.overruns == 0 and ring.dropped == 0)
+
+    # Many wraps with block and read sizes that never line up with the ring size
+    rng = np.random.default_rng(1)
+    written = read = 1300
+    ok = True
+    for _ in range(2000):
+        n = int(rng.integers(1, 400))
+        if ring.available + n <= CAPACITY:
+            ring.write(ramp(written, n))
+            written += n
+        data = read_all(ring, int(rng.integers(1, 500)))
+        ok = ok and np.array_equal(data, ramp(read, len(data)))
+        read += len(data)
+    data = read_all(ring)
+    ok = ok and np.array_equal(data, ramp(read, len(data)))
+    read += len(data)
+    check(f"{written // CAPACITY} wraps, every sample in order", ok and read == written, f"{read} of {written}")
+
+def verify_overrun():
+    print("overrun: writer a whole ring ahead of the reader")
+    ring = make_ring()
+    ring.write(ramp(0, 800))
+    kept = ring.write(ramp(800, 300)) # Only 200 samples of room
+    check("write returns what fit", kept == 200, f"{kept}")
+    check("overrun counted", ring.overruns == 1 and ring.dropped == 100,
+          f"overruns {ring.overruns}, dropped {ring.dropped}")
+    kept = ring.write(ramp(1100, 50)) # Full: all of it is dropped
+    check("full ring drops the whole block", kept == 0 and ring.overruns == 2 and ring.dropped == 150,
+          f"kept {kept}, overruns {ring.overruns}, dropped {ring.dropped}")
+    check("max fill reported", ring.stats()["audio_ring_max_fill"] == 1.0)
+    data = read_all(ring)
+    # The samples that fit are kept unchanged; the dropped ones are simply missing
+    check("kept samples intact and in order", np.array_equal(data, ramp(0, 1000)))
+    ring.write(ramp(1150, 400))
+    data = read_all(ring)
+    check("recording continues after the overrun", np.array_equal(data, ramp(1150, 400)))
+
+def verify_threads(blocks=3000):
+    """Producer (as the PortAudio callback) and consumer (as the writer thread) with no lock between them."""
+    ring = make_ring()
+    written = []
+    received = []
+
+    def produce():
+        rng = np.random.default_rng(2)
+        position = 0
+        for _ in range(blocks):
+            n = int(rng.integers(1, 200))
+            kept = ring.write(ramp(position, n))
+            written.append((position, n, kept))
+            position += n
+            if rng.random() < 0.3:
+                time.sleep(0) # Let the consumer run
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while producer.is_alive() or ring.available:
+        data = read_all(ring)
+        if len(data):
+            received.append(data)
+        else:
+            time.sleep(0)
+    producer.join()
+
+    # A block that does not fit keeps its head; the rest is dropped
+    expected = np.concatenate([ramp(position, kept) for position, _, kept in written if kept])
+    got = np.concatenate(received) if received else np.zeros((0, CHANNELS), dtype=np.float32)
+    total = sum(kept for _, _, kept in written)
+    produced = sum(n for _, n, _ in written)
+    print(f"threads: {blocks} blocks, {ring.total_written} samples kept, "
+          f"{ring.dropped} dropped in {ring.overruns} overruns")
+    check("reader got every kept sample, in order, unchanged", np.array_equal(got, expected),
+          f"{len(got)} of {total}")
+    check("kept + dropped = produced", total == ring.total_written and total + ring.dropped == produced,
+          f"{total} + {ring.dropped} of {produced}")
+
+def main():
+    print(f"Verifying AudioRing ({CAPACITY} samples x {CHANNELS} channels)...")
+    verify_wraparound()
+    verify_overrun()
+    verify_threads()
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import sys
+import os
+import threading
+import time
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+from capture.frame_queue import FrameRing, BLOCK, DROP_OLDEST, DROP_NEWEST
+
+SHAPE = (4, 4, 4) # Frame content does not matter, only which frame a slot carries
+CAPACITY = 4
+FRAMES = 10
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"  {'PASS' if ok else 'FAIL'}  {name}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def produce(ring, number):
+    """Fills a slot with frame `number` (in pts and in every pixel); returns False if it was skipped."""
+    slot = ring.acquire(timeout=0.1)
+    if slot is None:
+        return False
+    slot.buffer[:] = number % 256
+    slot.pts = float(number)
+    ring.commit(slot)
+    return True
+
+def drain(ring):
+    """Frame numbers the consumer gets, in order; also checks each buffer still holds its frame."""
+    numbers = []
+    while ring.depth:
+        slot = ring.get(timeout=0)
+        number = int(slot.pts)
+        if not (slot.buffer == number % 256).all():
+            check(f"slot of frame {number} intact", False, "overwritten while queued")
+        numbers.append(number)
+        ring.release(slot)
+    return numbers
+
+def verify_policy(policy, expected_frames, expected_dropped):
+    """FRAMES frames into a ring nobody reads from, then drains it."""
+    print(f"{policy}: {FRAMES} frames into {CAPACITY} slots without a consumer")
+    ring = FrameRing(SHAPE, capacity=CAPACITY, policy=policy)
+    started = time.perf_counter()
+    accepted = sum(produce(ring, number) for number in range(FRAMES))
+    elapsed = time.perf_counter() - started
+    stats = ring.stats()
+
+    check("frames_dropped", stats["frames_dropped"] == expected_dropped,
+          f"{stats['frames_dropped']}, expected {expected_dropped}")
+    check("queue never deeper than the ring", stats["queue_max_depth"] <= CAPACITY,
+          f"max depth {stats['queue_max_depth']}")
+    if policy == BLOCK:
+        # Every acquire past the capacity waits out its timeout instead of dropping
+        check("producer waited on a full ring", accepted == CAPACITY and elapsed >= 0.1 * (FRAMES - CAPACITY) * 0.9,
+              f"{accepted} accepted in {elapsed:.2f}s")
+    else:
+        check("producer never waited", elapsed < 0.05, f"{elapsed * 1000:.1f} ms")
+    numbers = drain(ring)
+    check("consumer order", numbers == expected_frames, f"got {numbers}")
+
+def verify_slot_reuse():
+    """Slots come back to the producer only once released, and only the preallocated buffers circulate."""
+    print("slot reuse")
+    ring = FrameRing(SHAPE, capacity=CAPACITY, policy=DROP_OLDEST)
+    buffers = {id(slot.buffer) for slot in ring.slots}
+
+    produce(ring, 0)
+    held = ring.get(timeout=0) # The consumer is busy with frame 0
+    seen = set()
+    handed_out_again = False
+    for number in range(1, FRAMES * 3):
+        slot = ring.acquire(timeout=0.1)
+        seen.add(id(slot.buffer))
+        if slot is held:
+            handed_out_again = True
+            continue
+        slot.buffer[:] = number % 256
+        slot.pts = float(number)
+        ring.commit(slot)
+    check("held slot never handed out again", not handed_out_again)
+    check("held slot untouched while recycling", (held.buffer == 0).all() and held.pts == 0.0)
+    check("only preallocated buffers used", seen <= buffers, f"{len(seen)} distinct buffers")
+    check("queued while one slot is held", ring.depth == CAPACITY - 1, f"depth {ring.depth}")
+    ring.release(held)
+    numbers = drain(ring)
+    check("newest frames kept in order", numbers == list(range(FRAMES * 3 - CAPACITY + 1, FRAMES * 3)),
+          f"got {numbers}")
+
+def verify_threaded(policy, frames=500):
+    """Producer and slower consumer on their own threads: order, counts and close() draining."""
+    ring = FrameRing(SHAPE, capacity=CAPACITY, policy=policy)
+    received = []
+
+    def consume():
+        while True:
+            slot = ring.get()
+            if slot is None:
+                break # Closed and drained
+            number = int(slot.pts)
+            if not (slot.buffer == number % 256).all():
+                received.append(-1)
+            received.append(number)
+            time.sleep(0.0002) # Slower than the producer, so the ring fills up
+            ring.release(slot)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    for number in range(frames):
+        slot = ring.acquire()
+        if slot is None:
+            continue
+        slot.buffer[:] = number % 256
+        slot.pts = float(number)
+        ring.commit(slot)
+    ring.close()
+    consumer.join(10)
+
+    stats = ring.stats()
+    print(f"{policy}: {frames} frames across threads, {stats['frames_dropped']} dropped")
+    check("consumer finished after close()", not consumer.is_alive())
+    check("no slot overwritten while in use", -1 not in received)
+    check("strictly increasing order", all(a < b for a, b in zip(received, received[1:])))
+    check("received + dropped = produced", len(received) + stats["frames_dropped"] == frames,
+          f"{len(received)} + {stats['frames_dropped']}")
+    if policy == BLOCK:
+        check("nothing dropped", received == list(range(frames)))
+    elif policy == DROP_OLDEST:
+        check("newest frame delivered", received[-1] == frames - 1)
+    else:
+        check("first frame delivered", received[0] == 0)
+    check("acquire after close() returns None", ring.acquire(timeout=0) is None)
+
+def main():
+    print(f"Verifying FrameRing backpressure ({CAPACITY} slots)...")
+    verify_policy(BLOCK, list(range(CAPACITY)), 0)
+    # The new frame replaces the stalest queued one: the last CAPACITY frames survive
+    verify_policy(DROP_OLDEST, list(range(FRAMES - CAPACITY, FRAMES)), FRAMES - CAPACITY)
+    # The new frame is discarded: the first CAPACITY frames survive
+    verify_policy(DROP_NEWEST, list(range(CAPACITY)), FRAMES - CAPACITY)
+    verify_slot_reuse()
+    for policy in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+        verify_threaded(policy)
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import time
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import cv2
+import numpy as np
+
+FPS = 10
+SEGMENT_SECONDS = 1
+WIDTH, HEIGHT = 320, 240
+KILL_AFTER_SEGMENTS = 3 # Kill the writer while this many segments are listed
+
+failures = []
+
+def check(name, ok, detail=""):
+    print(f"  {'PASS' if ok else 'FAIL'}  {name}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def run_writer(output_path, backend):
+    """Child process: records synthetic frames into segments until it is killed."""
+    from capture.segments import create_segmented_encoder
+
+    encoder = create_segmented_encoder(backend, output_path, WIDTH, HEIGHT, FPS, segment_seconds=SEGMENT_SECONDS)
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    number = 0
+    while True:
+        frame[:] = number % 256
+        encoder.write(frame)
+        number += 1
+        time.sleep(1 / FPS)
+
+def count_frames(path):
+    """Frames that actually decode, or None if the file does not open."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        return None
+    count = 0
+    while capture.read()[0]:
+        count += 1
+    capture.release()
+    return count
+
+def read_manifest_when(path, predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            if predicate(manifest):
+                return manifest
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.05)
+    return None
+
+def verify_crash(backend, directory):
+    from capture.segments import manifest_path, read_manifest, concat_segments
+    from utils.ffmpeg import check_ffmpeg
+
+    print(f"{backend}: writer killed while segment {KILL_AFTER_SEGMENTS} is being recorded")
+    output_path = os.path.join(directory, f"crash_{backend}.mp4")
+    manifest_file = manifest_path(output_path)
+    writer = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--writer", output_path, backend])
+
+    # Mid-segment: the last listed segment has been recording for half a segment
+    listed = read_manifest_when(manifest_file, lambda m: len(m["segments"]) >= KILL_AFTER_SEGMENTS)
+    if listed is None:
+        writer.kill()
+        writer.wait()
+        check("writer started segments", False, "manifest never listed them")
+        return
+    time.sleep(SEGMENT_SECONDS / 2)
+    writer.kill() # SIGKILL / TerminateProcess: no cleanup runs
+    writer.wait()
+    time.sleep(0.5) # Let orphaned encoder processes see their input end
+
+    manifest = read_manifest(manifest_file)
+    segments = manifest["segments"]
+    closed = [seg for seg in segments if seg["closed"]]
+    open_segments = [seg for seg in segments if not seg["closed"]]
+    check("manifest readable after the kill", True, f"{len(segments)} segments")
+    check("manifest not marked complete", manifest["complete"] is False)
+    check("only the segment being written is not closed",
+          len(open_segments) <= 1 and (not open_segments or open_segments[0] is segments[-1]),
+          f"open: {[seg['file'] for seg in open_segments]}")
+    check("segments before it are all listed as closed", len(closed) >= KILL_AFTER_SEGMENTS - 1,
+          f"{len(closed)} closed")
+
+    expected = 0
+    for seg in closed:
+        path = os.path.join(os.path.dirname(manifest_file), seg["file"])
+        frames = count_frames(path) if os.path.exists(path) else None
+        check(f"{seg['file']} complete", frames == seg["frames"] and frames > 0,
+              f"{frames} frames decoded, manifest says {seg['frames']}")
+        expected += seg["frames"]
+
+    if not check_ffmpeg():
+        print("  SKIP  recovery join (ffmpeg not found)")
+        return
+    joined = os.path.join(directory, f"recovered_{backend}.mp4")
+    ok = concat_segments(manifest_file, joined)
+    frames = count_frames(joined) if ok else None
+    check("crashed recording joins", ok and frames is not None and frames >= expected,
+          f"{frames} frames, closed segments hold {expected}")
+
+def main():
+    from utils.ffmpeg import check_ffmpeg
+
+    print(f"Verifying segmented output after a crash ({SEGMENT_SECONDS}s segments at {FPS} fps)...")
+    backends = ["opencv"] + (["ffmpeg"] if check_ffmpeg() else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            verify_crash(backend, tmp)
+
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("\nAll checks passed")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--writer":
+        run_writer(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,111 @@
+import sys
+import os
+import tempfile
+import threading
+import time
+
+# Add src to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_dir = os.path.join(current_dir, "src")
+sys.path.append(src_dir)
+
+import mss
+from PySide6.QtCore import QCoreApplication, Qt
+
+FPS = 10.0 # Low rate, so a transition that waits for the next frame slot would show up clearly
+REPEATS = 5
+
+class FakeShot:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.raw = bytearray(width * height * 4)
+
+class FakeGrabber:
+    """Stands in for mss.mss(): returns blank frames and records when each grab started."""
+    grabs = []
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.monitors = [{"left": 0, "top": 0, "width": 320, "height": 240}] * 2
+
+    def grab(self, monitor):
+        with FakeGrabber.lock:
+            FakeGrabber.grabs.append(time.perf_counter())
+        return FakeShot(monitor["width"], monitor["height"])
+
+    def close(self):
+        pass
+
+def grabs_after(t):
+    with FakeGrabber.lock:
+        return [g for g in FakeGrabber.grabs if g >= t]
+
+def wait_for_grab(t, timeout=2.0):
+    """Latency from `t` to the first grab after it, or None."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        grabs = grabs_after(t)
+        if grabs:
+            return grabs[0] - t
+        time.sleep(0.001)
+    return None
+
+def measure_once(output_path):
+    from capture.video import VideoRecorder
+
+    recorder = VideoRecorder(output_path, monitor_index=0, fps=FPS, cursor_enabled=False,
+                             encoder="opencv", adaptive_fps=False)
+    ready = threading.Event()
+    # No event loop runs here, so take the signal on the recorder's thread
+    recorder.recording_started.connect(ready.set, Qt.DirectConnection)
+    recorder.start()
+    if not ready.wait(10):
+        raise RuntimeError("Recorder setup did not finish")
+
+    results = {}
+    t = time.perf_counter()
+    recorder.start_capture()
+    results["start"] = wait_for_grab(t)
+
+    time.sleep(0.35)
+    t = time.perf_counter()
+    recorder.pause()
+    time.sleep(3 / FPS)
+    # A grab already in flight is fine; anything later means the pause was not seen
+    results["pause (late grabs)"] = len([g for g in grabs_after(t) if g > t + 0.005])
+
+    t = time.perf_counter()
+    recorder.resume()
+    results["resume"] = wait_for_grab(t)
+
+    time.sleep(0.35)
+    t = time.perf_counter()
+    recorder.stop()
+    recorder.wait()
+    results["stop (until finished)"] = time.perf_counter() - t
+    return results
+
+def main():
+    app = QCoreApplication(sys.argv)
+    mss.mss = FakeGrabber
+
+    print(f"Measuring VideoRecorder transition latency at {FPS:g} fps "
+          f"(frame interval {1000 / FPS:.0f} ms), {REPEATS} runs...")
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(REPEATS):
+            runs.append(measure_once(os.path.join(tmp, f"transitions_{i}.mp4")))
+
+    for name in runs[0]:
+        values = [run[name] for run in runs]
+        if name.startswith("pause"):
+            print(f"  {name:<24} max {max(values)}")
+        elif None in values:
+            print(f"  {name:<24} FAILED: no frame captured")
+        else:
+            ms = [v * 1000 for v in values]
+            print(f"  {name:<24} mean {sum(ms) / len(ms):6.1f} ms   max {max(ms):6.1f} ms")
+
+if __name__ == "__main__":
+    main()